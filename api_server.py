@@ -1,19 +1,61 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, make_response, url_for
+from werkzeug.exceptions import HTTPException
+from datetime import datetime
+import json
 import logging
 
-from core.screenshot import capture_screenshot
+from core.screenshot import screenshot_service, DEFAULT_QUALITY, Screenshot
+from core.screen_audit import screen_audit
 from core.system_control import lock_workstation, shutdown_system, get_battery_status
 from core.usb_control import set_usb_state, is_usb_enabled
-from core.host_modifier import block_websites, unblock_websites, read_blocked_websites
-from core.app_management import block_and_limit_apps, get_installed_apps
-from core.heartbeat import send_heartbeat
-from core.app_block_using_driver import block_apps, unblock_apps, get_all_blocked_apps, unblock_all_apps
+from core.host_modifier import block_websites, unblock_websites, get_blocked_websites
+from core.app_management import block_and_limit_apps
+from core.installed_software import inventory
+from core.heartbeat import send_heartbeat, get_uptime
+from core.app_block_using_driver import block_apps, unblock_apps, get_all_blocked_apps, unblock_all_apps, deferred_driver_push
 from core.app_monitor import get_all_app_usage_today
-from core.app_block_policy import add_app_block_rule, remove_app_block_rule, get_app_block_rules
+from core.usage_query import query_usage, parse_time, DEFAULT_PAGE_SIZE, DEFAULT_RANGE
+from core import usage_retention
+from core.app_block_policy import add_app_block_rule, remove_app_block_rule, get_app_block_rules, deferred_policy_evaluation
+from service.jobs import jobs, JobQueueFull
+from service.event_bus import event_bus, TooManySubscribers
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 
+MAX_BATCH_OPERATIONS = 500
+SSE_KEEPALIVE = 15      # seconds between comments on an idle stream
+SSE_RETRY_MS = 3000     # client reconnect delay
+
+
+def wants_async():
+    """Client opted into background execution with ?async=1 or Prefer: respond-async"""
+    if request.args.get("async", "").lower() in ("1", "true", "yes"):
+        return True
+    return "respond-async" in request.headers.get("Prefer", "").lower()
+
+
+def accepted(kind, work):
+    """Queue work() as a background job and answer 202 with its id and status URL"""
+    try:
+        job = jobs.submit(kind, work)
+    except JobQueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+
+    job_url = url_for("api_get_job", job_id=job.id)
+    response = jsonify({"status": "accepted", "job_id": job.id, "job_url": job_url})
+    response.status_code = 202
+    response.headers["Location"] = job_url
+    response.headers["Preference-Applied"] = "respond-async"
+    return response
+
+
+def run_now_or_later(kind, work):
+    """Return work()'s JSON body, or run it as a background job if the client asked for async"""
+    if wants_async():
+        return accepted(kind, work)
+    return jsonify(work())
+
 
 @app.route("/lock", methods=["POST"])
 def api_lock():
@@ -23,14 +65,51 @@ def api_lock():
 
 @app.route("/shutdown", methods=["POST"])
 def api_shutdown():
-    shutdown_system()
-    return jsonify({"status": "shutdown initiated"})
+    def work():
+        shutdown_system()
+        return {"status": "shutdown initiated"}
+    return run_now_or_later("system", work)
 
 
 @app.route("/screenshot", methods=["GET"])
 def api_screenshot():
-    path = capture_screenshot()
-    return jsonify({"screenshot_path": path})
+    """Current screen as image bytes; ?format=png|jpeg|webp&quality=1-100&max_dim=<px>&save=1"""
+    fmt = request.args.get("format", "png")
+    quality = request.args.get("quality", DEFAULT_QUALITY, type=int)
+    max_dim = request.args.get("max_dim", type=int)
+    save = request.args.get("save", "0").lower() in ("1", "true", "yes")
+
+    try:
+        fmt = screenshot_service.validate(fmt, quality, max_dim)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    if wants_async():
+        # Nothing is captured unless the job is accepted.
+        return accepted("screenshot", lambda: screenshot_service.capture(fmt, quality, max_dim, save))
+
+    try:
+        shot = screenshot_service.submit(fmt, quality, max_dim, save).result()
+    except Exception as e:
+        logging.error(f"Failed to capture screenshot: {e}")
+        return jsonify({"status": "error", "message": f"Failed to capture screenshot: {e}"}), 500
+    return screenshot_response(shot)
+
+
+def screenshot_response(shot):
+    response = Response(shot.data, mimetype=shot.mimetype)
+    response.headers["Cache-Control"] = "no-store"
+    response.headers["X-Screenshot-Width"] = str(shot.width)
+    response.headers["X-Screenshot-Height"] = str(shot.height)
+    if shot.path:
+        response.headers["X-Screenshot-Path"] = shot.path
+    return response
+
+
+@app.route("/screenshot/audit", methods=["GET"])
+def api_screenshot_audit():
+    """Periodic audit capture counters: frames kept/skipped and bytes saved by deduplication"""
+    return jsonify(screen_audit.stats())
 
 
 @app.route("/battery", methods=["GET"])
@@ -43,6 +122,87 @@ def api_todays_all_app_usage():
     return jsonify(get_all_app_usage_today())
 
 
+@app.route("/usage", methods=["GET"])
+def api_usage():
+    """
+    Usage in a time range; ?from=&to= (ISO local time or epoch seconds, default last 24h),
+    granularity=hour|day, group_by=app|app_name|url, limit=, cursor=
+    """
+    try:
+        end = parse_time(request.args["to"]) if request.args.get("to") else datetime.now()
+        start = parse_time(request.args["from"]) if request.args.get("from") else end - DEFAULT_RANGE
+
+        result = query_usage(
+            start, end,
+            granularity=request.args.get("granularity", "day"),
+            group_by=request.args.get("group_by", "app"),
+            cursor=request.args.get("cursor"),
+            limit=request.args.get("limit", DEFAULT_PAGE_SIZE, type=int),
+        )
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    result["from"] = start.isoformat(timespec="seconds")
+    result["to"] = end.isoformat(timespec="seconds")
+    return jsonify(result)
+
+
+@app.route("/usage/retention", methods=["GET"])
+def api_usage_retention_report():
+    """Report of the last retention run (rows compacted, bytes reclaimed), or null"""
+    return jsonify(usage_retention.last_report)
+
+
+@app.route("/usage/retention", methods=["POST"])
+def api_usage_retention():
+    """Compact and vacuum now with the configured windows; supports ?async=1"""
+    return run_now_or_later("retention", usage_retention.run_usage_retention)
+
+
+@app.route("/events/stream", methods=["GET"])
+def api_events_stream():
+    """
+    Live events as Server-Sent Events: foreground, blocked_apps, policy.
+    ?types= limits the event types; Last-Event-ID (header or ?last_event_id=) resumes
+    from the recent-event buffer. A "reset" event means that resume point was lost,
+    "lagged" that events were dropped because the client read too slowly.
+    """
+    types = [event_type for event_type in request.args.get("types", "").split(",") if event_type]
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        subscription = event_bus.subscribe(last_event_id, types)
+    except TooManySubscribers as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
+
+    def stream():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            if subscription.missed:
+                yield f"event: reset\ndata: {json.dumps({'last_event_id': last_event_id})}\n\n"
+            reported_drops = 0
+            while not subscription.closed:
+                events = subscription.get(SSE_KEEPALIVE)
+                if subscription.dropped > reported_drops:
+                    yield f"event: lagged\ndata: {json.dumps({'dropped': subscription.dropped - reported_drops})}\n\n"
+                    reported_drops = subscription.dropped
+                if not events:
+                    yield ": keepalive\n\n"  # also how a closed connection gets noticed
+                for event in events:
+                    yield event.to_sse()
+        finally:
+            subscription.close()
+
+    response = Response(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
+
+
+@app.route("/events/stats", methods=["GET"])
+def api_events_stats():
+    return jsonify(event_bus.stats())
+
+
 @app.route("/usb", methods=["POST"])
 def api_usb():
     action = request.json.get("enable", True)
@@ -58,36 +218,84 @@ def api_usb_status():
 
 @app.route("/block_websites", methods=["GET"])
 def api_list_blocked_websites():
-    websites = read_blocked_websites()
-    return jsonify({"websites": websites})
+    """Blocked websites; supports ?prefix=, ?offset=&limit= paging and ETag"""
+    try:
+        snapshot = get_blocked_websites()
+    except Exception as e:
+        logging.error(f"Failed to read hosts file: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    prefix = request.args.get("prefix", "").strip().lower()
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = request.args.get("limit", type=int)
+
+    websites = snapshot.with_prefix(prefix)
+    page = websites[offset:offset + limit] if limit is not None else websites[offset:]
+    body = {"websites": page, "total": len(websites), "offset": offset}
+    if limit is not None:
+        body["limit"] = limit
+
+    response = make_response(jsonify(body))
+    response.set_etag(snapshot.etag)
+    return response.make_conditional(request)
 
 
 @app.route("/block_websites", methods=["POST"])
 def api_block_websites():
     data = request.get_json()
     websites = data.get("websites", [])
-    block_websites(websites)
-    return jsonify({"status": "websites blocked", "websites": websites})
+    res = block_websites(websites)
+    if res["status"] == "error":
+        return jsonify(res), 500
+    return jsonify({"status": "websites blocked", "websites": websites, "delta": res["delta"]})
 
 
 @app.route("/unblock_websites", methods=["POST"])
 def api_unblock_websites():
     data = request.get_json()
     websites = data.get("websites", [])
-    unblock_websites(websites)
-    return jsonify({"status": "websites unblocked", "websites": websites})
+    res = unblock_websites(websites)
+    if res["status"] == "error":
+        return jsonify(res), 500
+    return jsonify({"status": "websites unblocked", "websites": websites, "delta": res["delta"]})
 
 
 @app.route("/apps/enforce", methods=["POST"])
 def api_enforce_apps():
-    block_and_limit_apps()
-    return jsonify({"status": "app rules enforced"})
+    def work():
+        block_and_limit_apps()
+        return {"status": "app rules enforced"}
+    return run_now_or_later("enforce", work)
 
 
 @app.route("/installed_app", methods=["GET"])
 def installed_app():
-    apps = get_installed_apps()
-    return jsonify({"data": apps})
+    """
+    Installed applications; supports ETag/Last-Modified and ?since=<version> deltas.
+    In async mode the registry is rescanned first and the job result is the body.
+    """
+    since = request.args.get("since", type=int)
+    if wants_async():
+        return accepted("inventory", lambda: installed_app_body(inventory.refresh(), since))
+
+    snapshot = inventory.snapshot()
+    body = installed_app_body(snapshot, since)
+    response = make_response(jsonify(body))
+    response.set_etag(f"{snapshot.etag}-{since}" if since is not None else snapshot.etag)
+    response.last_modified = snapshot.modified_at
+    return response.make_conditional(request)
+
+
+def installed_app_body(snapshot, since):
+    body = {"version": snapshot.version}
+    changes = inventory.changes_since(since) if since is not None else None
+    if changes is not None:
+        body.update(changes)
+    else:
+        body["data"] = snapshot.apps
+        if since is not None:
+            body["full"] = True  # unknown or expired version, client must replace its list
+    return body
 
 
 @app.route("/heartbeat", methods=["POST"])
@@ -96,6 +304,21 @@ def api_heartbeat():
     return jsonify({"status": "heartbeat logged"})
 
 
+@app.route("/uptime", methods=["GET"])
+def api_uptime():
+    """Availability from heartbeat intervals; ?from=&to= (ISO local time or epoch seconds, default last 24h)"""
+    try:
+        end = parse_time(request.args["to"]) if request.args.get("to") else datetime.now()
+        start = parse_time(request.args["from"]) if request.args.get("from") else end - DEFAULT_RANGE
+        result = get_uptime(start, end)
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    result["from"] = start.isoformat(timespec="seconds")
+    result["to"] = end.isoformat(timespec="seconds")
+    return jsonify(result)
+
+
 @app.route("/block-apps", methods=["POST"])
 def api_block_apps():
     """Block specific applications"""
@@ -171,15 +394,14 @@ def api_add_app_block_rule():
             "message": "Both time_start and time_end must be provided if one is given"
         }), 400
 
-    res = add_app_block_rule(
+    return run_now_or_later("rules", lambda: add_app_block_rule(
         app_name=app_name,
         always_blocked=bool(always_blocked),
         usage_limit_seconds=usage_limit_seconds,
         time_start=time_start,
         time_end=time_end,
         notes=notes
-    )
-    return jsonify(res)
+    ))
 
 
 @app.route("/remove_app_block_rule", methods=["POST"])
@@ -191,8 +413,7 @@ def api_remove_app_block_rule():
     if not app_name:
         return jsonify({"status": "error", "message": "Missing app_name"}), 400
 
-    res = remove_app_block_rule(app_name)
-    return jsonify(res)
+    return run_now_or_later("rules", lambda: remove_app_block_rule(app_name))
 
 @app.route("/get-app-block-rule", methods=["GET"])
 def api_get_app_block_rules():
@@ -205,5 +426,120 @@ def api_get_app_block_rules():
     })
 
 
+@app.route("/batch", methods=["POST"])
+def api_batch():
+    """
+    Run several API calls in one request.
+
+    Body: {"operations": [{"method": "POST", "path": "/block-apps", "body": {...}}, ...],
+           "stop_on_error": false}
+    Each operation goes through the same route handler as a standalone call, in
+    order. Policy evaluation and the driver push they trigger are coalesced into one
+    of each after the last operation. Supports ?async=1 like the slow endpoints.
+    """
+    data = request.get_json(silent=True) or {}
+    operations = data.get("operations")
+    stop_on_error = bool(data.get("stop_on_error", False))
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"status": "error", "message": "operations must be a non-empty list"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({"status": "error", "message": f"At most {MAX_BATCH_OPERATIONS} operations per batch"}), 400
+
+    return run_now_or_later("batch", lambda: run_batch(operations, stop_on_error))
+
+
+def run_batch(operations, stop_on_error=False):
+    results = []
+    with deferred_driver_push() as push:
+        with deferred_policy_evaluation():
+            for index, operation in enumerate(operations):
+                result = run_batch_operation(operation)
+                result["index"] = index
+                results.append(result)
+                if stop_on_error and result["status_code"] >= 400:
+                    break
+
+    failed = sum(1 for result in results if result["status_code"] >= 400)
+    driver = push["result"]
+    body = {
+        "status": "success" if not failed and (driver is None or driver["status"] == "success") else "partial",
+        "results": results,
+        "completed": len(results),
+        "failed": failed,
+    }
+    if driver is not None:
+        body["driver"] = driver
+    return body
+
+
+def run_batch_operation(operation):
+    """Dispatch one batch operation to its route handler; returns {path, status_code, body}"""
+    if not isinstance(operation, dict) or not isinstance(operation.get("path"), str):
+        return {"path": None, "status_code": 400, "body": {"status": "error", "message": "Operation needs a path"}}
+
+    path = operation["path"]
+    method = str(operation.get("method", "POST")).upper()
+    result = {"path": path, "method": method}
+
+    with app.test_request_context(path, method=method, json=operation.get("body"),
+                                  query_string=operation.get("query")):
+        if wants_async() or request.path == "/batch" or request.path.startswith(("/jobs/", "/events/")):
+            result.update(status_code=400, body={"status": "error", "message": "Operation not allowed in a batch"})
+            return result
+        try:
+            adapter = app.url_map.bind_to_environ(request.environ)
+            endpoint, view_args = adapter.match(request.path, method)
+            response = app.make_response(app.view_functions[endpoint](**view_args))
+        except HTTPException as e:
+            result.update(status_code=e.code, body={"status": "error", "message": e.description})
+            return result
+        except Exception as e:
+            logging.error(f"Batch operation {method} {path} failed: {e}")
+            result.update(status_code=500, body={"status": "error", "message": str(e)})
+            return result
+
+    result["status_code"] = response.status_code
+    if response.is_json:
+        result["body"] = response.get_json()
+    else:
+        result["body"] = {"mimetype": response.mimetype, "bytes": response.content_length}
+    return result
+
+
+@app.route("/jobs/<job_id>", methods=["GET"])
+def api_get_job(job_id):
+    """Status of a background job, with its result once it has succeeded"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown or expired job"}), 404
+
+    body = job.to_dict()
+    if job.status == "succeeded":
+        if isinstance(job.result, Screenshot):
+            body["result"] = {"mimetype": job.result.mimetype, "width": job.result.width,
+                              "height": job.result.height, "path": job.result.path,
+                              "bytes": len(job.result.data)}
+            body["result_url"] = url_for("api_get_job_result", job_id=job.id)
+        else:
+            body["result"] = job.result
+    return jsonify(body)
+
+
+@app.route("/jobs/<job_id>/result", methods=["GET"])
+def api_get_job_result(job_id):
+    """Raw result of a finished job (the image for screenshot jobs)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Unknown or expired job"}), 404
+    if not job.done:
+        return jsonify({"status": "error", "message": f"Job is {job.status}"}), 409
+    if job.status == "failed":
+        return jsonify({"status": "error", "message": job.error}), 500
+    if isinstance(job.result, Screenshot):
+        return screenshot_response(job.result)
+    return jsonify(job.result)
+
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000)
@@ -0,0 +1,72 @@
+"""
+Microbenchmark for service.cache.Cache against the original dict-based cache.
+
+    python -m benchmarks.bench_cache
+"""
+import threading
+import time
+import timeit
+
+from service.cache import Cache
+
+
+class OriginalCache:
+    """The previous implementation: plain dict, wall-clock expiry, no bound, no lock."""
+
+    def __init__(self):
+        self._store = {}
+
+    def set(self, key, value, ttl=None):
+        self._store[key] = (value, time.time() + ttl if ttl else None)
+
+    def get(self, key):
+        entry = self._store.get(key)
+        if entry:
+            if entry[1] is not None and time.time() > entry[1]:
+                del self._store[key]
+                return None
+            return entry[0]
+        return None
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+
+def per_op(stmt, number=200_000):
+    return timeit.timeit(stmt, number=number) / number * 1e9
+
+
+def main():
+    keys = [f"C:\\Program Files\\App{i}\\app{i}.exe" for i in range(1000)]
+    for label, cache in (("original", OriginalCache()), ("Cache(max_entries=512)", Cache(max_entries=512))):
+        for i, key in enumerate(keys):
+            cache.set(key, ("App", None), 3600)
+        hot = keys[-1]
+        print(f"{label}")
+        print(f"  get hit          {per_op(lambda: cache.get(hot)):8.0f} ns")
+        print(f"  get miss         {per_op(lambda: cache.get('missing')):8.0f} ns")
+        print(f"  'in' then get    {per_op(lambda: hot in cache and cache.get(hot)):8.0f} ns")
+        print(f"  set              {per_op(lambda: cache.set(hot, ('App', None), 3600)):8.0f} ns")
+        print(f"  entries held     {len(cache._store):8d}")
+
+    cache = Cache()
+    loads = []
+
+    def slow_loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return "value"
+
+    threads = [threading.Thread(target=cache.get_or_compute, args=("k", slow_loader, 60)) for _ in range(32)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    print(f"get_or_compute: 32 concurrent misses -> {len(loads)} load(s) in "
+          f"{(time.perf_counter() - start) * 1000:.0f} ms")
+    print(f"stats: {cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Compare the original copy-and-query Chromium history parse with the incremental
+ChromiumHistoryReader on a synthetic History database.
+
+    python -m benchmarks.bench_chromium_history --visits 500000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from shutil import copy2
+
+from core.browser_history.chromium_reader import ChromiumHistoryReader, datetime_to_webkit
+
+
+def create_history(path, visits, days):
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE urls (id INTEGER PRIMARY KEY, url LONGVARCHAR, title LONGVARCHAR,
+                           visit_count INTEGER, last_visit_time INTEGER NOT NULL);
+        CREATE TABLE visits (id INTEGER PRIMARY KEY, url INTEGER NOT NULL, visit_time INTEGER NOT NULL);
+        CREATE INDEX visits_time_index ON visits (visit_time);
+    """)
+    now = datetime.now()
+    url_count = max(1, visits // 5)
+    step = timedelta(days=days) / visits
+    start = now - timedelta(days=days)
+    visit_rows = [(i % url_count + 1, datetime_to_webkit(start + step * i)) for i in range(visits)]
+    last_visit = dict(visit_rows)  # later visits overwrite earlier ones
+    conn.executemany("INSERT INTO urls VALUES (?, ?, ?, 0, ?)",
+                     ((i, f"https://example.com/page/{i}", f"Example page {i}", last_visit.get(i, 0))
+                      for i in range(1, url_count + 1)))
+    conn.executemany("INSERT INTO visits (url, visit_time) VALUES (?, ?)", visit_rows)
+    conn.commit()
+    conn.close()
+
+
+def add_visits(path, count):
+    conn = sqlite3.connect(path)
+    now = datetime_to_webkit(datetime.now())
+    conn.executemany("INSERT INTO visits (url, visit_time) VALUES (1, ?)", ((now + i,) for i in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def original_parse(history_path):
+    temp_path = history_path + "_copy"
+    copy2(history_path, temp_path)
+    conn = sqlite3.connect(temp_path)
+    rows = conn.execute("""
+        SELECT url, title, last_visit_time
+        FROM urls
+        WHERE last_visit_time > strftime('%s', 'now', 'start of day') * 1000000
+    """).fetchall()
+    epoch = datetime(1601, 1, 1)
+    entries = [{"url": u, "title": t, "visit_time": epoch + timedelta(microseconds=v)} for u, t, v in rows]
+    conn.close()
+    os.remove(temp_path)
+    return entries
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {(time.perf_counter() - start) * 1000:9.2f} ms  {len(result):>7} entries")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--visits", type=int, default=500_000)
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_history_")
+    try:
+        path = os.path.join(workdir, "History")
+        create_history(path, args.visits, args.days)
+        print(f"History: {args.visits:,} visits over {args.days} days, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB")
+
+        timed("original (copy2 + epoch-mismatched filter)", lambda: original_parse(path))
+
+        reader = ChromiumHistoryReader(path)
+        timed("reader, first read", reader.read)
+        timed("reader, file unchanged", reader.read)
+        add_visits(path, 10)
+        timed("reader, 10 new visits", reader.read)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
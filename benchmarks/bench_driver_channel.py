@@ -0,0 +1,56 @@
+"""
+Compare building a fresh APPLICATION_LIST per push (the original
+send_app_list_to_block) with DriverChannel's preallocated buffer and
+change suppression, against the in-memory device transport.
+
+    python -m benchmarks.bench_driver_channel --apps 100 --pushes 2000
+"""
+import argparse
+import time
+
+from core.driver_channel import APPLICATION_LIST, MAX_PATH, DriverChannel, MemoryDeviceTransport
+
+
+def original_push(transport, app_names):
+    transport.open()
+    app_list = APPLICATION_LIST()
+    app_list.Count = len(app_names)
+    buffer = []
+    for app_name in app_names:
+        padded_name = app_name + '\0' * (MAX_PATH - len(app_name))
+        buffer.append(padded_name[:MAX_PATH])
+    app_list.Applications = ''.join(buffer)
+    transport.send(0, app_list)
+    transport.close()
+
+
+def bench(label, fn, pushes):
+    start = time.perf_counter()
+    for i in range(pushes):
+        fn(i)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {elapsed / pushes * 1e6:9.1f} us/push")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--apps", type=int, default=100)
+    parser.add_argument("--pushes", type=int, default=2000)
+    args = parser.parse_args()
+
+    lists = [[f"C:\\Program Files\\Vendor{j}\\app{(i + j) % 500}.exe" for j in range(args.apps)]
+             for i in range(2)]
+
+    transport = MemoryDeviceTransport()
+    bench("original, list changes every push", lambda i: original_push(transport, lists[i % 2]), args.pushes)
+    bench("original, identical list", lambda i: original_push(transport, lists[0]), args.pushes)
+
+    transport = MemoryDeviceTransport()
+    channel = DriverChannel(transport)
+    bench("channel, list changes every push", lambda i: channel.push(lists[i % 2]), args.pushes)
+    bench("channel, identical list", lambda i: channel.push(lists[0]), args.pushes)
+    print(f"channel: {transport.opens} device open(s), {channel.pushes} IOCTLs, {channel.skipped} skipped")
+
+
+if __name__ == "__main__":
+    main()
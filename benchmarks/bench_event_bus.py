@@ -0,0 +1,62 @@
+"""
+EventBus publish cost as seen by the watcher thread, with no subscribers, with
+subscribers that keep up, and with subscribers that never read (drop-oldest).
+
+    python -m benchmarks.bench_event_bus --events 100000
+"""
+import argparse
+import threading
+import time
+
+from service.event_bus import EventBus
+
+
+def publish_all(bus, events):
+    payload = {"app_process_name": "chrome.exe", "app_name": "Google Chrome", "window_title": "x", "pid": 1}
+    begin = time.perf_counter()
+    for _ in range(events):
+        bus.publish("foreground", payload)
+    return (time.perf_counter() - begin) / events * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=100_000)
+    parser.add_argument("--subscribers", type=int, default=4)
+    args = parser.parse_args()
+
+    bus = EventBus(max_subscribers=args.subscribers)
+    print(f"no subscribers:                 {publish_all(bus, args.events):6.2f} us/publish")
+
+    bus = EventBus(max_subscribers=args.subscribers)
+    subscriptions = [bus.subscribe() for _ in range(args.subscribers)]
+    received = [0] * args.subscribers
+
+    def drain(index, subscription):
+        while not subscription.closed:
+            received[index] += len(subscription.get(0.1))
+
+    readers = [threading.Thread(target=drain, args=(i, s)) for i, s in enumerate(subscriptions)]
+    for reader in readers:
+        reader.start()
+    cost = publish_all(bus, args.events)
+    time.sleep(0.3)
+    for subscription in subscriptions:
+        subscription.close()
+    for reader in readers:
+        reader.join()
+    dropped = sum(subscription.dropped for subscription in subscriptions)
+    print(f"{args.subscribers} reading subscribers:          {cost:6.2f} us/publish "
+          f"({sum(received)} delivered, {dropped} dropped)")
+
+    bus = EventBus(max_subscribers=args.subscribers)
+    subscriptions = [bus.subscribe() for _ in range(args.subscribers)]
+    cost = publish_all(bus, args.events)
+    queued = sum(len(subscription.get(0)) for subscription in subscriptions)
+    dropped = sum(subscription.dropped for subscription in subscriptions)
+    print(f"{args.subscribers} stalled subscribers:          {cost:6.2f} us/publish "
+          f"({queued} queued, {dropped} dropped)")
+
+
+if __name__ == "__main__":
+    main()
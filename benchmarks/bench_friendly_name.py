@@ -0,0 +1,73 @@
+"""
+Compare the original per-miss Uninstall-key scan in get_friendly_app_name with
+the InstallLocationIndex lookup, using a fake registry.
+
+    python -m benchmarks.bench_friendly_name --apps 2000
+"""
+import argparse
+import time
+
+from core.installed_software import SoftwareInventory, StaticRegistryProvider
+
+VALUE_NAMES = ("DisplayName", "DisplayVersion", "Publisher", "InstallDate", "UninstallString",
+               "EstimatedSize", "DisplayIcon", "NoModify", "NoRepair", "Language", "URLInfoAbout")
+
+
+def make_entries(count):
+    entries = []
+    for i in range(count):
+        entry = {"name": f"Vendor App {i}", "version": f"1.{i}",
+                 "install_location": f"C:\\Program Files\\Vendor{i % 97}\\App{i}\\" if i % 3 else ""}
+        entries.append(entry)
+    return entries
+
+
+def original_lookup(entries, exe_path):
+    """The original algorithm: for every subkey list all value names, then startswith."""
+    calls = 0
+    for entry in entries:
+        calls += 2  # EnumKey + OpenKey
+        calls += 1  # QueryValueEx DisplayName
+        value_names = list(VALUE_NAMES) + (["InstallLocation"] if entry["install_location"] else [])
+        calls += 1 + len(value_names)  # QueryInfoKey + EnumValue per value
+        if "InstallLocation" in value_names:
+            calls += 1
+            install_location = entry["install_location"]
+            if install_location and exe_path.lower().startswith(install_location.lower()):
+                return entry["name"], calls
+    return None, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--apps", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    entries = make_entries(args.apps)
+    paths = [f"C:\\Program Files\\Vendor{i % 97}\\App{i}\\bin\\app{i}.exe" for i in range(1, args.apps, 2)]
+    paths += ["C:\\Windows\\System32\\notepad.exe"]
+
+    start = time.perf_counter()
+    calls = 0
+    for path in paths[:200]:
+        calls += original_lookup(entries, path)[1]
+    per = (time.perf_counter() - start) / len(paths[:200])
+    print(f"original scan   {per * 1e6:9.1f} us/lookup (excluding registry latency), "
+          f"{calls / len(paths[:200]):,.0f} registry calls/lookup")
+
+    provider = StaticRegistryProvider(entries)
+    inventory = SoftwareInventory(provider)
+    start = time.perf_counter()
+    inventory.refresh()
+    print(f"index build     {(time.perf_counter() - start) * 1000:9.1f} ms, one registry walk")
+
+    start = time.perf_counter()
+    for i in range(args.lookups):
+        inventory.friendly_name(paths[i % len(paths)])
+    per = (time.perf_counter() - start) / args.lookups
+    print(f"index lookup    {per * 1e6:9.1f} us/lookup, 0 registry calls, {provider.walks} walk(s) total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Heartbeat storage: per-beat cost of the old one-row-per-beat INSERT against
+extending the open uptime interval, the migration of a year of per-minute
+rows, and an /uptime query over that year.
+
+    python -m benchmarks.bench_heartbeat --beats 525600
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+BEATS_TIMED = 2000
+
+
+def timed(fn):
+    begin = time.perf_counter()
+    result = fn()
+    return (time.perf_counter() - begin) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--beats", type=int, default=525_600, help="legacy rows to migrate (a year of minutes)")
+    parser.add_argument("--outage-every", type=int, default=1440, help="a 10 minute gap every N beats")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        os.environ["HOME"] = os.environ["USERPROFILE"] = home
+        data_dir = os.path.join(home, "Desktop", "MDM_SERVICE_DATA")
+        os.makedirs(data_dir)
+        db_path = os.path.join(data_dir, "usage.db")
+
+        conn = sqlite3.connect(db_path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE heartbeat (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT)")
+        start = datetime.now().replace(microsecond=0) - timedelta(minutes=args.beats + args.beats // args.outage_every * 10)
+        beat, rows = start, []
+        for i in range(args.beats):
+            rows.append((beat.isoformat(timespec="seconds"),))
+            beat += timedelta(minutes=10 if i and i % args.outage_every == 0 else 1)
+        conn.executemany("INSERT INTO heartbeat (timestamp) VALUES (?)", rows)
+        conn.commit()
+        size_before = os.path.getsize(db_path)
+
+        # The old send_heartbeat(): one INSERT and commit per beat.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        elapsed, _ = timed(lambda: [conn.execute("INSERT INTO heartbeat (timestamp) VALUES (?)", row) or conn.commit()
+                                    for row in rows[:BEATS_TIMED]])
+        conn.execute("DELETE FROM heartbeat WHERE id > ?", (args.beats,))
+        conn.commit()
+        conn.close()
+        print(f"legacy INSERT + commit per beat:       {elapsed * 1000 / BEATS_TIMED:8.1f} us/beat")
+
+        elapsed, heartbeat = timed(lambda: __import__("core.heartbeat", fromlist=["heartbeat"]))
+        from core.storage import get_connection
+        db = get_connection(db_path)
+        intervals = db.execute("SELECT COUNT(*) FROM uptime_intervals").fetchone()[0]
+        db.execute("VACUUM")
+        db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        print(f"migrate {args.beats:,} heartbeat rows:       {elapsed / 1000:8.2f} s -> {intervals} intervals, "
+              f"{size_before / 1e6:.1f} MB -> {os.path.getsize(db_path) / 1e6:.2f} MB")
+
+        heartbeat.send_heartbeat()  # opens the current interval
+        elapsed, _ = timed(lambda: [heartbeat.send_heartbeat() for _ in range(BEATS_TIMED)])
+        print(f"send_heartbeat, extending in memory:   {elapsed * 1000 / BEATS_TIMED:8.1f} us/beat")
+
+        end = datetime.now()
+        elapsed, uptime = timed(lambda: heartbeat.get_uptime(end - timedelta(days=366), end))
+        print(f"/uptime over a year:                   {elapsed:8.1f} ms (availability {uptime['availability']})")
+
+
+if __name__ == "__main__":
+    main()
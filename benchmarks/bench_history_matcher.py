@@ -0,0 +1,79 @@
+"""
+Compare the original per-event fuzz.token_set_ratio scan in
+BrowserHistory.match_event with HistoryIndex.
+
+    python -m benchmarks.bench_history_matcher --entries 100000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from rapidfuzz import fuzz
+
+from core.browser_history.matcher import HistoryIndex
+
+WORDS = ("python", "sqlite", "release", "notes", "weather", "news", "video", "music", "docs",
+         "mail", "inbox", "report", "issue", "pull", "request", "review", "search", "map")
+
+
+def make_entries(count, span):
+    rng = random.Random(7)
+    start = datetime.now() - span
+    step = span / count
+    return [{"url": f"https://example.com/{i}",
+             "title": " ".join(rng.choice(WORDS) for _ in range(5)) + f" {i}",
+             "visit_time": start + step * i}
+            for i in range(count)]
+
+
+def original_match(history, window_title, timestamp):
+    best_match, highest_score = None, 0
+    for entry in history:
+        score = fuzz.token_set_ratio(entry['title'], window_title)
+        if score >= 90:
+            delta = abs((entry['visit_time'] - timestamp).total_seconds())
+            if delta <= 24 * 60 * 60 and score > highest_score:
+                best_match, highest_score = entry['url'], score
+    return best_match
+
+
+def bench(label, fn, events, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for title, when in events:
+            fn(title, when)
+    per_call = (time.perf_counter() - start) / (repeat * len(events))
+    print(f"{label:<36} {per_call * 1000:9.3f} ms/match")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=100_000)
+    parser.add_argument("--hours", type=float, default=16)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    history = make_entries(args.entries, timedelta(hours=args.hours))
+    exact = [(e["title"].title() + " - Google Chrome", e["visit_time"] + timedelta(seconds=30))
+             for e in history[-50:]]
+    unknown = [("Untitled local document - Notepad", datetime.now())]
+    fuzzy = [(e["title"].replace(" ", "  ", 1) + " extra", e["visit_time"]) for e in history[-50:]]
+
+    start = time.perf_counter()
+    index = HistoryIndex()
+    index.sync(history)
+    print(f"index build, {len(index):,} entries: {(time.perf_counter() - start) * 1000:.1f} ms")
+    more = history + make_entries(100, timedelta(minutes=1))
+    start = time.perf_counter()
+    index.sync(more)
+    print(f"incremental sync, +100 entries:     {(time.perf_counter() - start) * 1000:.3f} ms")
+
+    bench("original scan, exact title", lambda t, w: original_match(history, t, w), exact[:2], 1)
+    bench("index, exact title", index.match, exact, args.repeat)
+    bench("index, fuzzy fallback (match)", index.match, fuzzy, 3)
+    bench("index, fuzzy fallback (no match)", index.match, unknown, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
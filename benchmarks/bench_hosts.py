@@ -0,0 +1,89 @@
+"""
+Hosts-file blocking and listing on a temp file: the original append/rescan
+functions against the managed section and its cached, parsed blocklist.
+
+    python -m benchmarks.bench_hosts --domains 100000 --unblock 1000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from core import host_modifier
+
+SYSTEM_LINES = "# Copyright (c) Microsoft Corp.\n127.0.0.1 localhost\n::1 localhost\n"
+
+
+def original_block(path, websites):
+    with open(path, "a") as file:
+        for site in websites:
+            file.write(f"{host_modifier.REDIRECT_IP} {site}\n")
+
+
+def original_unblock(path, websites):
+    with open(path, "r") as file:
+        lines = file.readlines()
+    with open(path, "w") as file:
+        for line in lines:
+            if not any(line.strip().endswith(site) and line.startswith(host_modifier.REDIRECT_IP) for site in websites):
+                file.write(line)
+
+
+def original_read(path):
+    blocked = []
+    with open(path, "r") as file:
+        for line in file:
+            if line.startswith(host_modifier.REDIRECT_IP):
+                parts = line.strip().split()
+                if len(parts) > 1:
+                    blocked.append(parts[1])
+    return blocked
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--domains", type=int, default=100_000)
+    parser.add_argument("--unblock", type=int, default=1000)
+    args = parser.parse_args()
+
+    domains = [f"ads{i}.tracker{i % 977}.example.com" for i in range(args.domains)]
+    to_unblock = domains[::max(1, args.domains // args.unblock)][:args.unblock]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "hosts")
+
+        with open(path, "w") as file:
+            file.write(SYSTEM_LINES)
+        print(f"original block {args.domains:>7} domains:        {timed(lambda: original_block(path, domains)):9.1f} ms")
+        print(f"original block again (file grows):    {timed(lambda: original_block(path, domains)):9.1f} ms, "
+              f"{os.path.getsize(path) / 2**20:.1f} MiB")
+        small = to_unblock[:20]
+        elapsed = timed(lambda: original_unblock(path, small))
+        print(f"original unblock {len(small)} domains:           {elapsed:9.1f} ms "
+              f"(O(lines x sites): ~{elapsed * len(to_unblock) / len(small) / 1000:.0f} s for {len(to_unblock)})")
+
+        with open(path, "w") as file:
+            file.write(SYSTEM_LINES)
+        print(f"managed block {args.domains:>7} domains:         "
+              f"{timed(lambda: host_modifier.block_websites(domains, path)):9.1f} ms")
+        print(f"managed block again (no-op):          "
+              f"{timed(lambda: host_modifier.block_websites(domains, path)):9.1f} ms, "
+              f"{os.path.getsize(path) / 2**20:.1f} MiB")
+        print(f"managed unblock {len(to_unblock)} domains:        "
+              f"{timed(lambda: host_modifier.unblock_websites(to_unblock, path)):9.1f} ms")
+        print(f"original read (full parse per poll):  {timed(lambda: original_read(path)):9.1f} ms, "
+              f"{len(original_read(path))} sites")
+        print(f"cached poll, file unchanged:          "
+              f"{timed(lambda: host_modifier.get_blocked_websites(path)) * 1000:9.1f} us")
+        print(f"cached poll, prefix page of 50:       "
+              f"{timed(lambda: host_modifier.get_blocked_websites(path).with_prefix('ads4')[:50]) * 1000:9.1f} us")
+
+
+if __name__ == "__main__":
+    main()
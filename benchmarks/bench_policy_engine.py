@@ -0,0 +1,146 @@
+"""
+Compare the original evaluate_time_policies algorithm (reload all rules from
+SQLite and strptime per app, one usage query per app) against the compiled
+rule set with one batched usage lookup.
+
+    python -m benchmarks.bench_policy_engine --rules 10000
+"""
+import argparse
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+from core.policy_engine import CompiledRuleSet
+from core.storage import get_connection
+
+
+def make_rules(count):
+    rng = random.Random(42)
+    rules = []
+    for i in range(count):
+        kind = i % 3
+        start = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}"
+        end = f"{rng.randrange(24):02d}:{rng.randrange(60):02d}"
+        rules.append((f"app{i}.exe", kind == 0, 3600 if kind == 1 else None,
+                      start if kind == 2 else None, end if kind == 2 else None, None))
+    return rules
+
+
+def create_db(path, rules):
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE app_block_rules (
+            app_name TEXT PRIMARY KEY, always_blocked BOOLEAN DEFAULT 0,
+            usage_limit_seconds INTEGER DEFAULT NULL, time_start TEXT DEFAULT NULL,
+            time_end TEXT DEFAULT NULL, notes TEXT DEFAULT NULL)
+    ''')
+    conn.executemany("INSERT INTO app_block_rules VALUES (?, ?, ?, ?, ?, ?)", rules)
+    conn.execute('''
+        CREATE TABLE daily_usage (day TEXT, app_process_name TEXT, seconds INTEGER,
+                                  PRIMARY KEY (day, app_process_name)) WITHOUT ROWID
+    ''')
+    today = datetime.now().strftime('%Y-%m-%d')
+    conn.executemany("INSERT INTO daily_usage VALUES (?, ?, ?)",
+                     [(today, r[0], i * 7 % 7200) for i, r in enumerate(rules)])
+    conn.commit()
+    conn.close()
+
+
+def load_rules(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute('''
+        SELECT app_name, always_blocked, usage_limit_seconds, time_start, time_end, notes
+        FROM app_block_rules
+    ''').fetchall()
+    conn.close()
+    return [{'app_name': r[0], 'always_blocked': bool(r[1]), 'usage_limit_seconds': r[2],
+             'time_start': r[3], 'time_end': r[4], 'notes': r[5]} for r in rows]
+
+
+def usage_for(path, app_name, today):
+    conn = sqlite3.connect(path)
+    row = conn.execute("SELECT seconds FROM daily_usage WHERE day = ? AND app_process_name = ?",
+                       (today, app_name)).fetchone()
+    conn.close()
+    return row[0] if row else 0
+
+
+def baseline_evaluate(path):
+    today = datetime.now().strftime('%Y-%m-%d')
+    blocked = []
+    for rule in load_rules(path):
+        app_name = rule['app_name']
+        if rule['always_blocked']:
+            blocked.append(app_name)
+            continue
+        time_blocked = False
+        for other in load_rules(path):
+            if other['app_name'] == app_name and other['time_start'] and other['time_end']:
+                now = datetime.now().time()
+                start = datetime.strptime(other['time_start'], '%H:%M').time()
+                end = datetime.strptime(other['time_end'], '%H:%M').time()
+                if (start <= now <= end) if start <= end else (now >= start or now <= end):
+                    time_blocked = True
+        if time_blocked:
+            blocked.append(app_name)
+            continue
+        for other in load_rules(path):
+            if other['app_name'] == app_name and other['usage_limit_seconds']:
+                if usage_for(path, app_name, today) >= other['usage_limit_seconds']:
+                    blocked.append(app_name)
+                    break
+    return blocked
+
+
+def compiled_evaluate(path, rules):
+    conn = get_connection(path)
+    today = datetime.now().strftime('%Y-%m-%d')
+    usage = dict(conn.execute(
+        "SELECT app_process_name, seconds FROM daily_usage WHERE day = ?", (today,)
+    ).fetchall())
+    return rules.apps_to_block(datetime.now().time(), usage)
+
+
+def timed(fn, *args, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(*args)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rules", type=int, default=10_000)
+    parser.add_argument("--baseline-rules", type=int, default=500,
+                        help="The original algorithm is quadratic; run it on a smaller rule set")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_policy_")
+    try:
+        small = os.path.join(workdir, "small.db")
+        large = os.path.join(workdir, "large.db")
+        create_db(small, make_rules(args.baseline_rules))
+        create_db(large, make_rules(args.rules))
+
+        seconds, blocked = timed(baseline_evaluate, small)
+        print(f"original  {args.baseline_rules:>6} rules  {seconds * 1000:10.1f} ms/eval  ({len(blocked)} blocked)")
+
+        small_rules = CompiledRuleSet(load_rules(small))
+        seconds, blocked = timed(compiled_evaluate, small, small_rules, repeat=args.repeat)
+        print(f"compiled  {args.baseline_rules:>6} rules  {seconds * 1000:10.3f} ms/eval  ({len(blocked)} blocked)")
+
+        compile_seconds, rules = timed(lambda: CompiledRuleSet(load_rules(large)))
+        seconds, blocked = timed(compiled_evaluate, large, rules, repeat=args.repeat)
+        print(f"compiled  {args.rules:>6} rules  {seconds * 1000:10.3f} ms/eval  ({len(blocked)} blocked, "
+              f"compile {compile_seconds * 1000:.1f} ms)")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
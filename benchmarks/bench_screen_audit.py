@@ -0,0 +1,84 @@
+"""
+Storage and time cost of periodic audit screenshots: the original full PNG per
+frame against dHash deduplication, over a synthetic session in which the screen
+mostly only changes by a blinking cursor and a clock, with occasional window
+switches.
+
+    python -m benchmarks.bench_screen_audit --frames 120 --switch-every 15
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from PIL import ImageDraw
+
+from core.screen_audit import ScreenAudit, dhash
+from core.screenshot import CaptureBackend, SyntheticCaptureBackend
+
+
+class SessionBackend(CaptureBackend):
+    def __init__(self, width, height, switch_every):
+        self.base = SyntheticCaptureBackend(width, height).frame
+        self.switch_every = switch_every
+        self.tick = 0
+
+    def grab(self):
+        frame = self.base.copy()
+        draw = ImageDraw.Draw(frame)
+        width, height = frame.size
+        draw.text((width - 120, height - 30), f"10:{self.tick % 60:02d}", fill=(255, 255, 255))
+        if self.tick % 2:
+            draw.rectangle((200, 200, 202, 220), fill=(0, 0, 0))  # cursor
+        window = self.tick // self.switch_every
+        if window:
+            shade = (window * 53) % 256
+            left = (window * 397) % (width // 2)
+            top = (window * 211) % (height // 2)
+            draw.rectangle((left, top, left + width // 2, top + height // 2), fill=(shade, 255 - shade, 128))
+        self.tick += 1
+        return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--frames", type=int, default=120)
+    parser.add_argument("--switch-every", type=int, default=15)
+    args = parser.parse_args()
+
+    backend = SessionBackend(args.width, args.height, args.switch_every)
+    original_bytes = 0
+    start = time.perf_counter()
+    for _ in range(args.frames):
+        buffer = io.BytesIO()
+        backend.grab().save(buffer, "PNG")
+        original_bytes += buffer.tell()
+    original_time = time.perf_counter() - start
+    print(f"original: {args.frames} PNG frames, {original_bytes / 2**20:8.1f} MiB, "
+          f"{original_time / args.frames * 1000:6.1f} ms/frame")
+
+    frame = backend.grab()
+    start = time.perf_counter()
+    for _ in range(20):
+        dhash(frame)
+    print(f"dhash of one {args.width}x{args.height} frame: {(time.perf_counter() - start) / 20 * 1000:.1f} ms")
+
+    with tempfile.TemporaryDirectory() as directory:
+        backend.tick = 0
+        audit = ScreenAudit(backend, audit_dir=directory, db_path=os.path.join(directory, "index.db"))
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            audit.capture_once()
+        elapsed = time.perf_counter() - start
+        stats = audit.stats()
+        print(f"dedup:    {stats['frames_kept']} kept / {stats['frames_skipped']} skipped, "
+              f"{stats['bytes_written'] / 2**20:8.1f} MiB written, {stats['bytes_saved'] / 2**20:.1f} MiB saved "
+              f"by skipping, {elapsed / args.frames * 1000:6.1f} ms/frame")
+        audit.shutdown()
+
+
+if __name__ == "__main__":
+    main()
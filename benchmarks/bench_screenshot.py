@@ -0,0 +1,72 @@
+"""
+Encode cost of the original full-resolution PNG screenshot against the
+ScreenshotService formats and downscaling, using synthetic 4K frames.
+
+    python -m benchmarks.bench_screenshot --width 3840 --height 2160 --concurrency 4
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.screenshot import RetentionPolicy, ScreenshotService, SyntheticCaptureBackend
+
+CASES = [
+    ("png", 80, None),
+    ("png", 80, 1920),
+    ("jpeg", 80, None),
+    ("jpeg", 70, 1920),
+    ("jpeg", 70, 1280),
+    ("webp", 70, 1920),
+]
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    backend = SyntheticCaptureBackend(args.width, args.height)
+
+    def original():
+        buffer = io.BytesIO()
+        backend.grab().save(buffer, "PNG")
+        return buffer.tell()
+
+    elapsed, size = timed(original, args.repeat)
+    print(f"original png (level 6) {args.width}x{args.height}: {elapsed * 1000:7.1f} ms  {size / 1024:8.0f} KiB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        service = ScreenshotService(backend, screenshot_dir=directory,
+                                    retention=RetentionPolicy(max_files=5))
+        for fmt, quality, max_dim in CASES:
+            elapsed, shot = timed(lambda: service.capture(fmt, quality, max_dim), args.repeat)
+            print(f"{fmt:5} q={quality:<3} max_dim={str(max_dim):5} {shot.width}x{shot.height}: "
+                  f"{elapsed * 1000:7.1f} ms  {len(shot.data) / 1024:8.0f} KiB")
+
+        requests = args.concurrency * 4
+        with ThreadPoolExecutor(args.concurrency) as clients:
+            start = time.perf_counter()
+            list(clients.map(lambda _: service.capture("jpeg", 70, 1920, save=True), range(requests)))
+            elapsed = time.perf_counter() - start
+        print(f"{requests} saved jpeg captures from {args.concurrency} clients: {elapsed * 1000:.0f} ms, "
+              f"{len(os.listdir(directory))} file(s) kept by retention")
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
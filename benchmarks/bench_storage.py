@@ -0,0 +1,119 @@
+"""
+Compare per-call sqlite3.connect() against the shared core.storage connections
+for the watcher's usage write path on a large app_usage table.
+
+    python -m benchmarks.bench_storage --rows 2000000 --ticks 2000
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from core import storage
+
+CREATE_APP_USAGE = '''
+    CREATE TABLE IF NOT EXISTS app_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TEXT,
+        app_process_name TEXT,
+        app_name TEXT,
+        window_title TEXT,
+        pid INTEGER,
+        app_icon TEXT,
+        duration INTEGER,
+        url TEXT
+    )
+'''
+INSERT_SQL = '''
+    INSERT INTO app_usage (timestamp, app_process_name, app_name, window_title, pid, app_icon, duration, url)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+UPDATE_SQL = '''
+    UPDATE app_usage
+    SET timestamp=?, app_process_name=?, app_name=?, window_title=?, pid=?, app_icon=?, duration=?, url=?
+    WHERE id=(SELECT MAX(id) FROM app_usage)
+'''
+
+
+def make_row(i):
+    app = f"app{i % 50}.exe"
+    return ("2024-01-01T00:00:00", app, app, f"Window {i % 1000}", 1000 + i % 50,
+            f"C:/icons/{app}.ico", i % 600, None)
+
+
+def populate(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_APP_USAGE)
+    batch = 100_000
+    for start in range(0, rows, batch):
+        conn.executemany(INSERT_SQL, (make_row(i) for i in range(start, min(rows, start + batch))))
+    conn.commit()
+    conn.close()
+
+
+def tick_rows(ticks):
+    # Mirrors track_active_app: one insert per app switch, updates in between.
+    for i in range(ticks):
+        yield i % 30 == 0, make_row(i)
+
+
+def run_per_call_connect(path, ticks):
+    latencies = []
+    for is_insert, row in tick_rows(ticks):
+        start = time.perf_counter()
+        conn = sqlite3.connect(path)
+        cursor = conn.cursor()
+        cursor.execute(INSERT_SQL if is_insert else UPDATE_SQL, row)
+        conn.commit()
+        conn.close()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_shared_connection(path, ticks):
+    latencies = []
+    for is_insert, row in tick_rows(ticks):
+        start = time.perf_counter()
+        conn = storage.get_connection(path)
+        with conn:
+            conn.execute(INSERT_SQL if is_insert else UPDATE_SQL, row)
+        latencies.append(time.perf_counter() - start)
+    storage.close_connections()
+    return latencies
+
+
+def report(label, latencies):
+    total = sum(latencies)
+    p99 = statistics.quantiles(latencies, n=100)[98]
+    print(f"{label:<22} {len(latencies) / total:>10.1f} ticks/s   "
+          f"p50 {statistics.median(latencies) * 1000:7.3f} ms   p99 {p99 * 1000:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--ticks", type=int, default=2000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_storage_")
+    try:
+        seed = os.path.join(workdir, "seed.db")
+        print(f"Populating {args.rows:,} app_usage rows...")
+        populate(seed, args.rows)
+
+        before = os.path.join(workdir, "before.db")
+        after = os.path.join(workdir, "after.db")
+        shutil.copy(seed, before)
+        shutil.copy(seed, after)
+
+        report("per-call connect", run_per_call_connect(before, args.ticks))
+        report("core.storage", run_shared_connection(after, args.ticks))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
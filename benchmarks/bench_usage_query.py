@@ -0,0 +1,115 @@
+"""
+/usage query cost on a large synthetic app_usage table: the ts migration and
+hourly_usage backfill, then a 30-day hourly query against the rollup compared
+with aggregating the raw rows (through the ts index, and by text timestamp).
+
+    python -m benchmarks.bench_usage_query --rows 5000000 --days 365
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from core.storage import get_connection
+from core.usage_query import query_usage
+from core.usage_rollup import backfill_hourly_usage, migrate_app_usage_ts
+
+APP_USAGE_SCHEMA = '''
+    CREATE TABLE app_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, app_process_name TEXT, app_name TEXT,
+        window_title TEXT, pid INTEGER, app_icon TEXT, duration INTEGER, url TEXT
+    )
+'''
+
+
+def populate(db_path, rows, days):
+    """The pre-migration schema (ISO text timestamps only), rows spread evenly over days."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(APP_USAGE_SCHEMA)
+    rng = random.Random(7)
+    start = datetime.now().replace(microsecond=0) - timedelta(days=days)
+    step = days * 86400 / rows
+    apps = [(f"app{i}.exe", f"Application {i}") for i in range(40)]
+    urls = [None] * 20 + [f"https://site{i}.example.com/" for i in range(300)]
+
+    def generate():
+        for i in range(rows):
+            process, name = apps[int(rng.paretovariate(1.2)) % len(apps)]
+            yield ((start + timedelta(seconds=i * step)).isoformat(timespec="seconds"), process, name,
+                   "window", 1000, None, rng.randint(1, 120), rng.choice(urls))
+
+    conn.executemany('''
+        INSERT INTO app_usage (timestamp, app_process_name, app_name, window_title, pid, app_icon, duration, url)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', generate())
+    conn.commit()
+    conn.close()
+    return start
+
+
+def timed(fn, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - begin)
+    return best * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        db_path = os.path.join(directory, "usage.db")
+        elapsed, _ = timed(lambda: populate(db_path, args.rows, args.days))
+        print(f"populate {args.rows:,} rows over {args.days} days: {elapsed / 1000:.1f} s")
+
+        conn = get_connection(db_path)
+        end = datetime.now()
+        start = end - timedelta(days=30)
+        start_iso, end_iso = start.isoformat(timespec="seconds"), end.isoformat(timespec="seconds")
+
+        elapsed, (rows,) = timed(lambda: conn.execute('''
+            SELECT COUNT(*) FROM (SELECT substr(timestamp, 1, 13), app_process_name, SUM(duration)
+            FROM app_usage WHERE timestamp >= ? AND timestamp < ? GROUP BY 1, 2)
+        ''', (start_iso, end_iso)).fetchone())
+        print(f"raw rows, text timestamp scan, 30d hourly by app:   {elapsed:8.1f} ms ({rows} groups)")
+
+        elapsed, filled = timed(lambda: migrate_app_usage_ts(conn))
+        print(f"migrate_app_usage_ts: {filled:,} rows in {elapsed / 1000:.1f} s")
+        elapsed, count = timed(lambda: backfill_hourly_usage(db_path))
+        print(f"backfill_hourly_usage: {count:,} rollup rows in {elapsed / 1000:.1f} s")
+
+        elapsed, (rows,) = timed(lambda: conn.execute('''
+            SELECT COUNT(*) FROM (SELECT ts / 3600, app_process_name, SUM(duration)
+            FROM app_usage WHERE ts >= ? AND ts < ? GROUP BY 1, 2)
+        ''', (int(start.timestamp()), int(end.timestamp()))).fetchone(), repeat=3)
+        print(f"raw rows via ts index, 30d hourly by app:          {elapsed:8.1f} ms ({rows} groups)")
+
+        for granularity, group_by in (("hour", "app"), ("hour", "url"), ("day", "app_name")):
+            def page_through():
+                total, cursor = 0, None
+                while True:
+                    page = query_usage(start, end, granularity, group_by, cursor, limit=10000, db_path=db_path)
+                    total += len(page["data"])
+                    cursor = page["next_cursor"]
+                    if cursor is None:
+                        return total
+            elapsed, total = timed(page_through, repeat=3)
+            print(f"/usage 30d granularity={granularity:4} group_by={group_by:8}     {elapsed:8.1f} ms "
+                  f"({total} rows, all pages)")
+            elapsed, page = timed(lambda: query_usage(start, end, granularity, group_by, limit=1000,
+                                                      db_path=db_path), repeat=3)
+            print(f"    first page of 1000:                            {elapsed:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Usage retention on a large app_usage table: rows compacted, bytes reclaimed, and
+the longest stall seen by a concurrent writer (standing in for the watcher),
+for batched deletes against one single DELETE of the same rows.
+
+    python -m benchmarks.bench_usage_retention --rows 2000000 --days 120 --raw-days 30
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_usage_query import populate
+from core.storage import get_connection, close_connections
+from core.usage_retention import UsageRetentionPolicy, enable_incremental_vacuum
+from core.usage_rollup import backfill_hourly_usage, migrate_app_usage_ts
+
+
+class Writer(threading.Thread):
+    """Inserts one app_usage row every interval and records the slowest insert."""
+
+    def __init__(self, db_path, interval=0.01):
+        super().__init__(daemon=True)
+        self.db_path = db_path
+        self.interval = interval
+        self.worst = 0.0
+        self.writes = 0
+        self.done = threading.Event()
+
+    def run(self):
+        conn = get_connection(self.db_path)
+        while not self.done.is_set():
+            begin = time.perf_counter()
+            with conn:
+                conn.execute("INSERT INTO app_usage (timestamp, app_process_name, duration, ts) VALUES (?, ?, ?, ?)",
+                             ("2099-01-01T00:00:00", "writer.exe", 1, int(time.time())))
+            self.worst = max(self.worst, time.perf_counter() - begin)
+            self.writes += 1
+            time.sleep(self.interval)
+
+
+def with_writer(db_path, fn):
+    writer = Writer(db_path)
+    writer.start()
+    begin = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - begin
+    writer.done.set()
+    writer.join()
+    return elapsed, writer.worst * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--raw-days", type=int, default=30)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "source.db")
+        populate(source, args.rows, args.days)
+        conn = get_connection(source)
+        migrate_app_usage_ts(conn)
+        backfill_hourly_usage(source)
+        enable_incremental_vacuum(conn)  # as init_db() does at startup
+        close_connections()  # checkpoints the WAL so the copies below are complete
+        print(f"{args.rows:,} rows over {args.days} days, {os.path.getsize(source) / 1e6:.0f} MB; "
+              f"keeping {args.raw_days} days of raw rows")
+
+        single = os.path.join(directory, "single.db")
+        shutil.copy(source, single)
+        cutoff = int(time.time()) - args.raw_days * 86400
+
+        def delete_at_once():
+            db = get_connection(single)
+            with db:
+                return db.execute("DELETE FROM app_usage WHERE ts < ?", (cutoff,)).rowcount
+
+        elapsed, worst, deleted = with_writer(single, delete_at_once)
+        print(f"single DELETE:  {deleted:,} rows in {elapsed:5.1f} s, slowest concurrent insert {worst:7.1f} ms")
+
+        batched = os.path.join(directory, "batched.db")
+        shutil.copy(source, batched)
+        policy = UsageRetentionPolicy(raw_days=args.raw_days, hourly_days=None, batch_size=args.batch_size)
+        elapsed, worst, report = with_writer(batched, lambda: policy.apply(batched))
+        print(f"retention job:  {report['raw_rows_deleted']:,} rows in {elapsed:5.1f} s, slowest concurrent insert "
+              f"{worst:7.1f} ms ({report['batches']} batches)")
+        print(f"                {report['bytes_before'] / 1e6:.0f} MB -> {report['bytes_after'] / 1e6:.0f} MB, "
+              f"{report['bytes_reclaimed'] / 1e6:.0f} MB reclaimed, {report['pages_vacuumed']} pages vacuumed")
+
+
+if __name__ == "__main__":
+    main()
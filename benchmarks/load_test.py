@@ -0,0 +1,120 @@
+"""
+Load test of the API under each server mode: requests/sec and latency
+percentiles for /todays_usage and /get-blocked-apps.
+
+Starts each mode in-process on a local port (the clients run in separate
+processes so they do not compete with the server for the GIL):
+
+    python -m benchmarks.load_test --modes dev threaded waitress --clients 16 --duration 5
+
+or targets an already running service:
+
+    python -m benchmarks.load_test --url http://127.0.0.1:5000 --clients 16
+"""
+import argparse
+import http.client
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+ENDPOINTS = ("/todays_usage", "/get-blocked-apps")
+
+
+def client_loop(base_url, path, duration):
+    """One client: sequential GETs on fresh connections for duration seconds. Returns (latencies, errors)."""
+    url = urlsplit(base_url)
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn = http.client.HTTPConnection(url.hostname, url.port, timeout=30)
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status != 200:
+                errors += 1
+                continue
+        except OSError:
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else float("nan")
+
+
+def run_load(base_url, path, clients, duration):
+    with ProcessPoolExecutor(clients) as pool:
+        results = list(pool.map(client_loop, [base_url] * clients, [path] * clients, [duration] * clients))
+    latencies = [latency for result in results for latency in result[0]]
+    errors = sum(result[1] for result in results)
+    return len(latencies) / duration, percentile(latencies, 50), percentile(latencies, 99), errors
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_listening(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def report(label, base_url, args):
+    for path in ENDPOINTS:
+        run_load(base_url, path, min(args.clients, 2), 0.5)  # warm-up
+        rps, p50, p99, errors = run_load(base_url, path, args.clients, args.duration)
+        print(f"{label:9} {path:18} {rps:8.0f} req/s   p50 {p50 * 1000:7.2f} ms   p99 {p99 * 1000:7.2f} ms"
+              f"   errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url")
+    parser.add_argument("--modes", nargs="+", default=["dev", "threaded", "waitress"])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    if args.url:
+        report("remote", args.url, args)
+        return
+
+    from api_server import app
+    from service.server_runner import ServerConfig, create_server_runner
+
+    for mode in args.modes:
+        port = free_port()
+        config = ServerConfig(mode=mode, host="127.0.0.1", port=port, threads=args.threads,
+                              backlog=256, connection_limit=max(100, args.clients * 2))
+        try:
+            runner = create_server_runner(app, config)
+        except RuntimeError as e:
+            print(f"{mode:9} skipped: {e}")
+            continue
+        runner.start()
+        wait_listening(port)
+        report(mode, f"http://127.0.0.1:{port}", args)
+        start = time.perf_counter()
+        runner.stop()
+        print(f"{mode:9} stop() took {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
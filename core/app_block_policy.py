@@ -1,9 +1,14 @@
 import os
 import sqlite3
 import logging
+import threading
+from contextlib import contextmanager
 from datetime import datetime
-from core.app_block_using_driver import set_blocked_apps, get_all_blocked_apps, DB_PATH
-from core.app_monitor import get_app_usage_today
+from core.app_block_using_driver import set_blocked_apps, get_all_blocked_apps, refresh_driver, resync_pending, DB_PATH
+from core.app_monitor import get_app_usage_today, get_all_app_usage_today
+from core.policy_engine import CompiledRuleSet
+from core.storage import get_connection
+from service.event_bus import event_bus
 from config.config import DATA_DIR
 
 logging.basicConfig(
@@ -13,11 +18,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger('app_block_policy')
 
+_compiled_rules = None
+_compiled_lock = threading.Lock()
+_local = threading.local()  # last PRAGMA data_version seen on this thread's connection
+
+# Set whenever rules are edited in-process so the watcher's policy scheduler wakes early.
+rules_changed = threading.Event()
+
+# Per-thread deferred_policy_evaluation() nesting depth, and whether an evaluation was skipped meanwhile
+_deferral = threading.local()
+
 
 def get_app_block_rules():
     """Get all app block rules from database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    cursor = get_connection(DB_PATH).cursor()
 
     try:
         cursor.execute("""
@@ -37,18 +51,16 @@ def get_app_block_rules():
                 'notes': rule[5]
             })
 
-        conn.close()
         return result
     except sqlite3.Error as e:
         logger.error(f"Database error while getting rules: {str(e)}")
-        conn.close()
         return []
 
 
 def add_app_block_rule(app_name, always_blocked=False, usage_limit_seconds=None,
                        time_start=None, time_end=None, notes=None):
     """Add or update a rule for blocking an app"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cursor = conn.cursor()
 
     try:
@@ -59,7 +71,7 @@ def add_app_block_rule(app_name, always_blocked=False, usage_limit_seconds=None,
         """, (app_name, always_blocked, usage_limit_seconds, time_start, time_end, notes))
 
         conn.commit()
-        conn.close()
+        invalidate_compiled_rules()
 
         evaluate_time_policies()
 
@@ -69,7 +81,6 @@ def add_app_block_rule(app_name, always_blocked=False, usage_limit_seconds=None,
         }
     except sqlite3.Error as e:
         conn.rollback()
-        conn.close()
         logger.error(f"Database error adding app block rule: {str(e)}")
         return {
             "status": "error",
@@ -79,7 +90,7 @@ def add_app_block_rule(app_name, always_blocked=False, usage_limit_seconds=None,
 
 def remove_app_block_rule(app_name):
     """Remove a rule for a specific app"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cursor = conn.cursor()
 
     try:
@@ -87,7 +98,7 @@ def remove_app_block_rule(app_name):
             "DELETE FROM app_block_rules WHERE app_name = ?", (app_name,))
 
         conn.commit()
-        conn.close()
+        invalidate_compiled_rules()
 
         evaluate_time_policies()
 
@@ -97,7 +108,6 @@ def remove_app_block_rule(app_name):
         }
     except sqlite3.Error as e:
         conn.rollback()
-        conn.close()
         logger.error(f"Database error removing app block rule: {str(e)}")
         return {
             "status": "error",
@@ -105,91 +115,123 @@ def remove_app_block_rule(app_name):
         }
 
 
-def is_app_time_blocked(app_name):
-    """Check if an app is blocked based on current time"""
-    rules = get_app_block_rules()
-
-    for rule in rules:
-        if rule['app_name'] == app_name and rule['time_start'] and rule['time_end']:
-            current_time = datetime.now().time()
+def invalidate_compiled_rules():
+    """Drop the compiled rule set so the next evaluation reloads app_block_rules."""
+    global _compiled_rules
+    with _compiled_lock:
+        _compiled_rules = None
+    rules_changed.set()
 
-            try:
-                start_time = datetime.strptime(
-                    rule['time_start'], '%H:%M').time()
-                end_time = datetime.strptime(rule['time_end'], '%H:%M').time()
 
-                if start_time <= end_time:
-                    if start_time <= current_time <= end_time:
-                        return True
-                else:
-                    if current_time >= start_time or current_time <= end_time:
-                        return True
-            except ValueError:
-                logger.error(f"Invalid time format for app {app_name}")
+def get_compiled_rules():
+    """
+    Return the compiled rule set, rebuilding it only when the rules changed.
 
-    return False
+    In-process edits invalidate it directly. Edits made through another connection
+    are caught by PRAGMA data_version, which SQLite bumps on this connection
+    whenever any other connection commits to the database.
+    """
+    global _compiled_rules
+    try:
+        version = get_connection(DB_PATH).execute("PRAGMA data_version").fetchone()[0]
+        last_version = getattr(_local, 'data_version', None)
+        _local.data_version = version
+        if last_version is not None and version != last_version:
+            invalidate_compiled_rules()
+    except sqlite3.Error as e:
+        logger.error(f"Database error reading data_version: {str(e)}")
 
+    with _compiled_lock:
+        if _compiled_rules is None:
+            _compiled_rules = CompiledRuleSet(get_app_block_rules())
+        return _compiled_rules
 
-def is_app_usage_limited(app_name):
-    """Check if an app has exceeded its usage limit"""
-    rules = get_app_block_rules()
 
-    for rule in rules:
-        if rule['app_name'] == app_name and rule['usage_limit_seconds']:
-            current_usage = get_app_usage_today(app_name)
+def is_app_time_blocked(app_name):
+    """Check if an app is blocked based on current time"""
+    rule = get_compiled_rules().get(app_name)
+    return bool(rule) and rule.is_time_blocked(datetime.now().time())
 
-            if current_usage >= rule['usage_limit_seconds']:
-                return True
 
-    return False
+def is_app_usage_limited(app_name):
+    """Check if an app has exceeded its usage limit"""
+    rule = get_compiled_rules().get(app_name)
+    if not rule or not rule.usage_limit_seconds:
+        return False
+    return rule.is_usage_limited(get_app_usage_today(app_name))
+
+
+@contextmanager
+def deferred_policy_evaluation():
+    """
+    Run evaluate_time_policies() at most once, when the block exits.
+
+    Calls made by this thread inside the block (from rule edits) only record that
+    an evaluation is due; the outermost exit performs it if any was requested.
+    Evaluations on other threads, such as the watcher's, are not affected.
+    """
+    _deferral.depth = getattr(_deferral, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _deferral.depth -= 1
+        run = _deferral.depth == 0 and getattr(_deferral, "pending", False)
+        if run:
+            _deferral.pending = False
+            evaluate_time_policies()
 
 
 def evaluate_time_policies():
-    """Evaluate all time-based policies and update blocked apps list"""
+    """
+    Evaluate all time-based policies and update blocked apps list.
+    Returns None when deferred by deferred_policy_evaluation().
+    """
+    if getattr(_deferral, "depth", 0) > 0:
+        _deferral.pending = True
+        return None
+
     try:
         logger.info("Evaluating time-based policies")
 
         currently_blocked = get_all_blocked_apps()
 
-        rules = get_app_block_rules()
-        apps_to_block = []
+        rules = get_compiled_rules()
+        usage = get_all_app_usage_today()
+        apps_to_block = rules.apps_to_block(datetime.now().time(), usage)
 
-        for rule in rules:
-            app_name = rule['app_name']
-
-            if rule['always_blocked']:
-                apps_to_block.append(app_name)
-                continue
-
-            print("Checking for time based block" + app_name)
-            if is_app_time_blocked(app_name):
-                apps_to_block.append(app_name)
-                continue
-
-            print("Checking for usage based block" + app_name)
-            if is_app_usage_limited(app_name):
-                apps_to_block.append(app_name)
-                continue
-
-        if set(apps_to_block) != set(currently_blocked):
-            print(f"Updating blocked apps list: {apps_to_block}")
+        changed = set(apps_to_block) != set(currently_blocked)
+        if changed or resync_pending():
+            logger.info(f"Updating blocked apps list: {apps_to_block}")
             set_blocked_apps(apps_to_block)
+        else:
+            refresh_driver()
 
+        event_bus.publish("policy", {"apps_to_block": sorted(apps_to_block), "changed": changed})
         return apps_to_block
     except Exception as e:
         logger.error(f"Error evaluating time policies: {str(e)}")
         return []
 
 
+def get_next_policy_change(foreground_app=None):
+    """Datetime at which evaluate_time_policies() should next run, or None if no rule depends on time."""
+    rules = get_compiled_rules()
+    foreground_usage = 0
+    if foreground_app and rules.get(foreground_app):
+        foreground_usage = get_app_usage_today(foreground_app)
+    return rules.next_change_at(datetime.now(), foreground_app, foreground_usage)
+
+
 def get_formatted_app_rules():
     """Get all app rules formatted for display"""
     rules = get_app_block_rules()
+    usage = get_all_app_usage_today()
 
     formatted_rules = []
 
     for rule in rules:
         app_name = rule['app_name']
-        current_usage = get_app_usage_today(app_name)
+        current_usage = usage.get(app_name, 0)
         usage_limit = rule['usage_limit_seconds']
 
         time_restriction = "None"
@@ -217,7 +259,7 @@ def get_formatted_app_rules():
 def init_app_block_db():
     """Initialize the SQLite database for app blocking"""
     os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -232,6 +274,5 @@ def init_app_block_db():
     ''')
     
     conn.commit()
-    conn.close()
 
 init_app_block_db()
\ No newline at end of file
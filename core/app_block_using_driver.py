@@ -1,215 +1,114 @@
-import ctypes
-from ctypes import wintypes
 import os
+import logging
 import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from config.config import DATA_DIR
+from core.driver_channel import DriverChannel, Win32DeviceTransport, DEVICE_PATH
+from core.storage import get_connection
+from service.event_bus import event_bus
 
 #db path
 DB_PATH = os.path.join(DATA_DIR, "app_block.db")
 
-# Constants
-FILE_DEVICE_UNKNOWN = 0x00000022
-METHOD_BUFFERED = 0
-FILE_ANY_ACCESS = 0
-MAX_PATH = 260
-
-# CTL_CODE macro equivalent in Python
-def CTL_CODE(DeviceType, Function, Method, Access):
-    return ((DeviceType << 16) | (Access << 14) | (Function << 2) | Method)
-
-# Define IOCTL code
-IOCTL_RECEIVE_APP_LIST = CTL_CODE(FILE_DEVICE_UNKNOWN, 0x800, METHOD_BUFFERED, FILE_ANY_ACCESS)
-
-GENERIC_READ = 0x80000000
-GENERIC_WRITE = 0x40000000
-OPEN_EXISTING = 3
-DEVICE_PATH = r'\\.\PWAppListDevice'
-
-# Load kernel32.dll
-kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
-
-# Define CreateFile function
-CreateFile = kernel32.CreateFileW
-CreateFile.argtypes = [
-    wintypes.LPCWSTR,  # lpFileName
-    wintypes.DWORD,    # dwDesiredAccess
-    wintypes.DWORD,    # dwShareMode
-    wintypes.LPVOID,   # lpSecurityAttributes
-    wintypes.DWORD,    # dwCreationDisposition
-    wintypes.DWORD,    # dwFlagsAndAttributes
-    wintypes.HANDLE    # hTemplateFile
-]
-CreateFile.restype = wintypes.HANDLE
-
-# Define DeviceIoControl function
-DeviceIoControl = kernel32.DeviceIoControl
-DeviceIoControl.argtypes = [
-    wintypes.HANDLE,   # hDevice
-    wintypes.DWORD,    # dwIoControlCode
-    wintypes.LPVOID,   # lpInBuffer
-    wintypes.DWORD,    # nInBufferSize
-    wintypes.LPVOID,   # lpOutBuffer
-    wintypes.DWORD,    # nOutBufferSize
-    ctypes.POINTER(wintypes.DWORD),  # lpBytesReturned
-    wintypes.LPVOID    # lpOverlapped
-]
-DeviceIoControl.restype = wintypes.BOOL
-
-# Define CloseHandle function
-CloseHandle = kernel32.CloseHandle
-CloseHandle.argtypes = [wintypes.HANDLE]
-CloseHandle.restype = wintypes.BOOL
-
-# Define the APPLICATION_LIST structure
-class APPLICATION_LIST(ctypes.Structure):
-    _fields_ = [
-        ("Count", wintypes.ULONG),
-        ("Applications", wintypes.WCHAR * (MAX_PATH * 100))  # Adjust size to accommodate all applications
-    ]
-
-def open_device():
-    """Open a handle to the kernel device"""
-    handle = CreateFile(
-        DEVICE_PATH,
-        GENERIC_READ | GENERIC_WRITE,
-        0,
-        None,
-        OPEN_EXISTING,
-        0,
-        None
-    )
-    
-    if handle == wintypes.HANDLE(-1).value:
-        error_code = ctypes.get_last_error()
-        raise Exception(f"Failed to open device: {error_code}")
-    
-    return handle
+# Shared, long-lived channel to the kernel driver
+driver_channel = DriverChannel(Win32DeviceTransport(DEVICE_PATH))
+
+# Per-thread deferred_driver_push() state; only the thread that opened the block defers.
+_deferral = threading.local()
+
+# Set when the driver and blocked_apps may disagree (a push went through but the
+# database sync failed); the next policy evaluation then pushes even without a change.
+_resync_pending = False
+
+
+class _DeferredPush:
+    __slots__ = ("base", "apps", "outcome")
+
+    def __init__(self):
+        self.base = None            # blocked_apps when the block first changed the list
+        self.apps = None            # block list requested inside the block, not yet applied
+        self.outcome = {"result": None}
 
 
 def init_app_block_db():
     """Initialize the SQLite database for app blocking"""
     os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS blocked_apps (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            app_name TEXT UNIQUE,
-            blocked_at TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+    conn = get_connection(DB_PATH)
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS blocked_apps (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                app_name TEXT UNIQUE,
+                blocked_at TEXT
+            )
+        ''')
 
 
 def send_app_list_to_block(app_names):
     """Send application list to kernel driver"""
     if not isinstance(app_names, list):
         return {"status": "error", "message": "app_names must be a list"}
-        
-    if not app_names:
-        try:
-            # Open the device
-            handle = open_device()
-            
-            # Prepare the application list - empty list
-            app_list = APPLICATION_LIST()
-            app_list.Count = 0
-            app_list.Applications = ''
-            
-            bytesReturned = wintypes.DWORD()
-            
-            # Send IOCTL
-            success = DeviceIoControl(
-                handle,
-                IOCTL_RECEIVE_APP_LIST,
-                ctypes.byref(app_list),
-                ctypes.sizeof(app_list),
-                None,
-                0,
-                ctypes.byref(bytesReturned),
-                None
-            )
-            
-            # Close the device handle
-            CloseHandle(handle)
-            
-            if not success:
-                error_code = ctypes.get_last_error()
-                return {"status": "error", "message": f"Failed to send empty list IOCTL: {error_code}"}
-            
-            return {"status": "success", "message": "Successfully sent empty application list to kernel driver"}
-        except Exception as e:
-            return {"status": "error", "message": str(e)}
-        
+
     try:
-        # Open the device
-        handle = open_device()
-        
-        # Prepare the application list
-        app_list = APPLICATION_LIST()
-        app_list.Count = len(app_names)
-        
-        # Create a buffer for applications
-        buffer = []
-        for app_name in app_names:
-            # Ensure each application name fits within MAX_PATH and is null-terminated
-            padded_name = app_name + '\0' * (MAX_PATH - len(app_name))
-            buffer.append(padded_name[:MAX_PATH])
-        
-        # Convert buffer to a single string
-        app_list.Applications = ''.join(buffer)
-        
-        bytesReturned = wintypes.DWORD()
-        
-        # Send IOCTL
-        success = DeviceIoControl(
-            handle,
-            IOCTL_RECEIVE_APP_LIST,
-            ctypes.byref(app_list),
-            ctypes.sizeof(app_list),
-            None,
-            0,
-            ctypes.byref(bytesReturned),
-            None
-        )
-        
-        # Close the device handle
-        CloseHandle(handle)
-        
-        if not success:
-            error_code = ctypes.get_last_error()
-            return {"status": "error", "message": f"Failed to send IOCTL: {error_code}"}
-        
-        return {"status": "success", "message": f"Successfully sent {len(app_names)} applications to kernel driver"}
-        
+        return driver_channel.push(app_names)
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+def sync_blocked_apps_db(app_names):
+    """
+    Make blocked_apps contain exactly app_names.
+
+    Only the difference is written, in a single transaction, so apps that stay
+    blocked keep their original blocked_at. Returns the applied delta:
+    {"added": [...], "removed": [...], "unchanged": count}.
+    Raises sqlite3.Error if the transaction fails.
+    """
+    desired = set(app_names)
+    conn = get_connection(DB_PATH)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        current = {row[0] for row in conn.execute("SELECT app_name FROM blocked_apps")}
+        added = sorted(desired - current)
+        removed = sorted(current - desired)
+
+        if added:
+            timestamp = datetime.now().isoformat()
+            conn.executemany(
+                "INSERT INTO blocked_apps (app_name, blocked_at) VALUES (?, ?)",
+                [(app, timestamp) for app in added]
+            )
+        if removed:
+            conn.executemany(
+                "DELETE FROM blocked_apps WHERE app_name = ?",
+                [(app,) for app in removed]
+            )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+    return {"added": added, "removed": removed, "unchanged": len(desired & current)}
+
+
 def add_apps_to_block_db(apps):
     """Add apps to the blocked apps database"""
     if not apps:
         return {"status": "success", "message": "No apps to add to database"}
-        
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+
+    conn = get_connection(DB_PATH)
     timestamp = datetime.now().isoformat()
-    
+
     try:
-        for app in apps:
-            cursor.execute(
-                "INSERT OR REPLACE INTO blocked_apps (app_name, blocked_at) VALUES (?, ?)",
-                (app, timestamp)
+        with conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO blocked_apps (app_name, blocked_at) VALUES (?, ?)",
+                [(app, timestamp) for app in set(apps)]
             )
-        
-        conn.commit()
-        conn.close()
         return {"status": "success", "message": f"Added {len(apps)} apps to block database"}
     except sqlite3.Error as e:
-        conn.rollback()
-        conn.close()
         return {"status": "error", "message": f"Database error: {str(e)}"}
 
 
@@ -217,55 +116,116 @@ def remove_apps_from_block_db(apps):
     """Remove apps from the blocked apps database"""
     if not apps:
         return {"status": "success", "message": "No apps to remove from database"}
-        
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+
+    conn = get_connection(DB_PATH)
+
     try:
-        for app in apps:
-            cursor.execute("DELETE FROM blocked_apps WHERE app_name = ?", (app,))
-        
-        conn.commit()
-        conn.close()
+        with conn:
+            conn.executemany(
+                "DELETE FROM blocked_apps WHERE app_name = ?",
+                [(app,) for app in set(apps)]
+            )
         return {"status": "success", "message": f"Removed {len(apps)} apps from block database"}
     except sqlite3.Error as e:
-        conn.rollback()
-        conn.close()
         return {"status": "error", "message": f"Database error: {str(e)}"}
 
 
 def get_all_blocked_apps():
-    """Get all currently blocked apps from database"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
+    """Get all currently blocked apps from database (or the list pending in this thread's deferred push)"""
+    state = getattr(_deferral, "state", None)
+    if state is not None and state.apps is not None:
+        return list(state.apps)
     try:
-        cursor.execute("SELECT app_name FROM blocked_apps")
-        apps = [row[0] for row in cursor.fetchall()]
-        conn.close()
-        return apps
-    except sqlite3.Error as e:
-        conn.close()
+        cursor = get_connection(DB_PATH).execute("SELECT app_name FROM blocked_apps")
+        return [row[0] for row in cursor.fetchall()]
+    except sqlite3.Error:
         return []
 
 
+@contextmanager
+def deferred_driver_push():
+    """
+    Collapse every block list change made by this thread inside the block into one.
+
+    Only the calling thread defers (other API requests and the watcher keep pushing
+    immediately): its apply_blocked_apps() calls just record the requested list,
+    which get_all_blocked_apps() then returns. When the outermost block exits, that
+    list is applied once, driver first and database second, and the yielded dict
+    gets the apply_blocked_apps() result under "result" (None if nothing changed).
+    What is applied is the block's net additions and removals on top of the list
+    at exit, so changes other threads made meanwhile are kept.
+    """
+    state = getattr(_deferral, "state", None)
+    if state is not None:
+        yield state.outcome  # nested: the outer block applies
+        return
+
+    state = _deferral.state = _DeferredPush()
+    try:
+        yield state.outcome
+    finally:
+        _deferral.state = None
+        if state.apps is not None:
+            added = set(state.apps) - state.base
+            removed = state.base - set(state.apps)
+            state.outcome["result"] = apply_blocked_apps((set(get_all_blocked_apps()) - removed) | added)
+            if state.outcome["result"]["status"] != "success":
+                logging.error(f"Deferred block list update failed: {state.outcome['result']['message']}")
+
+
+def apply_blocked_apps(app_names):
+    """
+    Push app_names to the driver, then reconcile the database with it.
+
+    Shared by every call site that changes the block list. The result carries
+    the database delta under "delta" so callers can log or audit it cheaply.
+    Inside this thread's deferred_driver_push() nothing is pushed or written yet;
+    the list is recorded and applied when the block exits.
+    """
+    global _resync_pending
+    app_names = sorted(set(app_names))
+
+    state = getattr(_deferral, "state", None)
+    if state is not None:
+        previous = set(get_all_blocked_apps())
+        if state.base is None:
+            state.base = previous
+        state.apps = app_names
+        desired = set(app_names)
+        delta = {"added": sorted(desired - previous), "removed": sorted(previous - desired),
+                 "unchanged": len(desired & previous)}
+        return {"status": "success", "blocked_apps": app_names, "delta": delta, "deferred": True}
+
+    driver_result = send_app_list_to_block(app_names)
+    if driver_result["status"] != "success":
+        return {"status": "error", "message": f"Driver update failed: {driver_result['message']}"}
+
+    try:
+        delta = sync_blocked_apps_db(app_names)
+    except sqlite3.Error as e:
+        _resync_pending = True
+        return {"status": "partial", "message": f"Driver updated, but database sync failed: {str(e)}"}
+    _resync_pending = False
+
+    if delta["added"] or delta["removed"]:
+        logging.info(f"Blocked apps changed: +{delta['added']} -{delta['removed']}")
+        event_bus.publish("blocked_apps", {"blocked_apps": app_names, "delta": delta})
+    return {"status": "success", "blocked_apps": app_names, "delta": delta}
+
+
+def resync_pending():
+    """True if the driver may hold a different list than blocked_apps and needs a push."""
+    return _resync_pending
+
+
 def unblock_all_apps():
     """Unblock all apps"""
     try:
-        all_blocked = get_all_blocked_apps()
-        count = len(all_blocked)
-        
-        unblocked_from_driver = send_app_list_to_block([])
-        
-        if unblocked_from_driver["status"] == "success":
-            db_result = remove_apps_from_block_db(all_blocked)
-            
-            if db_result["status"] == "success":
-                return {"status": "success", "message": f"Unblocked all {count} apps"}
-            else:
-                return {"status": "partial", "message": f"Unblocked apps in driver but database error: {db_result['message']}"}
-        else:
-            return unblocked_from_driver
+        result = apply_blocked_apps([])
+        if result["status"] != "success":
+            return result
+        count = len(result["delta"]["removed"])
+        return {"status": "success", "message": f"Unblocked all {count} apps", "delta": result["delta"]}
     except Exception as e:
         return {"status": "error", "message": f"Error unblocking all apps: {str(e)}"}
 
@@ -274,36 +234,25 @@ def unblock_apps(app_names):
     """Unblock specific apps"""
     if not app_names:
         return {"status": "error", "message": "No applications specified to unblock"}
-    
+
     try:
-        blocked_apps = get_all_blocked_apps()
-        
-        apps_to_unblock = [app for app in app_names if app in blocked_apps]
-        
+        blocked_apps = set(get_all_blocked_apps())
+        apps_to_unblock = sorted(blocked_apps.intersection(app_names))
+
         if not apps_to_unblock:
             return {"status": "warning", "message": "None of the specified apps are currently blocked"}
-        
-        new_block_list = [app for app in blocked_apps if app not in apps_to_unblock]
-        
-        driver_result = send_app_list_to_block(new_block_list)
-        
-        if driver_result["status"] == "success":
-            db_result = remove_apps_from_block_db(apps_to_unblock)
-            
-            if db_result["status"] == "success":
-                return {
-                    "status": "success", 
-                    "message": f"Successfully unblocked {len(apps_to_unblock)} apps",
-                    "unblocked_apps": apps_to_unblock,
-                    "remaining_blocked": new_block_list
-                }
-            else:
-                return {
-                    "status": "partial", 
-                    "message": f"Unblocked apps in driver but database error: {db_result['message']}"
-                }
-        else:
-            return driver_result
+
+        result = apply_blocked_apps(blocked_apps.difference(apps_to_unblock))
+        if result["status"] != "success":
+            return result
+
+        return {
+            "status": "success",
+            "message": f"Successfully unblocked {len(apps_to_unblock)} apps",
+            "unblocked_apps": apps_to_unblock,
+            "remaining_blocked": result["blocked_apps"],
+            "delta": result["delta"]
+        }
     except Exception as e:
         return {"status": "error", "message": f"Error unblocking apps: {str(e)}"}
 
@@ -312,31 +261,19 @@ def block_apps(app_names):
     """Block specific apps"""
     if not app_names:
         return {"status": "error", "message": "No applications specified to block"}
-    
+
     try:
-        blocked_apps = get_all_blocked_apps()
-        
-        new_block_list = list(set(blocked_apps + app_names))
-        
-        driver_result = send_app_list_to_block(new_block_list)
-        
-        if driver_result["status"] == "success":
-            db_result = add_apps_to_block_db(app_names)
-            
-            if db_result["status"] == "success":
-                return {
-                    "status": "success", 
-                    "message": f"Successfully blocked {len(app_names)} apps",
-                    "blocked_apps": app_names,
-                    "total_blocked": new_block_list
-                }
-            else:
-                return {
-                    "status": "partial", 
-                    "message": f"Blocked apps in driver but database error: {db_result['message']}"
-                }
-        else:
-            return driver_result
+        result = apply_blocked_apps(set(get_all_blocked_apps()).union(app_names))
+        if result["status"] != "success":
+            return result
+
+        return {
+            "status": "success",
+            "message": f"Successfully blocked {len(app_names)} apps",
+            "blocked_apps": app_names,
+            "total_blocked": result["blocked_apps"],
+            "delta": result["delta"]
+        }
     except Exception as e:
         return {"status": "error", "message": f"Error blocking apps: {str(e)}"}
 
@@ -344,35 +281,25 @@ def block_apps(app_names):
 def set_blocked_apps(app_names):
     """Set the entire list of blocked apps, replacing any existing blocked apps"""
     try:
-        app_names = list(set(app_names or []))
-        current_blocked = get_all_blocked_apps()
-
-        driver_result = send_app_list_to_block(app_names)
-        if driver_result["status"] != "success":
-            return {"status": "error", "message": f"Driver update failed: {driver_result['message']}"}
-
-        db_remove_result = remove_apps_from_block_db(current_blocked)
-        if db_remove_result["status"] != "success":
-            return {
-                "status": "partial",
-                "message": f"Driver updated, but failed to clear DB: {db_remove_result['message']}"
-            }
-
-        db_add_result = add_apps_to_block_db(app_names)
-        if db_add_result["status"] == "success":
-            return {
-                "status": "success",
-                "message": f"Set {len(app_names)} apps as blocked",
-                "blocked_apps": app_names
-            }
-        else:
-            return {
-                "status": "partial",
-                "message": f"Driver updated, but DB write failed: {db_add_result['message']}"
-            }
-
+        result = apply_blocked_apps(app_names or [])
+        if result["status"] != "success":
+            return result
+
+        return {
+            "status": "success",
+            "message": f"Set {len(result['blocked_apps'])} apps as blocked",
+            "blocked_apps": result["blocked_apps"],
+            "delta": result["delta"]
+        }
     except Exception as e:
         return {"status": "error", "message": f"Failed to set blocked apps: {str(e)}"}
 
 
+def refresh_driver():
+    """
+    Re-send the stored block list if the driver has not been sent it for the
+    channel's refresh_interval, restoring it after a driver restart.
+    """
+    return send_app_list_to_block(get_all_blocked_apps())
+
 init_app_block_db()
\ No newline at end of file
@@ -3,7 +3,7 @@ import json
 import logging
 import psutil
 from datetime import datetime, timedelta
-import winreg
+from core.installed_software import inventory
 
 BLOCK_CONFIG = "config/settings.json"
 
@@ -53,32 +53,6 @@ def get_installed_apps():
     """
     Retrieves a list of installed applications from the Windows Registry.
     Returns a list of dictionaries with name and optionally version.
+    The list comes from the shared, background-refreshed inventory snapshot.
     """
-    apps = []
-    registry_paths = [
-        r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
-        r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall",
-    ]
-
-    for hive in (winreg.HKEY_LOCAL_MACHINE, winreg.HKEY_CURRENT_USER):
-        for path in registry_paths:
-            try:
-                reg_key = winreg.OpenKey(hive, path)
-                for i in range(0, winreg.QueryInfoKey(reg_key)[0]):
-                    try:
-                        sub_key_name = winreg.EnumKey(reg_key, i)
-                        sub_key = winreg.OpenKey(reg_key, sub_key_name)
-                        name, _ = winreg.QueryValueEx(sub_key, "DisplayName")
-                        try:
-                            version, _ = winreg.QueryValueEx(sub_key, "DisplayVersion")
-                        except FileNotFoundError:
-                            version = "Unknown"
-                        apps.append({"name": name, "version": version})
-                    except (FileNotFoundError, OSError):
-                        continue
-            except FileNotFoundError:
-                continue
-
-    # Remove duplicates and sort
-    unique_apps = {app["name"]: app for app in apps}
-    return sorted(unique_apps.values(), key=lambda x: x["name"].lower())
+    return inventory.snapshot().apps
@@ -3,22 +3,29 @@ import win32process
 import psutil
 import os
 import sqlite3
-import winreg
+import time
 from datetime import datetime, timedelta
+from functools import partial
 from core.event import Event
 from core.browser_history.utils import get_browser_handler
 from config.config import USAGE_DB_PATH, DATA_DIR
-from utils.image_extract import extract_icon_from_exe
+from core.icon_cache import icon_store
 from service.cache import Cache
+from service.event_bus import event_bus
+from core.installed_software import inventory
+from core.storage import get_connection
+from core.usage_rollup import (init_daily_usage_table, backfill_daily_usage, get_daily_usage, add_usage,
+                               init_hourly_usage_table, backfill_hourly_usage, migrate_app_usage_ts)
+from core.usage_retention import enable_incremental_vacuum
 
 DB_PATH = USAGE_DB_PATH
+JOURNAL_PATH = os.path.join(DATA_DIR, "usage.journal")
 last_event = None
+last_flush = 0.0  # time.monotonic() of the last write of last_event to the database
 url_attempts = 0  # Track attempts to fetch URL for same event
+_journal = None
 
-app_name_and_icon_cache = Cache()
-
-ICONS_DIR = os.path.join(DATA_DIR, "icons")
-os.makedirs(ICONS_DIR, exist_ok=True)
+app_name_and_icon_cache = Cache(max_entries=512)
 
 def get_active_window_info():
     try:
@@ -28,53 +35,66 @@ def get_active_window_info():
         window_title = win32gui.GetWindowText(hwnd)
         app_exe_path = process.exe()
         app_process_name = process.name()
-        cached_info = app_name_and_icon_cache.get(app_exe_path)
-        if cached_info:
-            app_name, app_icon = cached_info
-            return app_process_name, app_name, window_title, pid, app_icon
-        app_name = get_friendly_app_name(app_exe_path) or app_process_name
-        app_icon_path = f"{ICONS_DIR}/{app_name}.ico"
-        app_icon = None
-        if os.path.exists(app_icon_path):
-            app_icon = app_icon_path
-        else:
-            app_icon = extract_icon_from_exe(app_exe_path, app_icon_path)
-        app_name_and_icon_cache.set(app_exe_path, (app_name, app_icon), 3600)
-        return app_process_name, app_name, window_title, pid, app_icon
+        app_name, app_icon = app_name_and_icon_cache.get_or_compute(
+            app_exe_path,
+            lambda: _resolve_name_and_icon(app_exe_path, app_process_name),
+            3600
+        )
+        if app_icon is None:
+            # Picks up an icon that finished extracting before the cache entry was written.
+            app_icon = icon_store.request(app_exe_path)
+        return app_process_name, app_name, window_title, pid, app_icon, app_exe_path
     except Exception:
-        return None, None, None
+        return None, None, None, None, None, None
 
 
-def get_friendly_app_name(exe_path: str) -> str | None:
-    uninstall_keys = [
-        r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
-        r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall",
-    ]
+def _resolve_name_and_icon(app_exe_path, app_process_name):
+    app_name = get_friendly_app_name(app_exe_path) or app_process_name
+    # Icons are extracted on a worker; until then events carry no icon and
+    # _on_icon_ready fills it in.
+    app_icon = icon_store.request(
+        app_exe_path,
+        partial(_on_icon_ready, app_exe_path, app_process_name, app_name, datetime.now())
+    )
+    return app_name, app_icon
+
+
+def _on_icon_ready(app_exe_path, app_process_name, app_name, requested_at, icon_path):
+    """Runs on an icon worker once extraction finished."""
+    if not icon_path:
+        return
+    app_name_and_icon_cache.set(app_exe_path, (app_name, icon_path), 3600)
+
+    event = last_event
+    if event and event.app_process_name == app_process_name and event.app_name == app_name:
+        event.app_icon = icon_path
+
+    conn = get_connection(DB_PATH)
+    with conn:
+        conn.execute('''
+            UPDATE app_usage SET app_icon=?
+            WHERE app_icon IS NULL AND app_process_name=? AND app_name=? AND ts >= ?
+        ''', (icon_path, app_process_name, app_name, int(requested_at.timestamp())))
+
+
+def _fill_missing_icon(event: Event):
+    """
+    Pick up an icon that finished extracting while the event was not yet last_event
+    or had no row, which _on_icon_ready cannot reach.
+    """
+    if event.app_icon is not None or not event.app_exe_path:
+        return
+    cached = app_name_and_icon_cache.get(event.app_exe_path)
+    event.app_icon = (cached[1] if cached else None) or icon_store.request(event.app_exe_path)
 
-    for root in (winreg.HKEY_LOCAL_MACHINE, winreg.HKEY_CURRENT_USER):
-        for subkey in uninstall_keys:
-            try:
-                with winreg.OpenKey(root, subkey) as key:
-                    for i in range(winreg.QueryInfoKey(key)[0]):
-                        try:
-                            subkey_name = winreg.EnumKey(key, i)
-                            with winreg.OpenKey(key, subkey_name) as app_key:
-                                display_name = winreg.QueryValueEx(
-                                    app_key, "DisplayName")[0]
-                                install_location = winreg.QueryValueEx(app_key, "InstallLocation")[0] if "InstallLocation" in [
-                                    winreg.EnumValue(app_key, j)[0] for j in range(winreg.QueryInfoKey(app_key)[1])] else ""
-                                if install_location and exe_path.lower().startswith(install_location.lower()):
-                                    return display_name
-                        except (FileNotFoundError, OSError, PermissionError):
-                            continue
-            except FileNotFoundError:
-                continue
-    return None
+
+def get_friendly_app_name(exe_path: str) -> str | None:
+    return inventory.friendly_name(exe_path)
 
 
 def init_db():
     os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection(DB_PATH)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS app_usage (
@@ -86,23 +106,37 @@ def init_db():
             pid INTEGER,
             app_icon TEXT,
             duration INTEGER,
-            url TEXT
+            url TEXT,
+            ts INTEGER
         )
     ''')
     conn.commit()
-    conn.close()
-
-
-def track_active_app(pulsetime=11):
+    migrate_app_usage_ts(conn)
+    if init_daily_usage_table(conn):
+        backfill_daily_usage(DB_PATH)
+    if init_hourly_usage_table(conn):
+        backfill_hourly_usage(DB_PATH)
+    enable_incremental_vacuum(conn)  # lets usage retention give space back
+
+
+def track_active_app(pulsetime=11, flush_interval=60):
+    """
+    Sample the foreground window and extend or start the current event.
+
+    The current event lives in memory and is only written to app_usage when the
+    foreground app changes, every flush_interval seconds, or on flush_last_event()
+    at shutdown. Ticks in between go to a small append-only journal, so a hard kill
+    loses at most one tick of duration.
+    """
     global last_event, url_attempts
     pulsetime = timedelta(seconds=pulsetime)
 
-    app_process_name, app_name, window_title, pid, app_icon = get_active_window_info()
+    app_process_name, app_name, window_title, pid, app_icon, app_exe_path = get_active_window_info()
     if not app_name:
         return
 
     now = datetime.now()
-    current_event = Event(now, app_process_name, app_name, window_title, pid, app_icon)
+    current_event = Event(now, app_process_name, app_name, window_title, pid, app_icon, app_exe_path=app_exe_path)
 
     matched_url = None
     if last_event and last_event.is_equivalent(current_event):
@@ -123,10 +157,15 @@ def track_active_app(pulsetime=11):
                 else:
                     url_attempts += 1
 
-            replace_last_event(last_event)
+            if time.monotonic() - last_flush >= flush_interval:
+                flush_last_event()
+            else:
+                _append_journal(last_event)
             return
 
-    # New event
+    # New event: persist the final state of the previous one first
+    flush_last_event()
+
     current_event.duration = timedelta(seconds=0)
     handler = get_browser_handler(app_process_name)
     if handler:
@@ -137,81 +176,161 @@ def track_active_app(pulsetime=11):
 
     insert_event(current_event)
     last_event = current_event
-
-
-def replace_last_event(event: Event):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE app_usage
-        SET timestamp=?, app_process_name=?, app_name=?, window_title=?, pid=?, app_icon=?, duration=?, url=?
-        WHERE id=(SELECT MAX(id) FROM app_usage)
-    ''', event.to_row())
-    conn.commit()
-    conn.close()
+    event_bus.publish("foreground", {
+        "app_process_name": app_process_name,
+        "app_name": app_name,
+        "window_title": window_title,
+        "pid": pid,
+        "url": current_event.url,
+    })
+
+
+def flush_last_event():
+    """Write the in-memory event to app_usage and reset the crash journal."""
+    global last_flush
+    last_flush = time.monotonic()
+    event = last_event
+    if event is None or event.row_id is None:
+        return
+    icon_missing = event.app_icon is None
+    _fill_missing_icon(event)
+    if (event.duration_seconds() != event.flushed_seconds or _journal_has_entries()
+            or (icon_missing and event.app_icon is not None)):
+        update_event(event)
+    _truncate_journal()
+
+
+def update_event(event: Event):
+    _fill_missing_icon(event)
+    conn = get_connection(DB_PATH)
+    duration = event.duration_seconds()
+    with conn:
+        conn.execute(
+            "UPDATE app_usage SET duration=?, url=?, app_icon=? WHERE id=?",
+            (duration, event.url, event.app_icon, event.row_id)
+        )
+        add_usage(conn, event.timestamp, event.app_process_name, event.app_name, event.url,
+                  duration - event.flushed_seconds)
+    event.flushed_seconds = duration
 
 
 def insert_event(event: Event):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO app_usage (timestamp, app_process_name, app_name, window_title, pid, app_icon, duration, url)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', event.to_row())
-    conn.commit()
-    conn.close()
+    global last_flush
+    _fill_missing_icon(event)
+    conn = get_connection(DB_PATH)
+    with conn:
+        cursor = conn.execute('''
+            INSERT INTO app_usage (timestamp, app_process_name, app_name, window_title, pid, app_icon, duration, url, ts)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', event.to_row())
+        add_usage(conn, event.timestamp, event.app_process_name, event.app_name, event.url,
+                  event.duration_seconds())
+    event.row_id = cursor.lastrowid
+    event.flushed_seconds = event.duration_seconds()
+    last_flush = time.monotonic()
+    return event.row_id
+
+
+def _open_journal():
+    global _journal
+    if _journal is None:
+        _journal = open(JOURNAL_PATH, "a", encoding="utf-8")
+    return _journal
+
+
+def _append_journal(event: Event):
+    if event.row_id is None:
+        return
+    journal = _open_journal()
+    journal.write(f"{event.row_id}\t{event.duration_seconds()}\t{event.url or ''}\n")
+    journal.flush()
 
 
-def get_app_usage_today(app_process_name):
-    """Get total usage time for an app today from the app_usage table"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+def _journal_has_entries():
+    return _journal is not None and _journal.tell() > 0
 
-    today = datetime.now().strftime('%Y-%m-%d')
 
-    try:
-        cursor.execute("""
-            SELECT SUM(duration) FROM app_usage 
-            WHERE app_process_name = ? AND timestamp LIKE ?
-        """, (app_process_name, f"{today}%"))
+def _truncate_journal():
+    if _journal is not None and _journal.tell() > 0:
+        _journal.seek(0)
+        _journal.truncate()
 
-        result = cursor.fetchone()[0]
-        conn.close()
 
-        if result:
-            return int(result)
-        return 0
-    except sqlite3.Error as e:
-        print(f"Database error getting app usage: {str(e)}")
-        conn.close()
+def recover_journal():
+    """Apply durations left in the journal by a run that was killed before flushing."""
+    if not os.path.exists(JOURNAL_PATH):
         return 0
 
+    latest = {}
+    with open(JOURNAL_PATH, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.rstrip("\n").split("\t")
+            if len(parts) != 3:
+                continue  # torn last line
+            try:
+                latest[int(parts[0])] = (int(parts[1]), parts[2] or None)
+            except ValueError:
+                continue
+
+    if latest:
+        conn = get_connection(DB_PATH)
+        with conn:
+            for row_id, (duration, url) in latest.items():
+                row = conn.execute(
+                    "SELECT timestamp, app_process_name, app_name, duration, url FROM app_usage WHERE id=?",
+                    (row_id,)
+                ).fetchone()
+                if row is None:
+                    continue
+                timestamp, app_process_name, app_name, stored, stored_url = row
+                conn.execute(
+                    "UPDATE app_usage SET duration=MAX(duration, ?), url=COALESCE(url, ?) WHERE id=?",
+                    (duration, url, row_id)
+                )
+                add_usage(conn, datetime.fromisoformat(timestamp), app_process_name, app_name,
+                          stored_url or url, max(0, duration - (stored or 0)))
+    open(JOURNAL_PATH, "w").close()
+    return len(latest)
+
+
+def _unflushed_usage():
+    """(app_process_name, seconds) of the in-memory event not yet written to app_usage."""
+    event = last_event
+    if event is None or event.row_id is None:
+        return None, 0
+    return event.app_process_name, max(0, event.duration_seconds() - event.flushed_seconds)
 
-def get_all_app_usage_today():
-    """Get total usage time for all apps today from the app_usage table"""
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
 
+def get_app_usage_today(app_process_name):
+    """Get total usage time for an app today from the daily_usage rollup"""
     today = datetime.now().strftime('%Y-%m-%d')
 
     try:
-        cursor.execute("""
-            SELECT app_process_name, SUM(duration) FROM app_usage 
-            WHERE timestamp LIKE ?
-            GROUP BY app_process_name
-        """, (f"{today}%",))
+        usage = get_daily_usage(today, app_process_name)
+    except sqlite3.Error as e:
+        print(f"Database error getting app usage: {str(e)}")
+        return 0
 
-        results = cursor.fetchall()
-        conn.close()
+    pending_app, pending = _unflushed_usage()
+    if pending_app == app_process_name:
+        usage += pending
+    return usage
 
-        usage_dict = {app: int(duration)
-                      for app, duration in results if duration}
-        return usage_dict
 
+def get_all_app_usage_today():
+    """Get total usage time for all apps today from the daily_usage rollup"""
+    today = datetime.now().strftime('%Y-%m-%d')
+
+    try:
+        usage_dict = get_daily_usage(today)
     except sqlite3.Error as e:
         print(f"Database error getting all app usage: {str(e)}")
-        conn.close()
         return {}
 
+    pending_app, pending = _unflushed_usage()
+    if pending:
+        usage_dict[pending_app] = usage_dict.get(pending_app, 0) + pending
+    return usage_dict
 
 init_db()
+recover_journal()
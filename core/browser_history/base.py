@@ -1,33 +1,96 @@
-from rapidfuzz import fuzz
-from typing import Optional
-from abc import ABC, abstractmethod
-from core.event import Event  # adjust import as needed
-
-class BrowserHistory(ABC):
-    @abstractmethod
-    def get_history(self) -> list[dict]:
-        """Fetch today's history entries. Each entry is a dict with title, url, visit_time."""
-        pass
-
-    def match_event(self, event: Event) -> Optional[str]:
-        """Match event title and time with browser history using fuzzy matching."""
-
-        print(event.to_row())
-        history = self.get_history()
-
-        best_match = None
-        highest_score = 0
-
-        for entry in history:
-            score = fuzz.token_set_ratio(entry['title'], event.window_title)
-            if score >= 90:
-                # Accept match if visit time is within ±5 minutes
-                delta = abs((entry['visit_time'] - event.timestamp).total_seconds())
-                if delta <= 24 * 60 * 60:  # 5 minutes
-                    if score > highest_score:
-                        best_match = entry['url']
-                        highest_score = score
-
-        if best_match:
-            print(f"Matched with score: {highest_score}")
-        return best_match
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+from abc import ABC, abstractmethod
+from core.event import Event  # adjust import as needed
+from core.browser_history.matcher import get_index
+
+# Small shared pool for reading several profiles' history databases at once.
+_profile_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="browser-history")
+
+
+class BrowserHistory(ABC):
+    @abstractmethod
+    def get_history(self) -> list[dict]:
+        """Fetch today's history entries. Each entry is a dict with title, url, visit_time."""
+        pass
+
+    def get_history_by_source(self) -> dict[str, list[dict]]:
+        """Today's entries grouped by the database they came from."""
+        return {type(self).__name__: self.get_history()}
+
+    def match_event(self, event: Event) -> Optional[str]:
+        """Match event title and time with browser history using an incrementally built title index."""
+        best = None
+        for source, entries in self.get_history_by_source().items():
+            index = get_index(source)
+            index.sync(entries)
+            hit = index.match_scored(event.window_title, event.timestamp)
+            if hit and (best is None or hit[0] > best[0]):
+                best = hit
+        return best[1] if best else None
+
+
+class ProfiledBrowserHistory(BrowserHistory):
+    """
+    A browser whose history lives in one database per profile under a root directory.
+
+    Profiles are discovered once and re-discovered when the root directory's
+    mtime changes (a profile folder was added or removed) or when a folder that
+    had no history database at the last scan has gained one.
+    """
+
+    DEFAULT_ROOT = None
+    HISTORY_FILE = None
+
+    def __init__(self, root=None):
+        self.root = root or os.path.expandvars(self.DEFAULT_ROOT)
+        self._profiles = []
+        self._root_key = None
+        self._pending = []  # history paths expected but missing at the last scan
+        self._lock = threading.Lock()
+
+    def _is_profile_dir(self, name):
+        return True
+
+    def _discover_profiles(self):
+        """Return (history paths found, history paths of candidate folders that have none yet)."""
+        candidates = [os.path.join(self.root, self.HISTORY_FILE)]
+        with os.scandir(self.root) as entries:
+            for entry in entries:
+                if entry.is_dir() and self._is_profile_dir(entry.name):
+                    candidates.append(os.path.join(entry.path, self.HISTORY_FILE))
+        profiles = sorted(path for path in candidates if os.path.isfile(path))
+        pending = [path for path in candidates if path not in profiles]
+        return profiles, pending
+
+    def get_profiles(self) -> list[str]:
+        """Paths of every profile's history database."""
+        try:
+            st = os.stat(self.root)
+        except OSError:
+            return []
+        root_key = (st.st_mtime_ns, st.st_ino)
+        with self._lock:
+            if root_key != self._root_key or any(os.path.isfile(path) for path in self._pending):
+                try:
+                    self._profiles, self._pending = self._discover_profiles()
+                    self._root_key = root_key
+                except OSError:
+                    self._profiles, self._pending = [], []
+            return self._profiles
+
+    @abstractmethod
+    def read_profile(self, history_path) -> list[dict]:
+        """Today's entries from one profile's history database."""
+        pass
+
+    def get_history_by_source(self):
+        profiles = self.get_profiles()
+        if len(profiles) <= 1:
+            return {path: self.read_profile(path) for path in profiles}
+        return dict(zip(profiles, _profile_pool.map(self.read_profile, profiles)))
+
+    def get_history(self):
+        return [entry for entries in self.get_history_by_source().values() for entry in entries]
@@ -1,8 +1,4 @@
-from core.browser_history.chrome import ChromeHistory
-import os
-
-class BraveHistory(ChromeHistory):
-    def __init__(self):
-        self.history_path = os.path.expandvars(
-            r"%LOCALAPPDATA%\BraveSoftware\Brave-Browser\User Data\Default\History"
-        )
+from core.browser_history.chrome import ChromeHistory
+
+class BraveHistory(ChromeHistory):
+    DEFAULT_ROOT = r"%LOCALAPPDATA%\BraveSoftware\Brave-Browser\User Data"
@@ -0,0 +1,32 @@
+from datetime import datetime
+from core.browser_history.history_reader import IncrementalHistoryReader
+
+# Chromium stores times as microseconds since 1601-01-01 UTC (the WebKit epoch).
+WEBKIT_EPOCH_OFFSET_US = 11_644_473_600 * 1_000_000
+
+
+def webkit_to_datetime(webkit_us):
+    """Convert a Chromium timestamp to a naive local datetime, comparable with Event.timestamp."""
+    return datetime.fromtimestamp((webkit_us - WEBKIT_EPOCH_OFFSET_US) / 1_000_000)
+
+
+def datetime_to_webkit(dt):
+    """Convert a naive local (or aware) datetime to a Chromium timestamp."""
+    return int(dt.timestamp() * 1_000_000) + WEBKIT_EPOCH_OFFSET_US
+
+
+class ChromiumHistoryReader(IncrementalHistoryReader):
+    """Reader for a Chromium profile's History database."""
+
+    visits_query = """
+        SELECT visits.id, urls.url, urls.title, visits.visit_time
+        FROM visits JOIN urls ON urls.id = visits.url
+        WHERE visits.id > ? AND visits.visit_time >= ?
+        ORDER BY visits.id
+    """
+
+    def to_datetime(self, value):
+        return webkit_to_datetime(value)
+
+    def from_datetime(self, dt):
+        return datetime_to_webkit(dt)
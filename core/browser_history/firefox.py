@@ -1,46 +1,37 @@
-import os
-import sqlite3
-import json
-from datetime import datetime, timedelta
-from shutil import copy2
-from core.browser_history.base import BrowserHistory
-
-class FirefoxHistory(BrowserHistory):
-    def __init__(self):
-        profile_base = os.path.expandvars(r"%APPDATA%\Mozilla\Firefox\Profiles")
-        self.history_path = self._find_history_file(profile_base)
-
-    def _find_history_file(self, base_dir):
-        for folder in os.listdir(base_dir):
-            if folder.endswith(".default-release"):
-                return os.path.join(base_dir, folder, "places.sqlite")
-        return None
-
-    def get_history(self):
-        if not self.history_path or not os.path.exists(self.history_path):
-            return []
-
-        temp_path = self.history_path + "_copy"
-        copy2(self.history_path, temp_path)
-
-        conn = sqlite3.connect(temp_path)
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT url, title, last_visit_date
-            FROM moz_places
-            WHERE last_visit_date IS NOT NULL
-        """)
-
-        entries = []
-        for url, title, last_visit_date in cursor.fetchall():
-            visit_time = datetime(1970, 1, 1) + timedelta(microseconds=last_visit_date)
-            if visit_time.date() == datetime.now().date():
-                entries.append({
-                    "url": url,
-                    "title": title,
-                    "visit_time": visit_time
-                })
-
-        conn.close()
-        os.remove(temp_path)
-        return entries
+from datetime import datetime
+from core.browser_history.base import ProfiledBrowserHistory
+from core.browser_history.history_reader import IncrementalHistoryReader, get_reader
+
+
+def prtime_to_datetime(prtime_us):
+    """Convert a Firefox PRTime (microseconds since the Unix epoch) to a naive local datetime."""
+    return datetime.fromtimestamp(prtime_us / 1_000_000)
+
+
+def datetime_to_prtime(dt):
+    return int(dt.timestamp() * 1_000_000)
+
+
+class FirefoxHistoryReader(IncrementalHistoryReader):
+    """Reader for a Firefox profile's places.sqlite."""
+
+    visits_query = """
+        SELECT moz_historyvisits.id, moz_places.url, moz_places.title, moz_historyvisits.visit_date
+        FROM moz_historyvisits JOIN moz_places ON moz_places.id = moz_historyvisits.place_id
+        WHERE moz_historyvisits.id > ? AND moz_historyvisits.visit_date >= ?
+        ORDER BY moz_historyvisits.id
+    """
+
+    def to_datetime(self, value):
+        return prtime_to_datetime(value)
+
+    def from_datetime(self, dt):
+        return datetime_to_prtime(dt)
+
+
+class FirefoxHistory(ProfiledBrowserHistory):
+    DEFAULT_ROOT = r"%APPDATA%\Mozilla\Firefox\Profiles"
+    HISTORY_FILE = "places.sqlite"
+
+    def read_profile(self, history_path):
+        return get_reader(history_path, FirefoxHistoryReader).read()
@@ -0,0 +1,140 @@
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+
+
+class IncrementalHistoryReader(ABC):
+    """
+    Incremental reader for one browser profile's history database.
+
+    The file is read in place with mode=ro and no busy timeout, so the browser's
+    WAL is honoured when the database is not locked. A running browser usually
+    holds an exclusive lock, and then the main file is read as immutable instead,
+    which takes no lock and misses only what is still in the WAL. Only when that
+    read hits a page torn by a concurrent write is the database copied and the
+    copy read. Today's visits are kept in memory; when the file changes only
+    visits newer than the last seen visit id are fetched. Subclasses give the
+    visits query and the browser's time format.
+    """
+
+    @property
+    @abstractmethod
+    def visits_query(self) -> str:
+        """SQL selecting (visit id, url, title, visit time) with visit id > ? and visit time >= ?, by visit id."""
+        pass
+
+    @abstractmethod
+    def to_datetime(self, value) -> datetime:
+        """Convert a stored visit time to a naive local datetime."""
+        pass
+
+    @abstractmethod
+    def from_datetime(self, dt):
+        """Convert a naive local datetime to the stored visit time format."""
+        pass
+
+    def __init__(self, history_path):
+        self.history_path = history_path
+        self.entries = []
+        self.last_visit_id = 0
+        self._file_key = None
+        self._day = None
+        self._lock = threading.Lock()
+
+    def _current_file_key(self):
+        key = []
+        for path in (self.history_path, self.history_path + "-wal", self.history_path + "-journal"):
+            try:
+                st = os.stat(path)
+                key.append((st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                key.append(None)
+        return tuple(key)
+
+    @staticmethod
+    def _query(conn, sql, params):
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def _fetch_rows(self, sql, params):
+        uri = Path(self.history_path).absolute().as_uri()
+        try:
+            # timeout=0: the sampling thread must never wait on the browser's lock.
+            return self._query(sqlite3.connect(f"{uri}?mode=ro", uri=True, timeout=0), sql, params)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):  # SQLITE_BUSY and SQLITE_LOCKED both read "... is locked"
+                raise
+        try:
+            return self._query(sqlite3.connect(f"{uri}?mode=ro&immutable=1", uri=True), sql, params)
+        except sqlite3.OperationalError:
+            raise
+        except sqlite3.DatabaseError as e:
+            # SQLITE_CORRUPT / SQLITE_NOTADB: a page caught mid-write by the browser.
+            logging.debug(f"Reading {self.history_path} in place failed ({e}); reading a copy")
+
+        with tempfile.TemporaryDirectory() as directory:
+            copy = os.path.join(directory, os.path.basename(self.history_path))
+            shutil.copyfile(self.history_path, copy)
+            for suffix in ("-wal", "-journal"):
+                if os.path.exists(self.history_path + suffix):
+                    shutil.copyfile(self.history_path + suffix, copy + suffix)
+            return self._query(sqlite3.connect(copy), sql, params)
+
+    def read(self, now=None):
+        """Return today's visits as dicts with url, title and visit_time, oldest first."""
+        now = now or datetime.now()
+        with self._lock:
+            if not os.path.exists(self.history_path):
+                return []
+
+            today = now.date()
+            if today != self._day:
+                self.entries = []
+                self.last_visit_id = 0
+                self._file_key = None
+                self._day = today
+
+            file_key = self._current_file_key()
+            if file_key == self._file_key:
+                return self.entries
+
+            try:
+                self._fetch_new_visits(datetime.combine(today, datetime.min.time()))
+                self._file_key = file_key
+            except (sqlite3.Error, OSError) as e:
+                logging.error(f"Failed to read browser history {self.history_path}: {e}")
+            return self.entries
+
+    def _fetch_new_visits(self, since):
+        rows = self._fetch_rows(self.visits_query, (self.last_visit_id, self.from_datetime(since)))
+
+        if not rows:
+            return
+
+        # A new list, so callers holding the previous one see a consistent snapshot.
+        self.entries = self.entries + [
+            {"url": url, "title": title, "visit_time": self.to_datetime(visit_time)}
+            for _, url, title, visit_time in rows
+        ]
+        self.last_visit_id = rows[-1][0]
+
+
+_readers = {}
+_readers_lock = threading.Lock()
+
+
+def get_reader(history_path, reader_cls):
+    """Return the shared reader for a history file, so its cache outlives handler instances."""
+    with _readers_lock:
+        reader = _readers.get(history_path)
+        if reader is None:
+            reader = _readers[history_path] = reader_cls(history_path)
+        return reader
@@ -0,0 +1,126 @@
+import re
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from rapidfuzz import fuzz, process
+
+MATCH_SCORE_CUTOFF = 90
+MATCH_WINDOW = timedelta(hours=24)
+# Fuzzy scoring is O(candidates), so it only looks at visits close to the event.
+FUZZY_MATCH_WINDOW = timedelta(minutes=10)
+
+# Window titles carry the browser name; history titles do not.
+_BROWSER_SUFFIX = re.compile(
+    r"\s+[-\u2013\u2014]\s+(google chrome|microsoft\u200b? edge|brave|opera|mozilla firefox)$"
+)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_title(title):
+    title = _WHITESPACE.sub(" ", (title or "").strip().lower())
+    return _BROWSER_SUFFIX.sub("", title)
+
+
+class HistoryIndex:
+    """
+    Title-to-URL index over one browser's history snapshot.
+
+    An exact normalized-title hit within window is checked first through a hash
+    lookup. Otherwise rapidfuzz scores, with a score cutoff, the titles of visits
+    within fuzzy_window, found by bisecting the time-sorted visit list.
+    sync() takes the reader's growing entry list and only indexes the new tail.
+    """
+
+    def __init__(self, window=MATCH_WINDOW, fuzzy_window=FUZZY_MATCH_WINDOW,
+                 score_cutoff=MATCH_SCORE_CUTOFF):
+        self.window = window.total_seconds()
+        self.fuzzy_window = fuzzy_window.total_seconds()
+        self.score_cutoff = score_cutoff
+        self.times = []
+        self.titles = []
+        self.urls = []
+        self.by_title = {}
+        self._source = None
+        self._indexed = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.times)
+
+    def sync(self, entries):
+        """Index entries not seen yet. A list that is not an extension of the last one is re-indexed."""
+        with self._lock:
+            if (self._source is None or len(entries) < self._indexed or
+                    (self._indexed and entries[self._indexed - 1] is not self._source[self._indexed - 1])):
+                self._reset()
+            for entry in entries[self._indexed:]:
+                self._add(entry)
+            self._source = entries
+            self._indexed = len(entries)
+
+    def _reset(self):
+        self.times = []
+        self.titles = []
+        self.urls = []
+        self.by_title = {}
+        self._indexed = 0
+
+    def _add(self, entry):
+        visit_time = entry['visit_time'].timestamp()
+        title = normalize_title(entry['title'])
+        url = entry['url']
+
+        # Visits arrive in id order, which is nearly always time order.
+        if not self.times or visit_time >= self.times[-1]:
+            self.times.append(visit_time)
+            self.titles.append(title)
+            self.urls.append(url)
+        else:
+            i = bisect_right(self.times, visit_time)
+            self.times.insert(i, visit_time)
+            self.titles.insert(i, title)
+            self.urls.insert(i, url)
+        if title:
+            self.by_title.setdefault(title, []).append((visit_time, url))
+
+    def match(self, window_title, timestamp):
+        """Best matching URL for a window title seen at timestamp (a datetime), or None."""
+        hit = self.match_scored(window_title, timestamp)
+        return hit[1] if hit else None
+
+    def match_scored(self, window_title, timestamp):
+        """(score, url) of the best match, or None. Exact title hits score 100."""
+        title = normalize_title(window_title)
+        if not title:
+            return None
+        when = timestamp.timestamp()
+
+        with self._lock:
+            exact = [(abs(visit_time - when), url) for visit_time, url in self.by_title.get(title, ())
+                     if abs(visit_time - when) <= self.window]
+            if exact:
+                return 100, min(exact)[1]
+
+            lo = bisect_left(self.times, when - self.fuzzy_window)
+            hi = bisect_right(self.times, when + self.fuzzy_window)
+            if lo == hi:
+                return None
+
+            best = process.extractOne(title, self.titles[lo:hi], scorer=fuzz.token_set_ratio,
+                                      score_cutoff=self.score_cutoff)
+            if best is None:
+                return None
+            return best[1], self.urls[lo + best[2]]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(key):
+    """Shared index for one history source (e.g. a History file path)."""
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = HistoryIndex()
+        return index
@@ -1,8 +1,8 @@
-from core.browser_history.chrome import ChromeHistory
-import os
-
-class OperaHistory(ChromeHistory):
-    def __init__(self):
-        self.history_path = os.path.expandvars(
-            r"%APPDATA%\Opera Software\Opera Stable\History"
-        )
+from core.browser_history.chrome import ChromeHistory
+
+class OperaHistory(ChromeHistory):
+    # Opera keeps History directly in Opera Stable rather than in profile folders.
+    DEFAULT_ROOT = r"%APPDATA%\Opera Software\Opera Stable"
+
+    def _is_profile_dir(self, name):
+        return False
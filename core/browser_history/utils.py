@@ -1,17 +1,50 @@
-from core.browser_history.chrome import ChromeHistory
-from core.browser_history.edge import EdgeHistory
-from core.browser_history.brave import BraveHistory
-from core.browser_history.opera import OperaHistory
-from core.browser_history.firefox import FirefoxHistory
-
-def get_browser_handler(app_name: str):
-    print(app_name)
-    app_map = {
-        "chrome.exe": ChromeHistory,
-        "msedge.exe": EdgeHistory,
-        "brave.exe": BraveHistory,
-        "opera.exe": OperaHistory,
-        "firefox.exe": FirefoxHistory,
-    }
-    cls = app_map.get(app_name.lower())
-    return cls() if cls else None
+import threading
+from core.browser_history.chrome import ChromeHistory
+from core.browser_history.edge import EdgeHistory
+from core.browser_history.brave import BraveHistory
+from core.browser_history.opera import OperaHistory
+from core.browser_history.firefox import FirefoxHistory
+
+BROWSER_HANDLERS = {
+    "chrome.exe": ChromeHistory,
+    "msedge.exe": EdgeHistory,
+    "brave.exe": BraveHistory,
+    "opera.exe": OperaHistory,
+    "firefox.exe": FirefoxHistory,
+}
+
+
+class BrowserRegistry:
+    """
+    Long-lived history handler per browser process name.
+
+    roots optionally maps a process name to the profile root to use instead of the
+    browser's default location, e.g. a fixture directory.
+    """
+
+    def __init__(self, handlers=None, roots=None):
+        self.handlers = dict(handlers or BROWSER_HANDLERS)
+        self.roots = dict(roots or {})
+        self._instances = {}
+        self._lock = threading.Lock()
+
+    def get(self, process_name: str):
+        process_name = (process_name or "").lower()
+        cls = self.handlers.get(process_name)
+        if cls is None:
+            return None
+
+        handler = self._instances.get(process_name)
+        if handler is None:
+            with self._lock:
+                handler = self._instances.get(process_name)
+                if handler is None:
+                    handler = self._instances[process_name] = cls(self.roots.get(process_name))
+        return handler
+
+
+registry = BrowserRegistry()
+
+
+def get_browser_handler(app_name: str):
+    return registry.get(app_name)
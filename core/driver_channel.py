@@ -0,0 +1,246 @@
+import ctypes
+import hashlib
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from ctypes import wintypes
+
+# Constants
+FILE_DEVICE_UNKNOWN = 0x00000022
+METHOD_BUFFERED = 0
+FILE_ANY_ACCESS = 0
+MAX_PATH = 260
+MAX_APPS = 100
+REFRESH_INTERVAL = 900  # seconds after which an unchanged list is sent again anyway
+
+# CTL_CODE macro equivalent in Python
+def CTL_CODE(DeviceType, Function, Method, Access):
+    return ((DeviceType << 16) | (Access << 14) | (Function << 2) | Method)
+
+# Define IOCTL code
+IOCTL_RECEIVE_APP_LIST = CTL_CODE(FILE_DEVICE_UNKNOWN, 0x800, METHOD_BUFFERED, FILE_ANY_ACCESS)
+
+GENERIC_READ = 0x80000000
+GENERIC_WRITE = 0x40000000
+FILE_SHARE_READ = 0x00000001
+FILE_SHARE_WRITE = 0x00000002
+OPEN_EXISTING = 3
+DEVICE_PATH = r'\\.\PWAppListDevice'
+
+
+# Define the APPLICATION_LIST structure
+class APPLICATION_LIST(ctypes.Structure):
+    _fields_ = [
+        ("Count", wintypes.ULONG),
+        ("Applications", wintypes.WCHAR * (MAX_PATH * MAX_APPS))  # Adjust size to accommodate all applications
+    ]
+
+
+class DeviceTransport(ABC):
+    """Moves an IOCTL input buffer to the kernel driver."""
+
+    @abstractmethod
+    def open(self):
+        """Open the device. Raises OSError on failure."""
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    @abstractmethod
+    def send(self, ioctl_code, buffer):
+        """Send buffer (a ctypes object) with ioctl_code. Raises OSError on failure."""
+        pass
+
+
+class Win32DeviceTransport(DeviceTransport):
+    """DeviceIoControl against the driver's device object. kernel32 is loaded on first open."""
+
+    def __init__(self, device_path=DEVICE_PATH):
+        self.device_path = device_path
+        self._kernel32 = None
+        self._handle = None
+
+    def _load_kernel32(self):
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+
+        kernel32.CreateFileW.argtypes = [
+            wintypes.LPCWSTR,  # lpFileName
+            wintypes.DWORD,    # dwDesiredAccess
+            wintypes.DWORD,    # dwShareMode
+            wintypes.LPVOID,   # lpSecurityAttributes
+            wintypes.DWORD,    # dwCreationDisposition
+            wintypes.DWORD,    # dwFlagsAndAttributes
+            wintypes.HANDLE    # hTemplateFile
+        ]
+        kernel32.CreateFileW.restype = wintypes.HANDLE
+
+        kernel32.DeviceIoControl.argtypes = [
+            wintypes.HANDLE,   # hDevice
+            wintypes.DWORD,    # dwIoControlCode
+            wintypes.LPVOID,   # lpInBuffer
+            wintypes.DWORD,    # nInBufferSize
+            wintypes.LPVOID,   # lpOutBuffer
+            wintypes.DWORD,    # nOutBufferSize
+            ctypes.POINTER(wintypes.DWORD),  # lpBytesReturned
+            wintypes.LPVOID    # lpOverlapped
+        ]
+        kernel32.DeviceIoControl.restype = wintypes.BOOL
+
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        kernel32.CloseHandle.restype = wintypes.BOOL
+        return kernel32
+
+    def open(self):
+        if self._handle is not None:
+            return
+        if self._kernel32 is None:
+            self._kernel32 = self._load_kernel32()
+
+        handle = self._kernel32.CreateFileW(
+            self.device_path,
+            GENERIC_READ | GENERIC_WRITE,
+            FILE_SHARE_READ | FILE_SHARE_WRITE,  # don't lock other clients (or a reinstalled driver's tools) out
+            None,
+            OPEN_EXISTING,
+            0,
+            None
+        )
+        if handle == wintypes.HANDLE(-1).value:
+            raise OSError(f"Failed to open device: {ctypes.get_last_error()}")
+        self._handle = handle
+
+    def close(self):
+        if self._handle is not None:
+            self._kernel32.CloseHandle(self._handle)
+            self._handle = None
+
+    def send(self, ioctl_code, buffer):
+        bytes_returned = wintypes.DWORD()
+        success = self._kernel32.DeviceIoControl(
+            self._handle,
+            ioctl_code,
+            ctypes.byref(buffer),
+            ctypes.sizeof(buffer),
+            None,
+            0,
+            ctypes.byref(bytes_returned),
+            None
+        )
+        if not success:
+            raise OSError(f"Failed to send IOCTL: {ctypes.get_last_error()}")
+
+
+class MemoryDeviceTransport(DeviceTransport):
+    """In-memory stand-in for the driver; records every payload it receives."""
+
+    def __init__(self):
+        self.is_open = False
+        self.opens = 0
+        self.payloads = []
+        self.fail_next_sends = 0
+
+    def open(self):
+        if not self.is_open:
+            self.is_open = True
+            self.opens += 1
+
+    def close(self):
+        self.is_open = False
+
+    def send(self, ioctl_code, buffer):
+        if not self.is_open:
+            raise OSError("Device is not open")
+        if self.fail_next_sends:
+            self.fail_next_sends -= 1
+            raise OSError("Failed to send IOCTL: simulated failure")
+        self.payloads.append((ioctl_code, ctypes.string_at(ctypes.addressof(buffer), ctypes.sizeof(buffer))))
+
+
+class DriverChannel:
+    """
+    Long-lived connection to the blocking driver.
+
+    Keeps the device open between pushes, reuses a single APPLICATION_LIST buffer,
+    and skips the IOCTL when the normalized list matches the last successful push.
+    A restarted driver starts with an empty list without the skip noticing, so an
+    unchanged list is still re-sent once refresh_interval has passed since the
+    last IOCTL. A push whose retry after reconnecting succeeds has delivered its
+    list; one that fails clears the digest, so the next push is always sent.
+    """
+
+    def __init__(self, transport, ioctl_code=IOCTL_RECEIVE_APP_LIST, refresh_interval=REFRESH_INTERVAL):
+        self.transport = transport
+        self.ioctl_code = ioctl_code
+        self.refresh_interval = refresh_interval
+        self._buffer = APPLICATION_LIST()
+        self._used_chars = 0
+        self._last_digest = None
+        self._last_sent = 0.0  # time.monotonic() of the last successful IOCTL
+        self._lock = threading.Lock()
+        self.pushes = 0
+        self.skipped = 0
+
+    @staticmethod
+    def normalize(app_names):
+        return sorted({name[:MAX_PATH] for name in app_names if name})
+
+    @staticmethod
+    def digest(normalized):
+        return hashlib.blake2b("\0".join(normalized).encode("utf-8"), digest_size=16).digest()
+
+    def _fill_buffer(self, normalized):
+        # Only the slots written by the previous push need clearing.
+        if self._used_chars:
+            ctypes.memset(ctypes.addressof(self._buffer) + APPLICATION_LIST.Applications.offset, 0,
+                          self._used_chars * ctypes.sizeof(wintypes.WCHAR))
+        self._buffer.Applications = ''.join(name.ljust(MAX_PATH, '\0') for name in normalized)
+        self._buffer.Count = len(normalized)
+        self._used_chars = len(normalized) * MAX_PATH
+
+    def _send(self):
+        self.transport.open()
+        try:
+            self.transport.send(self.ioctl_code, self._buffer)
+        except OSError as e:
+            # The handle may be stale (driver restarted); reconnect once and retry.
+            logging.warning(f"Driver IOCTL failed, reconnecting: {e}")
+            self.transport.close()
+            self.transport.open()
+            self.transport.send(self.ioctl_code, self._buffer)
+
+    def push(self, app_names, force=False):
+        """Send the application list to the driver. Returns a status dict like the rest of the driver API."""
+        normalized = self.normalize(app_names)
+        if len(normalized) > MAX_APPS:
+            return {"status": "error", "message": f"Driver accepts at most {MAX_APPS} applications"}
+
+        digest = self.digest(normalized)
+        with self._lock:
+            stale = time.monotonic() - self._last_sent >= self.refresh_interval
+            if not force and not stale and digest == self._last_digest:
+                self.skipped += 1
+                return {"status": "success", "message": "Application list unchanged; driver already up to date"}
+
+            self._fill_buffer(normalized)
+            try:
+                self._send()
+            except OSError as e:
+                self._last_digest = None
+                self.transport.close()
+                return {"status": "error", "message": str(e)}
+
+            self._last_digest = digest
+            self._last_sent = time.monotonic()
+            self.pushes += 1
+
+        if not normalized:
+            return {"status": "success", "message": "Successfully sent empty application list to kernel driver"}
+        return {"status": "success", "message": f"Successfully sent {len(normalized)} applications to kernel driver"}
+
+    def close(self):
+        with self._lock:
+            self.transport.close()
+            self._last_digest = None
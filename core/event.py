@@ -2,7 +2,8 @@ from datetime import datetime, timedelta
 
 
 class Event:
-    def __init__(self, timestamp, app_process_name, app_name, window_title, pid, app_icon, duration=timedelta(seconds=0), url=None):
+    def __init__(self, timestamp, app_process_name, app_name, window_title, pid, app_icon, duration=timedelta(seconds=0), url=None,
+                 app_exe_path=None):
         self.timestamp = timestamp
         self.app_process_name = app_process_name
         self.app_name = app_name
@@ -11,6 +12,10 @@ class Event:
         self.app_icon = app_icon
         self.duration = duration
         self.url = url
+        self.app_exe_path = app_exe_path  # where a late-extracted icon is looked up
+        # Set once the event has a row in app_usage; flushed_seconds is the duration stored there.
+        self.row_id = None
+        self.flushed_seconds = 0
 
     def to_row(self):
         return (
@@ -21,9 +26,13 @@ class Event:
             self.pid,
             self.app_icon,
             int(self.duration.total_seconds()),
-            self.url
+            self.url,
+            int(self.timestamp.timestamp())
         )
 
+    def duration_seconds(self):
+        return int(self.duration.total_seconds())
+
     def is_equivalent(self, other):
         return (
             self.app_process_name == other.app_process_name and
@@ -1,34 +1,174 @@
 import logging
 import os
-import sqlite3
+import threading
+import time
 from datetime import datetime
 from config.config import USAGE_DB_PATH, DATA_DIR
+from core.storage import get_connection
 
 DB_PATH = USAGE_DB_PATH
 
+BEAT_TOLERANCE = 150   # seconds; a beat within this of the open interval's end extends it
+FLUSH_INTERVAL = 300   # seconds between writes of the open interval's end
+
+_lock = threading.Lock()
+_open = None           # [row_id, start_ts, end_ts, beats] of the current uptime interval
+_flushed = None        # (end_ts, beats) last written for it
+_last_flush = 0.0      # time.monotonic() of that write
+
 
 def init_heartbeat_table():
+    """Create uptime_intervals and fold any rows of the old per-beat heartbeat table into it."""
     os.makedirs(DATA_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS heartbeat (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT
-        )
+    conn = get_connection(DB_PATH)
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS uptime_intervals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start_ts INTEGER NOT NULL,
+                end_ts INTEGER NOT NULL,
+                beats INTEGER NOT NULL DEFAULT 1
+            )
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_uptime_intervals_end ON uptime_intervals(end_ts)")
+    migrate_heartbeat_rows(conn)
+    _resume_last_interval(conn)
+
+
+def migrate_heartbeat_rows(conn, tolerance=BEAT_TOLERANCE):
+    """
+    Compact the legacy heartbeat table (one ISO timestamp row per beat) into
+    uptime intervals and drop it. Runs in one transaction, so an interrupted
+    migration leaves the old table in place and is simply redone. Returns the
+    number of beats folded.
+    """
+    legacy = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='heartbeat'"
+    ).fetchone()
+    if not legacy:
+        return 0
+
+    beats = conn.execute('''
+        SELECT CAST(strftime('%s', timestamp, 'utc') AS INTEGER) AS ts FROM heartbeat
+        WHERE ts IS NOT NULL ORDER BY ts
     ''')
-    conn.commit()
-    conn.close()
-
-
-def send_heartbeat():
-    timestamp = datetime.now().isoformat(timespec='seconds')
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute('INSERT INTO heartbeat (timestamp) VALUES (?)', (timestamp,))
-    conn.commit()
-    conn.close()
-    logging.info(f"Heartbeat sent at {timestamp}")
+    intervals = []
+    count = 0
+    for (ts,) in beats:
+        count += 1
+        if intervals and ts - intervals[-1][1] <= tolerance:
+            intervals[-1][1] = ts
+            intervals[-1][2] += 1
+        else:
+            intervals.append([ts, ts, 1])
+
+    with conn:
+        conn.executemany("INSERT INTO uptime_intervals (start_ts, end_ts, beats) VALUES (?, ?, ?)", intervals)
+        conn.execute("DROP TABLE heartbeat")
+    logging.info(f"Compacted {count} heartbeat rows into {len(intervals)} uptime intervals")
+    return count
+
+
+def _resume_last_interval(conn):
+    """Pick up the newest interval so a quick restart extends it instead of opening a gap."""
+    global _open, _flushed
+    row = conn.execute(
+        "SELECT id, start_ts, end_ts, beats FROM uptime_intervals ORDER BY end_ts DESC LIMIT 1"
+    ).fetchone()
+    with _lock:
+        _open = list(row) if row else None
+        _flushed = (row[2], row[3]) if row else None
+
+
+def send_heartbeat(tolerance=BEAT_TOLERANCE, flush_interval=FLUSH_INTERVAL):
+    """
+    Record that the device is up now.
+
+    A beat within tolerance of the open interval's end only moves that end in
+    memory; it is written every flush_interval seconds and by flush_heartbeat()
+    at shutdown, so a hard kill loses at most flush_interval of uptime. A beat
+    after a longer gap closes the interval and opens a new one.
+    """
+    global _open, _flushed, _last_flush
+    now = int(time.time())
+    with _lock:
+        if _open is not None and 0 <= now - _open[2] <= tolerance:
+            _open[2] = now
+            _open[3] += 1
+            if time.monotonic() - _last_flush >= flush_interval:
+                _flush_locked()
+            return
+
+        _flush_locked()
+        conn = get_connection(DB_PATH)
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO uptime_intervals (start_ts, end_ts, beats) VALUES (?, ?, 1)", (now, now)
+            )
+        _open = [cursor.lastrowid, now, now, 1]
+        _flushed = (now, 1)
+        _last_flush = time.monotonic()
+    logging.info(f"Uptime interval opened at {datetime.fromtimestamp(now).isoformat(timespec='seconds')}")
+
+
+def _flush_locked():
+    global _flushed, _last_flush
+    _last_flush = time.monotonic()
+    if _open is None or _flushed == (_open[2], _open[3]):
+        return
+    conn = get_connection(DB_PATH)
+    with conn:
+        conn.execute("UPDATE uptime_intervals SET end_ts=?, beats=? WHERE id=?", (_open[2], _open[3], _open[0]))
+    _flushed = (_open[2], _open[3])
+
+
+def flush_heartbeat():
+    """Write the open interval's in-memory end time to the database."""
+    with _lock:
+        _flush_locked()
+
+
+def get_uptime(start, end, db_path=DB_PATH):
+    """
+    Availability in [start, end) (naive local datetimes) from the uptime intervals.
+
+    The window is cut off at the present. Intervals are clipped to it; the open
+    interval is read from memory, so beats not yet written still count.
+    """
+    window_start = int(start.timestamp())
+    window_end = min(int(end.timestamp()), int(time.time()))
+    if window_end <= window_start:
+        raise ValueError("'to' must be after 'from'")
+
+    with _lock:
+        open_id, open_end = (_open[0], _open[2]) if _open is not None else (None, None)
+    rows = get_connection(db_path).execute('''
+        SELECT id, start_ts, end_ts FROM uptime_intervals
+        WHERE (end_ts >= ? OR id = ?) AND start_ts < ?
+        ORDER BY start_ts
+    ''', (window_start, open_id, window_end)).fetchall()
+
+    intervals = []
+    up_seconds = 0
+    for row_id, start_ts, end_ts in rows:
+        if row_id == open_id:
+            end_ts = max(end_ts, open_end)
+        clipped_start, clipped_end = max(start_ts, window_start), min(end_ts, window_end)
+        if clipped_end < clipped_start:
+            continue
+        up_seconds += clipped_end - clipped_start
+        intervals.append({
+            "start": datetime.fromtimestamp(clipped_start).isoformat(timespec="seconds"),
+            "end": datetime.fromtimestamp(clipped_end).isoformat(timespec="seconds"),
+        })
+
+    total = window_end - window_start
+    return {
+        "up_seconds": up_seconds,
+        "down_seconds": total - up_seconds,
+        "availability": round(up_seconds / total, 6),
+        "intervals": intervals,
+    }
 
 
 # Initialize table on import
@@ -1,45 +1,245 @@
 import os
+import hashlib
 import logging
+import shutil
+import tempfile
+import threading
+from bisect import bisect_left
 
-HOSTS_PATH = r"C:\Windows\System32\drivers\etc\hosts"
+HOSTS_PATH = os.environ.get("MDM_HOSTS_PATH", r"C:\Windows\System32\drivers\etc\hosts")
 REDIRECT_IP = "127.0.0.1"
 
+BEGIN_MARKER = "# BEGIN MDM SERVICE BLOCKLIST - managed automatically, do not edit"
+END_MARKER = "# END MDM SERVICE BLOCKLIST"
 
-def read_blocked_websites():
-    blocked = []
+_hosts_lock = threading.Lock()
+_snapshots = {}  # hosts path -> BlockedWebsites of the file version it was built from
+
+
+def normalize_domain(site):
+    """Lowercase host name without surrounding whitespace or a trailing dot; '' if unusable."""
+    site = (site or "").strip().lower().rstrip(".")
+    if not site or "#" in site or len(site.split()) != 1:
+        return ""
+    return site
+
+
+def _find_line(text, line, start=0):
+    """Offset of the first line of text equal to line (ignoring surrounding spaces), or -1."""
+    offset = text.find(line, max(start, 0))
+    while offset >= 0:
+        line_start = text.rfind("\n", 0, offset) + 1
+        line_end = text.find("\n", offset)
+        if text[line_start:line_end if line_end >= 0 else len(text)].strip() == line:
+            return offset
+        offset = text.find(line, offset + 1)
+    return -1
+
+
+class HostsFile:
+    """
+    A hosts file split around the service's managed section.
+
+    Lines outside the section are kept verbatim. `legacy` holds the exact
+    "<REDIRECT_IP> <site>" lines earlier versions appended outside any section.
+    """
+
+    def __init__(self, text):
+        self.blocked = set()
+        self.has_section = False
+
+        # The section can hold 100k+ lines, so it is located and tokenized as a whole
+        # instead of line by line; only the few lines around it are inspected.
+        begin = _find_line(text, BEGIN_MARKER)
+        end = _find_line(text, END_MARKER, begin) if begin >= 0 else -1
+        if begin >= 0 and end >= 0:
+            self.has_section = True
+            tokens = text[begin + len(BEGIN_MARKER):end].split()
+            self.blocked = set(tokens[1::2])
+            self.before = text[:begin].splitlines()
+            self.after = text[end + len(END_MARKER):].splitlines()[1:]
+        else:
+            self.before = text.splitlines()
+            self.after = []
+
+        self.legacy = set()
+        for line in self.before + self.after:
+            parts = line.split()
+            if len(parts) == 2 and parts[0] == REDIRECT_IP and parts[1] != "localhost":
+                self.legacy.add(parts[1])
+
+    def remove_legacy(self, sites):
+        """Drop legacy lines for sites. Returns the sites that had one."""
+        found = self.legacy & sites
+        if found:
+            legacy_lines = {f"{REDIRECT_IP} {site}" for site in found}
+            self.before = [line for line in self.before if line.strip() not in legacy_lines]
+            self.after = [line for line in self.after if line.strip() not in legacy_lines]
+            self.legacy -= found
+        return found
+
+    def render(self):
+        before = self.before
+        if not self.has_section and before and before[-1].strip():
+            before = before + [""]
+        section = [BEGIN_MARKER]
+        if self.blocked:
+            section.append(f"{REDIRECT_IP} " + f"\n{REDIRECT_IP} ".join(sorted(self.blocked)))
+        section.append(END_MARKER)
+        return "\n".join(before + section + self.after) + "\n"
+
+
+class BlockedWebsites:
+    """Immutable, sorted blocklist of one hosts file version, as served by /block_websites."""
+
+    def __init__(self, sites, file_key):
+        self.sites = sorted(sites)
+        self.file_key = file_key
+        self.etag = hashlib.sha1("\n".join(self.sites).encode("utf-8")).hexdigest()
+
+    def with_prefix(self, prefix):
+        """Sites starting with prefix; a slice of the sorted list found by bisection."""
+        if not prefix:
+            return self.sites
+        lo = bisect_left(self.sites, prefix)
+        hi = bisect_left(self.sites, prefix[:-1] + chr(ord(prefix[-1]) + 1))
+        return self.sites[lo:hi]
+
+
+def _file_key(hosts_path):
+    """(mtime, size, inode) of the hosts file, or None if it does not exist."""
+    try:
+        st = os.stat(hosts_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _read_hosts(hosts_path):
+    try:
+        with open(hosts_path, "r", encoding="utf-8", errors="surrogateescape") as file:
+            return HostsFile(file.read())
+    except FileNotFoundError:
+        return HostsFile("")
+
+
+def _write_hosts(hosts_path, hosts):
+    """Replace the hosts file in one step: write a temp file next to it, then rename over it."""
+    directory = os.path.dirname(os.path.abspath(hosts_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".hosts.", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", errors="surrogateescape", newline="") as file:
+            file.write(hosts.render())
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(hosts_path):
+            shutil.copymode(hosts_path, temp_path)
+        os.replace(temp_path, hosts_path)
+        # The new content is already parsed, so the read cache is updated rather than invalidated.
+        _snapshots[hosts_path] = BlockedWebsites(hosts.blocked | hosts.legacy, _file_key(hosts_path))
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _update_hosts(update, hosts_path=None):
+    """
+    Read-modify-write of the managed section under one lock.
+
+    update(hosts) edits hosts.blocked / legacy lines and returns (added, removed);
+    the file is only rewritten when something changed.
+    """
+    hosts_path = hosts_path or HOSTS_PATH
+    with _hosts_lock:
+        hosts = _read_hosts(hosts_path)
+        added, removed = update(hosts)
+        if added or removed:
+            _write_hosts(hosts_path, hosts)
+    return {"added": sorted(added), "removed": sorted(removed)}
+
+
+def get_blocked_websites(hosts_path=None):
+    """
+    BlockedWebsites for the current hosts file.
+
+    The parsed list is cached per path and reused while the file's (mtime, size,
+    inode) is unchanged; edits made outside the service cause one re-parse.
+    """
+    hosts_path = hosts_path or HOSTS_PATH
+    file_key = _file_key(hosts_path)
+    snapshot = _snapshots.get(hosts_path)
+    if snapshot is not None and snapshot.file_key == file_key:
+        return snapshot
+
+    with _hosts_lock:
+        file_key = _file_key(hosts_path)
+        hosts = _read_hosts(hosts_path)
+        snapshot = _snapshots[hosts_path] = BlockedWebsites(hosts.blocked | hosts.legacy, file_key)
+    return snapshot
+
+
+def read_blocked_websites(hosts_path=None):
+    """Blocked sites: the managed section plus legacy lines written before it existed."""
     try:
-        with open(HOSTS_PATH, "r") as file:
-            for line in file:
-                if line.startswith(REDIRECT_IP):
-                    parts = line.strip().split()
-                    if len(parts) > 1:
-                        blocked.append(parts[1])
+        return list(get_blocked_websites(hosts_path).sites)
     except Exception as e:
         logging.error(f"Failed to read hosts file: {e}")
-    return blocked
+        return []
+
+
+def block_websites(websites, hosts_path=None):
+    sites = {normalize_domain(site) for site in websites} - {""}
 
+    def update(hosts):
+        added = sites - hosts.blocked
+        hosts.blocked |= added
+        return added, set()
 
-def block_websites(websites):
     try:
-        with open(HOSTS_PATH, "a") as file:
-            for site in websites:
-                file.write(f"{REDIRECT_IP} {site}\n")
-        logging.info(f"Blocked websites: {websites}")
+        delta = _update_hosts(update, hosts_path)
     except Exception as e:
         logging.error(f"Failed to block websites: {e}")
+        return {"status": "error", "message": str(e)}
+    if delta["added"]:
+        logging.info(f"Blocked websites: {len(delta['added'])} added")
+    return {"status": "success", "delta": delta}
 
 
-def unblock_websites(websites):
+def unblock_websites(websites, hosts_path=None):
+    sites = {normalize_domain(site) for site in websites} - {""}
+
+    def update(hosts):
+        removed = sites & hosts.blocked
+        hosts.blocked -= removed
+        removed |= hosts.remove_legacy(sites)
+        return set(), removed
+
     try:
-        if not os.path.exists(HOSTS_PATH):
-            return
-        with open(HOSTS_PATH, "r") as file:
-            lines = file.readlines()
-
-        with open(HOSTS_PATH, "w") as file:
-            for line in lines:
-                if not any(line.strip().endswith(site) and line.startswith(REDIRECT_IP) for site in websites):
-                    file.write(line)
-        logging.info(f"Unblocked websites: {websites}")
+        delta = _update_hosts(update, hosts_path)
     except Exception as e:
         logging.error(f"Failed to unblock websites: {e}")
+        return {"status": "error", "message": str(e)}
+    if delta["removed"]:
+        logging.info(f"Unblocked websites: {len(delta['removed'])} removed")
+    return {"status": "success", "delta": delta}
+
+
+def set_blocked_websites(websites, hosts_path=None):
+    """Make the managed section exactly websites. Legacy lines are left alone."""
+    sites = {normalize_domain(site) for site in websites} - {""}
+
+    def update(hosts):
+        added = sites - hosts.blocked
+        removed = hosts.blocked - sites
+        hosts.blocked = set(sites)
+        return added, removed
+
+    try:
+        delta = _update_hosts(update, hosts_path)
+    except Exception as e:
+        logging.error(f"Failed to set blocked websites: {e}")
+        return {"status": "error", "message": str(e)}
+    return {"status": "success", "delta": delta}
@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import ntpath
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from config.config import DATA_DIR
+
+ICONS_DIR = os.path.join(DATA_DIR, "icons")
+MAX_WORKERS = 2
+MAX_PENDING = 64
+
+
+def icon_key(exe_path):
+    """Content address of an exe's icon: its normalized path plus size and mtime."""
+    st = os.stat(exe_path)
+    ident = f"{ntpath.normcase(exe_path)}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(ident.encode("utf-8")).hexdigest()
+
+
+class IconStore:
+    """
+    Content-addressed icon files, extracted off the sampling thread.
+
+    request() never parses a PE file itself. A known icon is returned from the
+    in-memory index (warmed from index.json at startup); an unknown one is queued
+    on a small bounded worker pool, deduplicated by key, and the callback receives
+    the icon path once it exists. At most max_pending extractions are submitted at
+    once; further ones wait in order, callbacks included, until a slot frees up.
+    """
+
+    def __init__(self, icons_dir=ICONS_DIR, extractor=None, max_workers=MAX_WORKERS, max_pending=MAX_PENDING):
+        if extractor is None:
+            from utils.image_extract import extract_icon_from_exe
+            extractor = extract_icon_from_exe
+        self.icons_dir = icons_dir
+        self.index_path = os.path.join(icons_dir, "index.json")
+        self.extractor = extractor
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="icon-extract")
+        self._index = {}    # key -> icon path, or None if extraction failed
+        self._pending = {}  # key -> callbacks waiting for it
+        self._waiting = deque()  # (key, exe_path) not yet submitted
+        self._submitted = 0
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()  # workers share index.json.tmp
+        os.makedirs(icons_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        self._index = {key: path for key, path in index.items() if path and os.path.exists(path)}
+
+    def _save_index(self):
+        temp_path = self.index_path + ".tmp"
+        with self._save_lock:
+            with self._lock:
+                index = {key: path for key, path in self._index.items() if path}
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(temp_path, self.index_path)
+
+    def request(self, exe_path, callback=None):
+        """
+        Icon path for exe_path if already extracted, else None.
+
+        In the None case extraction is scheduled (once per key) and callback, if
+        given, is later called with the icon path (or None on failure).
+        """
+        try:
+            key = icon_key(exe_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            if key in self._index:
+                return self._index[key]
+            waiters = self._pending.get(key)
+            if waiters is not None:
+                if callback:
+                    waiters.append(callback)
+                return None
+            self._pending[key] = [callback] if callback else []
+            if self._submitted >= self.max_pending:
+                self._waiting.append((key, exe_path))
+                return None
+            self._submitted += 1
+
+        self._executor.submit(self._extract, key, exe_path)
+        return None
+
+    def _extract(self, key, exe_path):
+        icon_path = None
+        try:
+            icon_path = self.extractor(exe_path, os.path.join(self.icons_dir, f"{key}.ico"))
+        except Exception as e:
+            logging.error(f"Icon extraction failed for {exe_path}: {e}")
+
+        with self._lock:
+            self._index[key] = icon_path
+            callbacks = self._pending.pop(key, [])
+            next_job = self._waiting.popleft() if self._waiting else None
+            if next_job is None:
+                self._submitted -= 1
+        if next_job is not None:
+            self._executor.submit(self._extract, *next_job)
+
+        if icon_path:
+            try:
+                self._save_index()
+            except OSError as e:
+                logging.error(f"Failed to save icon index: {e}")
+
+        for callback in callbacks:
+            try:
+                callback(icon_path)
+            except Exception as e:
+                logging.error(f"Icon callback failed for {exe_path}: {e}")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+icon_store = IconStore()
@@ -0,0 +1,223 @@
+import hashlib
+import json
+import logging
+import ntpath
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+UNINSTALL_KEYS = [
+    r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall",
+    r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall",
+]
+
+REFRESH_INTERVAL = 600  # seconds
+SNAPSHOT_HISTORY = 16  # past versions kept for ?since= deltas
+
+
+class RegistryProvider(ABC):
+    @abstractmethod
+    def iter_uninstall_entries(self):
+        """
+        Yield one dict per Uninstall subkey that has a DisplayName:
+        {"name": ..., "version": ... or None, "install_location": ... or ""}
+        """
+        pass
+
+
+class WinregRegistryProvider(RegistryProvider):
+    """Reads the Uninstall keys of HKLM and HKCU, both registry views."""
+
+    def iter_uninstall_entries(self):
+        import winreg
+
+        for root in (winreg.HKEY_LOCAL_MACHINE, winreg.HKEY_CURRENT_USER):
+            for subkey in UNINSTALL_KEYS:
+                try:
+                    with winreg.OpenKey(root, subkey) as key:
+                        for i in range(winreg.QueryInfoKey(key)[0]):
+                            try:
+                                subkey_name = winreg.EnumKey(key, i)
+                                with winreg.OpenKey(key, subkey_name) as app_key:
+                                    display_name = winreg.QueryValueEx(app_key, "DisplayName")[0]
+                                    yield {
+                                        "name": display_name,
+                                        "version": _query_optional(winreg, app_key, "DisplayVersion"),
+                                        "install_location": _query_optional(winreg, app_key, "InstallLocation") or "",
+                                    }
+                            except (FileNotFoundError, OSError, PermissionError):
+                                continue
+                except FileNotFoundError:
+                    continue
+
+
+def _query_optional(winreg, key, name):
+    try:
+        return winreg.QueryValueEx(key, name)[0]
+    except FileNotFoundError:
+        return None
+
+
+class StaticRegistryProvider(RegistryProvider):
+    """Serves a fixed list of entries; stands in for the registry in tests and benchmarks."""
+
+    def __init__(self, entries):
+        self.entries = list(entries)
+        self.walks = 0
+
+    def iter_uninstall_entries(self):
+        self.walks += 1
+        return iter(self.entries)
+
+
+def normalize_path(path):
+    """Case-folded, backslash-separated Windows path without quotes or trailing separator."""
+    path = (path or "").strip().strip('"')
+    if not path:
+        return ""
+    return ntpath.normcase(ntpath.normpath(path)).rstrip("\\")
+
+
+class InstallLocationIndex:
+    """
+    Maps normalized install locations to display names.
+
+    A lookup walks up the exe path's directories and returns the deepest install
+    location containing it, so cost depends on path depth, not on how many
+    applications are installed.
+    """
+
+    def __init__(self, entries):
+        self._by_location = {}
+        for entry in entries:
+            location = normalize_path(entry.get("install_location"))
+            if location and len(location) > 3:  # never map a bare drive root
+                self._by_location.setdefault(location, entry["name"])
+
+    def __len__(self):
+        return len(self._by_location)
+
+    def lookup(self, exe_path):
+        directory = ntpath.dirname(normalize_path(exe_path))
+        while directory:
+            name = self._by_location.get(directory)
+            if name is not None:
+                return name
+            parent = ntpath.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+        return None
+
+
+def _app_list(entries):
+    """Deduplicated {name, version} list sorted by name, as /installed_app returns it."""
+    unique_apps = {}
+    for entry in entries:
+        unique_apps[entry["name"]] = {"name": entry["name"], "version": entry.get("version") or "Unknown"}
+    return sorted(unique_apps.values(), key=lambda x: x["name"].lower())
+
+
+class InventorySnapshot:
+    """One immutable version of the installed-software list."""
+
+    def __init__(self, version, apps, digest, modified_at):
+        self.version = version
+        self.apps = apps
+        self.etag = digest
+        self.modified_at = modified_at
+        self.keys = frozenset((app["name"], app["version"]) for app in apps)
+
+
+class SoftwareInventory:
+    """
+    Snapshot of the Uninstall registry, walked once and refreshed in the background.
+
+    The same walk feeds the installed-app list and the install-location index used
+    to resolve friendly app names. Each distinct list gets a new version (a
+    millisecond timestamp, so versions stay unique across restarts), and the last
+    few versions are kept so clients can ask for what changed since theirs.
+    """
+
+    def __init__(self, provider=None, refresh_interval=REFRESH_INTERVAL):
+        self.provider = provider or WinregRegistryProvider()
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._history = OrderedDict()
+        self._location_index = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        """Walk the registry now and swap in the new snapshot. Returns the current snapshot."""
+        entries = list(self.provider.iter_uninstall_entries())
+        apps = _app_list(entries)
+        digest = hashlib.sha1(json.dumps(apps, sort_keys=True).encode("utf-8")).hexdigest()
+        location_index = InstallLocationIndex(entries)
+
+        with self._lock:
+            self._location_index = location_index
+            if self._snapshot is not None and self._snapshot.etag == digest:
+                return self._snapshot
+
+            version = int(time.time() * 1000)
+            if self._snapshot is not None and version <= self._snapshot.version:
+                version = self._snapshot.version + 1
+            self._snapshot = InventorySnapshot(version, apps, digest, datetime.now(timezone.utc))
+            self._history[version] = self._snapshot
+            while len(self._history) > SNAPSHOT_HISTORY:
+                self._history.popitem(last=False)
+            return self._snapshot
+
+    def snapshot(self):
+        """Current snapshot, walking the registry first if it has never been walked."""
+        if self._snapshot is None:
+            return self.refresh()
+        return self._snapshot
+
+    def changes_since(self, version):
+        """
+        {"added": [...], "removed": [...]} between version and the current snapshot,
+        or None if version is unknown or too old to diff against.
+        """
+        current = self.snapshot()
+        with self._lock:
+            base = self._history.get(version)
+        if base is None:
+            return None
+
+        added = current.keys - base.keys
+        removed = base.keys - current.keys
+        return {
+            "added": [{"name": n, "version": v} for n, v in sorted(added, key=lambda k: k[0].lower())],
+            "removed": [{"name": n, "version": v} for n, v in sorted(removed, key=lambda k: k[0].lower())],
+        }
+
+    def friendly_name(self, exe_path):
+        """Display name of the installed application whose install location contains exe_path."""
+        if self._location_index is None:
+            self.refresh()
+        return self._location_index.lookup(exe_path)
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.error(f"Failed to refresh installed software: {e}")
+
+    def start_background_refresh(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._refresh_loop, name="software-inventory", daemon=True)
+        self._thread.start()
+
+    def stop_background_refresh(self):
+        self._stop.set()
+
+
+inventory = SoftwareInventory()
@@ -0,0 +1,122 @@
+import logging
+from bisect import bisect_right
+from datetime import datetime, timedelta
+
+logger = logging.getLogger('app_block_policy')
+
+TIME_FORMAT = '%H:%M'
+RESOLUTION = 1e-6  # seconds; datetime.time, which is_time_blocked() compares, has microsecond precision
+
+
+def parse_rule_time(value):
+    """Parse an 'HH:MM' rule boundary into a datetime.time."""
+    return datetime.strptime(value, TIME_FORMAT).time()
+
+
+def _seconds_of_day(t):
+    return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1_000_000
+
+
+class CompiledRule:
+    """One row of app_block_rules with its time window parsed up front."""
+
+    __slots__ = ('app_name', 'always_blocked', 'usage_limit_seconds',
+                 'time_start', 'time_end', 'notes')
+
+    def __init__(self, rule):
+        self.app_name = rule['app_name']
+        self.always_blocked = bool(rule['always_blocked'])
+        self.usage_limit_seconds = rule['usage_limit_seconds']
+        self.notes = rule['notes']
+        self.time_start = None
+        self.time_end = None
+
+        if rule['time_start'] and rule['time_end']:
+            try:
+                self.time_start = parse_rule_time(rule['time_start'])
+                self.time_end = parse_rule_time(rule['time_end'])
+            except ValueError:
+                self.time_start = self.time_end = None
+                logger.error(f"Invalid time format for app {self.app_name}")
+
+    def is_time_blocked(self, current_time):
+        if self.time_start is None:
+            return False
+        if self.time_start <= self.time_end:
+            return self.time_start <= current_time <= self.time_end
+        return current_time >= self.time_start or current_time <= self.time_end
+
+    def is_usage_limited(self, usage_seconds):
+        return bool(self.usage_limit_seconds) and usage_seconds >= self.usage_limit_seconds
+
+    def should_block(self, current_time, usage_seconds):
+        return (self.always_blocked or
+                self.is_time_blocked(current_time) or
+                self.is_usage_limited(usage_seconds))
+
+
+class CompiledRuleSet:
+    """All block rules keyed by app name, built once from get_app_block_rules() output."""
+
+    def __init__(self, rules):
+        self.by_app = {}
+        for rule in rules:
+            self.by_app[rule['app_name']] = CompiledRule(rule)
+
+        # Seconds of the day at which some time window opens or closes. is_time_blocked()
+        # compares time_end inclusively, so a window still applies at exactly HH:MM:00
+        # and stops applying one microsecond after it.
+        edges = set()
+        self.has_usage_limits = False
+        for rule in self.by_app.values():
+            if rule.always_blocked:
+                continue
+            if rule.time_start is not None:
+                edges.add(_seconds_of_day(rule.time_start))
+                edges.add(_seconds_of_day(rule.time_end) + RESOLUTION)
+            if rule.usage_limit_seconds:
+                self.has_usage_limits = True
+        self.edges = sorted(edges)
+
+    def __len__(self):
+        return len(self.by_app)
+
+    def get(self, app_name):
+        return self.by_app.get(app_name)
+
+    def apps_to_block(self, current_time, usage):
+        """
+        Apps that must be blocked at current_time.
+
+        usage maps app name to seconds used today; apps missing from it count as 0.
+        """
+        return [app_name for app_name, rule in self.by_app.items()
+                if rule.should_block(current_time, usage.get(app_name, 0))]
+
+    def next_change_at(self, now, foreground_app=None, foreground_usage=0):
+        """
+        Earliest moment after now at which apps_to_block() can give a different answer.
+
+        That is the next time-window edge of any rule, midnight when usage limits
+        exist (usage resets daily), and the moment the foreground app would use up
+        its limit if it stays in front. Returns None if no rule depends on time.
+        """
+        start_of_day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        candidates = []
+
+        if self.edges:
+            i = bisect_right(self.edges, _seconds_of_day(now.time()))
+            if i < len(self.edges):
+                candidates.append(start_of_day + timedelta(seconds=self.edges[i]))
+            else:
+                candidates.append(start_of_day + timedelta(days=1, seconds=self.edges[0]))
+
+        if self.has_usage_limits:
+            candidates.append(start_of_day + timedelta(days=1))
+
+        rule = self.by_app.get(foreground_app)
+        if (rule and rule.usage_limit_seconds and not rule.always_blocked
+                and foreground_usage < rule.usage_limit_seconds):
+            candidates.append(now + timedelta(seconds=rule.usage_limit_seconds - foreground_usage))
+
+        return min(candidates) if candidates else None
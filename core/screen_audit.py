@@ -0,0 +1,165 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from PIL import Image
+from config.config import DATA_DIR
+from core.screenshot import screenshot_service, encode_image, RetentionPolicy, FORMATS
+from core.storage import get_connection
+
+AUDIT_DIR = os.path.join(DATA_DIR, "screen_audit")
+AUDIT_DB_PATH = os.path.join(AUDIT_DIR, "index.db")
+
+HASH_SIZE = 8          # 8x8 difference hash, 64 bits
+DEDUP_THRESHOLD = 6    # frames closer than this many differing bits are not stored
+AUDIT_FORMAT = "jpeg"
+AUDIT_QUALITY = 70
+AUDIT_MAX_DIM = 1920
+
+
+def dhash(image, hash_size=HASH_SIZE):
+    """
+    Difference hash: downscale to (hash_size + 1) x hash_size grayscale and set one
+    bit per pixel that is brighter than its right neighbour.
+    """
+    small = image.resize((hash_size + 1, hash_size), Image.BILINEAR, reducing_gap=2.0).convert("L")
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+def init_audit_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS screen_captures (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            hash TEXT,
+            path TEXT,
+            width INTEGER,
+            height INTEGER,
+            bytes INTEGER
+        )
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_screen_captures_timestamp ON screen_captures(timestamp)")
+    conn.commit()
+
+
+class ScreenAudit:
+    """
+    Periodic audit screenshots that only keeps frames that visibly changed.
+
+    Each frame is hashed with dhash() and dropped when its Hamming distance to the
+    last kept frame is below threshold. Kept frames are downscaled JPEGs in
+    audit_dir, indexed in the screen_captures table. Skip counters are kept
+    in memory since process start; bytes_saved counts the size of the kept frame
+    each skipped one duplicated.
+    """
+
+    def __init__(self, backend=None, audit_dir=AUDIT_DIR, db_path=AUDIT_DB_PATH, threshold=DEDUP_THRESHOLD,
+                 fmt=AUDIT_FORMAT, quality=AUDIT_QUALITY, max_dim=AUDIT_MAX_DIM, retention=None):
+        self.backend = backend
+        self.audit_dir = audit_dir
+        self.db_path = db_path
+        self.threshold = threshold
+        self.fmt = fmt
+        self.quality = quality
+        self.max_dim = max_dim
+        self.retention = retention or RetentionPolicy(max_files=5000, max_bytes=1024 * 1024 * 1024, max_age_days=30)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screen-audit")
+        self._lock = threading.Lock()
+        self._busy = False
+        self._last_hash = None
+        self._last_size = 0
+        self.frames_captured = 0
+        self.frames_kept = 0
+        self.frames_skipped = 0
+        self.bytes_written = 0
+        self.bytes_saved = 0
+
+        os.makedirs(audit_dir, exist_ok=True)
+        init_audit_table(get_connection(db_path))
+
+    def submit(self):
+        """Schedule one capture unless the previous one is still running. Returns True if scheduled."""
+        with self._lock:
+            if self._busy:
+                return False
+            self._busy = True
+        self._executor.submit(self._run)
+        return True
+
+    def _run(self):
+        try:
+            self.capture_once()
+        except Exception as e:
+            logging.error(f"Audit screenshot failed: {e}")
+        finally:
+            with self._lock:
+                self._busy = False
+
+    def capture_once(self):
+        """Capture a frame and store it unless it duplicates the last one. Returns the stored path or None."""
+        backend = self.backend or screenshot_service.backend
+        image = backend.grab()
+        frame_hash = dhash(image)
+
+        with self._lock:
+            self.frames_captured += 1
+            if self._last_hash is not None and hamming(frame_hash, self._last_hash) < self.threshold:
+                self.frames_skipped += 1
+                self.bytes_saved += self._last_size
+                return None
+
+        data, width, height = encode_image(image, self.fmt, self.quality, self.max_dim)
+        now = datetime.now()
+        path = os.path.join(self.audit_dir, f"screenshot_{now.strftime('%Y-%m-%d_%H-%M-%S_%f')}.{FORMATS[self.fmt][2]}")
+        with open(path, "wb") as f:
+            f.write(data)
+
+        conn = get_connection(self.db_path)
+        with conn:
+            conn.execute(
+                "INSERT INTO screen_captures (timestamp, hash, path, width, height, bytes) VALUES (?, ?, ?, ?, ?, ?)",
+                (now.isoformat(), f"{frame_hash:016x}", path, width, height, len(data))
+            )
+            removed = self.retention.apply(self.audit_dir)
+            if removed:
+                conn.executemany("DELETE FROM screen_captures WHERE path = ?", [(p,) for p in removed])
+
+        with self._lock:
+            self._last_hash = frame_hash
+            self._last_size = len(data)
+            self.frames_kept += 1
+            self.bytes_written += len(data)
+        return path
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "frames_captured": self.frames_captured,
+                "frames_kept": self.frames_kept,
+                "frames_skipped": self.frames_skipped,
+                "bytes_written": self.bytes_written,
+                "bytes_saved": self.bytes_saved,
+            }
+        stored, stored_bytes = get_connection(self.db_path).execute(
+            "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM screen_captures"
+        ).fetchone()
+        stats["stored_frames"] = stored
+        stats["stored_bytes"] = stored_bytes
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+screen_audit = ScreenAudit()
@@ -1,24 +1,206 @@
-import os
+import io
 import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from PIL import ImageGrab
+from PIL import Image
 from config.config import DATA_DIR
 
 SCREENSHOT_DIR = os.path.join(DATA_DIR, "screenshots")
 os.makedirs(SCREENSHOT_DIR, exist_ok=True)
 
+ENCODE_WORKERS = 2
+DEFAULT_QUALITY = 80
+PNG_COMPRESS_LEVEL = 1  # zlib level; Pillow's default 6 is several times slower on screen content
 
-def capture_screenshot():
-    try:
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        filename = f"screenshot_{timestamp}.png"
-        filepath = os.path.join(SCREENSHOT_DIR, filename)
+# format name -> (Pillow format, mimetype, file extension)
+FORMATS = {
+    "png": ("PNG", "image/png", "png"),
+    "jpeg": ("JPEG", "image/jpeg", "jpg"),
+    "jpg": ("JPEG", "image/jpeg", "jpg"),
+    "webp": ("WEBP", "image/webp", "webp"),
+}
+
+
+class CaptureBackend(ABC):
+    @abstractmethod
+    def grab(self):
+        """Return the current screen as a PIL image."""
+        pass
+
+
+class ImageGrabBackend(CaptureBackend):
+    """Captures all monitors through PIL.ImageGrab."""
+
+    def grab(self):
+        from PIL import ImageGrab
+        return ImageGrab.grab(all_screens=True)
+
+
+class SyntheticCaptureBackend(CaptureBackend):
+    """
+    Serves a generated desktop-like frame (flat windows over a gradient, one noisy
+    "photo" region); stands in for the screen in benchmarks.
+    """
+
+    def __init__(self, width=3840, height=2160):
+        gradient = Image.linear_gradient("L").resize((width, height))
+        frame = Image.merge("RGB", (gradient, gradient.transpose(Image.ROTATE_180), gradient))
+        for i, color in enumerate(((240, 240, 240), (32, 33, 36), (255, 255, 255))):
+            box = (width * i // 4 + 40, height * i // 6 + 40, width * (i + 2) // 4, height * (i + 3) // 6)
+            frame.paste(color, box)
+        photo = (width // 2, height // 2, width * 7 // 8, height * 7 // 8)
+        noise = Image.effect_noise((photo[2] - photo[0], photo[3] - photo[1]), 40)
+        frame.paste(Image.merge("RGB", (noise, noise, noise)), photo[:2])
+        self.frame = frame
+        self.grabs = 0
+
+    def grab(self):
+        self.grabs += 1
+        return self.frame.copy()
+
+
+class RetentionPolicy:
+    """Limits on saved screenshots; a limit of None is not enforced."""
+
+    def __init__(self, max_files=500, max_bytes=512 * 1024 * 1024, max_age_days=7):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+    def apply(self, directory):
+        """Delete the oldest screenshots until every limit holds. Returns the deleted paths."""
+        try:
+            files = [entry for entry in os.scandir(directory)
+                     if entry.is_file() and entry.name.startswith("screenshot_")]
+        except FileNotFoundError:
+            return []
+
+        files = sorted(((entry.stat(), entry.path) for entry in files), key=lambda f: f[0].st_mtime)
+        total_bytes = sum(st.st_size for st, _ in files)
+        cutoff = time.time() - self.max_age_days * 86400 if self.max_age_days is not None else None
+
+        deleted = []
+        for st, path in files:
+            remaining = len(files) - len(deleted)
+            if not ((cutoff is not None and st.st_mtime < cutoff) or
+                    (self.max_files is not None and remaining > self.max_files) or
+                    (self.max_bytes is not None and total_bytes > self.max_bytes)):
+                break
+            try:
+                os.remove(path)
+            except OSError as e:
+                logging.error(f"Failed to remove old screenshot {path}: {e}")
+                continue
+            total_bytes -= st.st_size
+            deleted.append(path)
+        return deleted
+
+
+class Screenshot:
+    __slots__ = ("data", "mimetype", "width", "height", "path")
 
-        image = ImageGrab.grab()
-        image.save(filepath, "PNG")
+    def __init__(self, data, mimetype, width, height, path=None):
+        self.data = data
+        self.mimetype = mimetype
+        self.width = width
+        self.height = height
+        self.path = path
 
-        logging.info(f"Screenshot saved: {filepath}")
-        return filepath
+
+def encode_image(image, fmt="png", quality=DEFAULT_QUALITY, max_dim=None):
+    """Downscale image so neither side exceeds max_dim, then encode it. Returns (bytes, width, height)."""
+    pil_format = FORMATS[fmt][0]
+    if max_dim and max(image.size) > max_dim:
+        # reducing_gap=1.0 box-reduces by the whole factor first, leaving little to resample.
+        image.thumbnail((max_dim, max_dim), Image.BILINEAR, reducing_gap=1.0)
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    if pil_format == "PNG":
+        image.save(buffer, pil_format, compress_level=PNG_COMPRESS_LEVEL)
+    elif pil_format == "WEBP":
+        image.save(buffer, pil_format, quality=quality, method=0)
+    else:
+        image.save(buffer, pil_format, quality=quality)
+    return buffer.getvalue(), image.width, image.height
+
+
+class ScreenshotService:
+    """
+    Captures and encodes screenshots on a small worker pool.
+
+    Request threads only wait on a future, and Pillow releases the GIL while
+    encoding, so a slow 4K encode does not stall other API requests. Saving to
+    disk is optional per capture; every save is followed by the retention pass.
+    """
+
+    def __init__(self, backend=None, screenshot_dir=SCREENSHOT_DIR, retention=None, max_workers=ENCODE_WORKERS):
+        self.backend = backend or ImageGrabBackend()
+        self.screenshot_dir = screenshot_dir
+        self.retention = retention or RetentionPolicy()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="screenshot")
+        self._retention_lock = threading.Lock()
+
+    @staticmethod
+    def validate(fmt, quality, max_dim):
+        """Check capture options, raising ValueError; returns the normalised format."""
+        fmt = fmt.lower()
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        if not 1 <= quality <= 100:
+            raise ValueError("quality must be between 1 and 100")
+        if max_dim is not None and max_dim < 16:
+            raise ValueError("max_dim must be at least 16")
+        return fmt
+
+    def submit(self, fmt="png", quality=DEFAULT_QUALITY, max_dim=None, save=False):
+        """Schedule a capture; returns a Future resolving to a Screenshot."""
+        fmt = self.validate(fmt, quality, max_dim)
+        return self._executor.submit(self._capture, fmt, quality, max_dim, save)
+
+    def capture(self, fmt="png", quality=DEFAULT_QUALITY, max_dim=None, save=False):
+        return self.submit(fmt, quality, max_dim, save).result()
+
+    def _capture(self, fmt, quality, max_dim, save):
+        image = self.backend.grab()
+        data, width, height = encode_image(image, fmt, quality, max_dim)
+        _, mimetype, extension = FORMATS[fmt]
+
+        path = None
+        if save:
+            path = self._save(data, extension)
+        return Screenshot(data, mimetype, width, height, path)
+
+    def _save(self, data, extension):
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S_%f")
+        path = os.path.join(self.screenshot_dir, f"screenshot_{timestamp}.{extension}")
+        os.makedirs(self.screenshot_dir, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+        logging.info(f"Screenshot saved: {path}")
+
+        with self._retention_lock:
+            deleted = self.retention.apply(self.screenshot_dir)
+        if deleted:
+            logging.info(f"Removed {len(deleted)} old screenshot(s)")
+        return path
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+screenshot_service = ScreenshotService()
+
+
+def capture_screenshot():
+    """Capture a full-resolution PNG to disk and return its path, or None on failure."""
+    try:
+        return screenshot_service.capture("png", save=True).path
     except Exception as e:
         logging.error(f"Failed to capture screenshot: {e}")
         return None
@@ -0,0 +1,59 @@
+import os
+import sqlite3
+import threading
+
+# Connection tuning shared by every SQLite database the service owns.
+BUSY_TIMEOUT_MS = 5000
+CACHE_SIZE_KB = 8192
+MMAP_SIZE_BYTES = 256 * 1024 * 1024
+CACHED_STATEMENTS = 256
+
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{CACHE_SIZE_KB}",
+    f"PRAGMA mmap_size={MMAP_SIZE_BYTES}",
+    f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+)
+
+_local = threading.local()
+
+
+def get_connection(db_path):
+    """
+    Return this thread's long-lived connection to db_path, opening it on first use.
+
+    Connections are kept per thread because sqlite3 connections must not be shared
+    across threads. Statements run through them are cached by sqlite3 itself, so
+    reusing the same SQL text skips re-preparing it on every call.
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_path)
+    if conn is None:
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(
+            db_path,
+            timeout=BUSY_TIMEOUT_MS / 1000,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        connections[db_path] = conn
+    return conn
+
+
+def close_connections():
+    """Close every connection opened by the calling thread."""
+    connections = getattr(_local, "connections", None)
+    if not connections:
+        return
+    for conn in connections.values():
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+    connections.clear()
@@ -0,0 +1,122 @@
+import base64
+import json
+from datetime import date, datetime, time, timedelta
+from config.config import USAGE_DB_PATH
+from core.storage import get_connection
+
+DB_PATH = USAGE_DB_PATH
+
+GRANULARITIES = ("hour", "day")
+GROUP_BY_COLUMNS = {"app": "app_process_name", "app_name": "app_name", "url": "url"}
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+DEFAULT_RANGE = timedelta(days=1)  # when a caller gives no 'from'
+
+
+def parse_time(value):
+    """Epoch seconds or an ISO date/datetime (local unless it has an offset), as a naive local datetime."""
+    value = str(value).strip()
+    if value.lstrip("-").isdigit():
+        return datetime.fromtimestamp(int(value))
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def encode_cursor(bucket, key):
+    return base64.urlsafe_b64encode(json.dumps([bucket, key]).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        bucket, key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    return bucket, key
+
+
+def _day_start_ts(day):
+    return int(datetime.combine(day, time.min).timestamp())
+
+
+def _grouped(conn, table, bucket_column, bucket_expr, key_column, low, high, cursor_bucket, cursor_key, limit,
+             *bucket_params):
+    """(bucket, key, seconds) rows of table with low <= bucket_column < high, after the cursor."""
+    params = [*bucket_params, low, high]
+    having = ""
+    if cursor_bucket is not None:
+        params.extend((cursor_bucket, cursor_key))
+        having = "HAVING (bucket, key) > (?, ?)"
+    params.append(limit)
+    return conn.execute(f'''
+        SELECT {bucket_expr} AS bucket, {key_column} AS key, SUM(seconds)
+        FROM {table}
+        WHERE {bucket_column} >= ? AND {bucket_column} < ?
+        GROUP BY bucket, key
+        {having}
+        ORDER BY bucket, key
+        LIMIT ?
+    ''', params).fetchall()
+
+
+def query_usage(start, end, granularity="day", group_by="app", cursor=None, limit=DEFAULT_PAGE_SIZE,
+                db_path=DB_PATH):
+    """
+    Seconds of usage in [start, end) per time bucket and group.
+
+    Rows are ordered by (bucket, key) and paged with an opaque cursor: pass the
+    returned next_cursor to get the following page; it is None on the last page.
+    Buckets are included when they start inside the range, so with
+    granularity=hour the range is rounded to hours, and with day to whole days.
+    Day totals per app come from daily_usage, everything else from hourly_usage.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"granularity must be one of: {', '.join(GRANULARITIES)}")
+    if group_by not in GROUP_BY_COLUMNS:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY_COLUMNS)}")
+    if end <= start:
+        raise ValueError("'to' must be after 'from'")
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    key_column = GROUP_BY_COLUMNS[group_by]
+    cursor_bucket, cursor_key = decode_cursor(cursor) if cursor else (None, None)
+
+    conn = get_connection(db_path)
+    if granularity == "hour":
+        low = int(start.replace(minute=0, second=0, microsecond=0).timestamp())
+        if cursor_bucket is not None:
+            low = max(low, int(cursor_bucket))
+        rows = _grouped(conn, "hourly_usage", "hour_ts", "hour_ts", key_column, low, int(end.timestamp()),
+                        cursor_bucket, cursor_key, limit + 1)
+    else:
+        first_day = start.date()
+        last_day = (end - timedelta(microseconds=1)).date()
+        if cursor_bucket is not None:
+            first_day = max(first_day, date.fromisoformat(cursor_bucket))
+        if group_by == "app":
+            rows = _grouped(conn, "daily_usage", "day", "day", key_column, first_day.isoformat(),
+                            (last_day + timedelta(days=1)).isoformat(), cursor_bucket, cursor_key, limit + 1)
+        else:
+            # One small GROUP BY per local day rather than one date(hour_ts, ...)
+            # bucket over the whole range: no per-row date conversion, no big sort,
+            # and the loop stops as soon as the page is full.
+            rows = []
+            day = first_day
+            while day <= last_day and len(rows) <= limit:
+                bucket = day.isoformat()
+                rows.extend(_grouped(conn, "hourly_usage", "hour_ts", "?", key_column,
+                                     _day_start_ts(day), _day_start_ts(day + timedelta(days=1)),
+                                     cursor_bucket, cursor_key, limit + 1 - len(rows), bucket))
+                day += timedelta(days=1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+
+    data = []
+    for bucket, key, seconds in rows:
+        if granularity == "hour":
+            bucket = datetime.fromtimestamp(bucket).isoformat(timespec="seconds")
+        data.append({"bucket": bucket, group_by: key or None, "seconds": int(seconds)})
+    return {"data": data, "next_cursor": next_cursor}
@@ -0,0 +1,179 @@
+import argparse
+import logging
+import os
+import sqlite3
+import threading
+import time
+from config.config import USAGE_DB_PATH
+from core.storage import get_connection
+from core.usage_rollup import set_raw_usage_floor
+
+DB_PATH = USAGE_DB_PATH
+
+VACUUM_STEP_PAGES = 512    # pages returned to the OS per incremental_vacuum call
+
+_run_lock = threading.Lock()
+last_report = None
+
+
+class UsageRetentionPolicy:
+    """
+    How long each tier of usage data is kept; a window of None keeps that tier forever.
+
+    app_usage holds one raw row per foreground event (window title, icon path, ...).
+    Every row is also added to hourly_usage and daily_usage as it is written, so old
+    raw rows are already rolled up and only need deleting; likewise hourly rows
+    past hourly_days are covered by daily_usage, which is kept.
+    The raw cutoff is recorded (set_raw_usage_floor) before deleting, so
+    `python -m core.usage_rollup backfill` afterwards only rebuilds the days and
+    hours app_usage still fully covers, instead of wiping the older rollups.
+    from_env() reads MDM_RETENTION_RAW_DAYS / _HOURLY_DAYS / _BATCH_SIZE.
+    """
+
+    def __init__(self, raw_days=30, hourly_days=400, batch_size=5000, batch_pause=0.05):
+        self.raw_days = raw_days
+        self.hourly_days = hourly_days
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        defaults = cls()
+
+        def days(name, default):
+            value = environ.get(name)
+            if value is None:
+                return default
+            return None if value.lower() in ("", "none", "forever") else int(value)
+
+        return cls(
+            raw_days=days("MDM_RETENTION_RAW_DAYS", defaults.raw_days),
+            hourly_days=days("MDM_RETENTION_HOURLY_DAYS", defaults.hourly_days),
+            batch_size=int(environ.get("MDM_RETENTION_BATCH_SIZE", defaults.batch_size)),
+        )
+
+    def apply(self, db_path=DB_PATH):
+        """
+        Delete expired rows in batches of batch_size, each its own short transaction
+        followed by batch_pause, so the watcher's writes interleave instead of
+        waiting behind one long delete. Then give freed pages back to the OS.
+        Returns a report of rows compacted and bytes reclaimed.
+        """
+        global last_report
+        with _run_lock:
+            started = time.monotonic()
+            conn = get_connection(db_path)
+            size_before = _database_bytes(db_path)
+            report = {}
+
+            now = int(time.time())
+            report["raw_rows_deleted"], batches = 0, 0
+            if self.raw_days is not None:
+                set_raw_usage_floor(conn, now - self.raw_days * 86400)
+                report["raw_rows_deleted"], batches = self._delete_batches(conn, '''
+                    DELETE FROM app_usage WHERE id IN (
+                        SELECT id FROM app_usage WHERE ts < ? ORDER BY ts LIMIT ?
+                    )
+                ''', now - self.raw_days * 86400)
+
+            report["hourly_rows_deleted"], hourly_batches = 0, 0
+            if self.hourly_days is not None:
+                report["hourly_rows_deleted"], hourly_batches = self._delete_batches(conn, '''
+                    DELETE FROM hourly_usage WHERE (hour_ts, app_process_name, app_name, url) IN (
+                        SELECT hour_ts, app_process_name, app_name, url FROM hourly_usage
+                        WHERE hour_ts < ? ORDER BY hour_ts LIMIT ?
+                    )
+                ''', now - self.hourly_days * 86400)
+
+            report["batches"] = batches + hourly_batches
+            report["pages_vacuumed"] = incremental_vacuum(conn, self.batch_pause)
+            size_after = _database_bytes(db_path)
+            report["bytes_before"] = size_before
+            report["bytes_after"] = size_after
+            report["bytes_reclaimed"] = max(0, size_before - size_after)
+            report["duration_seconds"] = round(time.monotonic() - started, 3)
+            last_report = report
+
+        logging.info(f"Usage retention: {report['raw_rows_deleted']} raw and {report['hourly_rows_deleted']} "
+                     f"hourly rows compacted, {report['bytes_reclaimed']} bytes reclaimed")
+        return report
+
+    def _delete_batches(self, conn, sql, cutoff):
+        deleted = batches = 0
+        while True:
+            with conn:
+                count = conn.execute(sql, (cutoff, self.batch_size)).rowcount
+            deleted += count
+            batches += 1
+            if count < self.batch_size:
+                return deleted, batches
+            time.sleep(self.batch_pause)
+
+
+def _database_bytes(db_path):
+    """Size of the database file plus its WAL."""
+    total = 0
+    for path in (db_path, db_path + "-wal"):
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def enable_incremental_vacuum(conn):
+    """
+    Switch the database to auto_vacuum=INCREMENTAL, which an existing database only
+    does through a full VACUUM outside WAL mode. That needs conn to be the only
+    connection to the database, so init_db() calls this at startup; it is a no-op
+    once converted. Returns True if the conversion happened now.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    try:
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+    except sqlite3.OperationalError as e:
+        logging.warning(f"Could not enable incremental vacuum: {e}")
+        return False
+    finally:
+        conn.execute("PRAGMA journal_mode=WAL")
+    logging.info("Converted usage database to incremental auto_vacuum")
+    return True
+
+
+def incremental_vacuum(conn, pause=0.05, step_pages=VACUUM_STEP_PAGES):
+    """Release free pages step_pages at a time, then checkpoint so the file shrinks. Returns pages released."""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        return 0  # free pages are still reused by later writes, just not returned to the OS
+    released = 0
+    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free:
+        # executescript() steps the pragma to completion; execute() would free a single page.
+        conn.executescript(f"PRAGMA incremental_vacuum({step_pages})")
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if remaining >= free:
+            break
+        released += free - remaining
+        free = remaining
+        time.sleep(pause)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return released
+
+
+def run_usage_retention():
+    return UsageRetentionPolicy.from_env().apply()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    defaults = UsageRetentionPolicy.from_env()
+    parser = argparse.ArgumentParser(description="Compact old app_usage rows into the rollups and reclaim space.")
+    parser.add_argument("--db", default=DB_PATH, help="Path to usage.db")
+    parser.add_argument("--raw-days", type=int, default=defaults.raw_days)
+    parser.add_argument("--hourly-days", type=int, default=defaults.hourly_days)
+    parser.add_argument("--batch-size", type=int, default=defaults.batch_size)
+    args = parser.parse_args()
+
+    print(UsageRetentionPolicy(args.raw_days, args.hourly_days, args.batch_size).apply(args.db))
@@ -0,0 +1,227 @@
+import argparse
+import logging
+from datetime import datetime, timedelta
+from config.config import USAGE_DB_PATH
+from core.storage import get_connection
+
+DB_PATH = USAGE_DB_PATH
+
+
+def init_daily_usage_table(conn):
+    """Create the daily_usage rollup. Returns True if the table did not exist yet."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='daily_usage'"
+    ).fetchone()
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS daily_usage (
+                day TEXT NOT NULL,
+                app_process_name TEXT NOT NULL,
+                seconds INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, app_process_name)
+            ) WITHOUT ROWID
+        ''')
+    return not exists
+
+
+def add_daily_usage(conn, day, app_process_name, seconds):
+    """Add seconds to the rollup. Runs inside the caller's transaction."""
+    if not seconds or not app_process_name:
+        return
+    conn.execute('''
+        INSERT INTO daily_usage (day, app_process_name, seconds) VALUES (?, ?, ?)
+        ON CONFLICT(day, app_process_name) DO UPDATE SET seconds = seconds + excluded.seconds
+    ''', (day, app_process_name, seconds))
+
+
+def init_hourly_usage_table(conn):
+    """
+    Create the hourly_usage rollup behind /usage. Returns True if the table did not exist yet.
+
+    hour_ts is the epoch second at which the local hour starts; app_name and url use
+    '' for unknown so they can be part of the primary key.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='hourly_usage'"
+    ).fetchone()
+    with conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS hourly_usage (
+                hour_ts INTEGER NOT NULL,
+                app_process_name TEXT NOT NULL,
+                app_name TEXT NOT NULL DEFAULT '',
+                url TEXT NOT NULL DEFAULT '',
+                seconds INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (hour_ts, app_process_name, app_name, url)
+            ) WITHOUT ROWID
+        ''')
+        # Covering indexes so /usage can group by app_name or url in index order.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_hourly_usage_app_name ON hourly_usage(hour_ts, app_name, seconds)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_hourly_usage_url ON hourly_usage(hour_ts, url, seconds)")
+    return not exists
+
+
+def hour_start(timestamp):
+    """Epoch seconds of the start of the local hour containing timestamp (a naive local datetime)."""
+    return int(timestamp.replace(minute=0, second=0, microsecond=0).timestamp())
+
+
+def add_usage(conn, timestamp, app_process_name, app_name, url, seconds):
+    """
+    Add seconds of an event starting at timestamp to the daily and hourly rollups.
+    Runs inside the caller's transaction. Like daily_usage, the whole amount is
+    booked to the bucket the event started in.
+    """
+    if not seconds or not app_process_name:
+        return
+    add_daily_usage(conn, timestamp.strftime('%Y-%m-%d'), app_process_name, seconds)
+    conn.execute('''
+        INSERT INTO hourly_usage (hour_ts, app_process_name, app_name, url, seconds) VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT(hour_ts, app_process_name, app_name, url) DO UPDATE SET seconds = seconds + excluded.seconds
+    ''', (hour_start(timestamp), app_process_name, app_name or '', url or '', seconds))
+
+
+def get_raw_usage_floor(conn):
+    """Epoch second before which usage retention may have deleted app_usage rows, or None."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='raw_usage_floor'"
+    ).fetchone()
+    if not exists:
+        return None
+    row = conn.execute("SELECT ts FROM raw_usage_floor").fetchone()
+    return row[0] if row else None
+
+
+def set_raw_usage_floor(conn, ts):
+    """Record that app_usage rows before ts may be deleted. The floor only moves forward."""
+    with conn:
+        conn.execute("CREATE TABLE IF NOT EXISTS raw_usage_floor (id INTEGER PRIMARY KEY CHECK (id = 1), ts INTEGER)")
+        conn.execute('''
+            INSERT INTO raw_usage_floor (id, ts) VALUES (1, ?)
+            ON CONFLICT(id) DO UPDATE SET ts = MAX(ts, excluded.ts)
+        ''', (ts,))
+
+
+def _first_full_bucket(floor, bucket):
+    """Start of the first day/hour bucket lying wholly at or after the epoch second floor."""
+    start = datetime.fromtimestamp(floor)
+    if bucket == "day":
+        boundary = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        step = timedelta(days=1)
+    else:
+        boundary = start.replace(minute=0, second=0, microsecond=0)
+        step = timedelta(hours=1)
+    return boundary if boundary.timestamp() >= floor else boundary + step
+
+
+def backfill_daily_usage(db_path=DB_PATH):
+    """
+    Rebuild daily_usage from app_usage. Returns the number of rollup rows.
+
+    Once retention has deleted raw rows, only the days still wholly covered by
+    app_usage are rebuilt; older days are kept as they are.
+    """
+    conn = get_connection(db_path)
+    init_daily_usage_table(conn)
+    floor = get_raw_usage_floor(conn)
+    first_day = _first_full_bucket(floor, "day").strftime('%Y-%m-%d') if floor is not None else ''
+    with conn:
+        conn.execute("DELETE FROM daily_usage WHERE day >= ?", (first_day,))
+        conn.execute('''
+            INSERT INTO daily_usage (day, app_process_name, seconds)
+            SELECT substr(timestamp, 1, 10), app_process_name, SUM(duration)
+            FROM app_usage
+            WHERE app_process_name IS NOT NULL AND duration > 0 AND substr(timestamp, 1, 10) >= ?
+            GROUP BY substr(timestamp, 1, 10), app_process_name
+        ''', (first_day,))
+    if floor is not None:
+        logging.info(f"Kept daily_usage before {first_day}; its app_usage rows were removed by retention")
+    return conn.execute("SELECT COUNT(*) FROM daily_usage").fetchone()[0]
+
+
+def backfill_hourly_usage(db_path=DB_PATH):
+    """
+    Rebuild hourly_usage from app_usage. Returns the number of rollup rows.
+
+    Like backfill_daily_usage(), hours before the retention floor are left alone.
+    """
+    conn = get_connection(db_path)
+    init_hourly_usage_table(conn)
+    floor = get_raw_usage_floor(conn)
+    first_hour = _first_full_bucket(floor, "hour") if floor is not None else None
+    with conn:
+        conn.execute("DELETE FROM hourly_usage WHERE hour_ts >= ?", (int(first_hour.timestamp()) if first_hour else 0,))
+        conn.execute('''
+            INSERT INTO hourly_usage (hour_ts, app_process_name, app_name, url, seconds)
+            SELECT CAST(strftime('%s', substr(timestamp, 1, 13) || ':00:00', 'utc') AS INTEGER),
+                   app_process_name, COALESCE(app_name, ''), COALESCE(url, ''), SUM(duration)
+            FROM app_usage
+            WHERE app_process_name IS NOT NULL AND duration > 0 AND timestamp >= ?
+            GROUP BY 1, 2, 3, 4
+        ''', (first_hour.isoformat(timespec='seconds') if first_hour else '',))
+    if first_hour:
+        logging.info(f"Kept hourly_usage before {first_hour:%Y-%m-%d %H:00}; its app_usage rows were removed by retention")
+    return conn.execute("SELECT COUNT(*) FROM hourly_usage").fetchone()[0]
+
+
+def migrate_app_usage_ts(conn, batch_size=50000):
+    """
+    Add and fill app_usage.ts, the epoch-second form of the ISO timestamp column.
+
+    Filled in id batches so a large table never holds one huge transaction. The
+    ts index is created last, so its presence marks a finished migration and an
+    interrupted one resumes on the next start. Returns the number of rows filled.
+    """
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(app_usage)")}
+    if "ts" not in columns:
+        with conn:
+            conn.execute("ALTER TABLE app_usage ADD COLUMN ts INTEGER")
+    elif conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_app_usage_ts'"
+    ).fetchone():
+        return 0
+
+    filled = 0
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM app_usage").fetchone()[0]
+    for start in range(0, max_id + 1, batch_size):
+        with conn:
+            filled += conn.execute('''
+                UPDATE app_usage SET ts = CAST(strftime('%s', timestamp, 'utc') AS INTEGER)
+                WHERE id >= ? AND id < ? AND ts IS NULL
+            ''', (start, start + batch_size)).rowcount
+    with conn:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_app_usage_ts ON app_usage(ts)")
+    if filled:
+        logging.info(f"Migrated {filled} app_usage rows to epoch timestamps")
+    return filled
+
+
+def get_daily_usage(day, app_process_name=None, db_path=DB_PATH):
+    """Seconds used on day ('YYYY-MM-DD'), for one app or as a dict for all apps."""
+    conn = get_connection(db_path)
+    if app_process_name is not None:
+        row = conn.execute(
+            "SELECT seconds FROM daily_usage WHERE day = ? AND app_process_name = ?",
+            (day, app_process_name)
+        ).fetchone()
+        return int(row[0]) if row else 0
+
+    rows = conn.execute(
+        "SELECT app_process_name, seconds FROM daily_usage WHERE day = ? AND seconds > 0",
+        (day,)
+    ).fetchall()
+    return {app: int(seconds) for app, seconds in rows}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Maintain the daily_usage and hourly_usage rollup tables.")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--db", default=DB_PATH, help="Path to usage.db")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        count = backfill_daily_usage(args.db)
+        logging.info(f"Rebuilt daily_usage with {count} rows from {args.db}")
+        count = backfill_hourly_usage(args.db)
+        logging.info(f"Rebuilt hourly_usage with {count} rows from {args.db}")
@@ -1,33 +1,36 @@
-import threading
-import time
 import logging
+import signal
 from service.watcher_service import WatcherService
+from service.server_runner import create_server_runner
+from service.jobs import jobs
+from service.event_bus import event_bus
 from api_server import app
 
 logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 
 
-def run_flask_app():
-    app.run(host='0.0.0.0', port=5000, debug=False, use_reloader=False)
-
-
 def main():
     logging.info("Starting PC Controller Watcher Service")
 
-    watcher = WatcherService()
-
-    flask_thread = threading.Thread(target=run_flask_app)
-    flask_thread.daemon = True
-    flask_thread.start()
+    watcher = WatcherService.from_env()
+    server = create_server_runner(app)
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.request_stop())
 
+    server.start()
+    watcher.start()
     try:
-        with watcher:
-            while watcher:
-                watcher.poll_once()
-                time.sleep(watcher.monitor_interval)
+        while watcher:
+            watcher.poll_once()
+            watcher.wait()
     except KeyboardInterrupt:
         logging.info("Interrupted by user.")
+    finally:
+        # Drain in-flight API requests before the watcher flushes and releases its resources.
+        # Open event streams never finish on their own, so they are ended first.
+        event_bus.close()
+        server.stop()
+        jobs.shutdown()
         watcher.stop()
 
 
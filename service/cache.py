@@ -1,48 +1,168 @@
+import threading
 import time
-from typing import Any, Optional
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+_MISSING = object()
 
 
 class CacheEntry:
-    def __init__(self, value: Any, ttl: Optional[int]):
+    __slots__ = ("value", "expiry")
+
+    def __init__(self, value: Any, ttl: Optional[float]):
         self.value = value
-        self.expiry = time.time() + ttl if ttl else None
+        self.expiry = time.monotonic() + ttl if ttl else None
 
-    def is_expired(self) -> bool:
-        return self.expiry is not None and time.time() > self.expiry
+    def is_expired(self, now: Optional[float] = None) -> bool:
+        return self.expiry is not None and (now or time.monotonic()) > self.expiry
 
 
-class Cache:
+class _Flight:
+    """A load in progress that concurrent misses on the same key wait for."""
+    __slots__ = ("done", "value", "error")
+
     def __init__(self):
-        self._store = {}
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
 
-    def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """Store a value with an optional TTL in seconds."""
+
+class Cache:
+    """
+    Thread-safe LRU cache with optional per-entry TTL.
+
+    Expired entries are dropped when read, and each write also sweeps a few of
+    the least recently used entries, so expiry costs O(1) amortized without a
+    full cleanup() pass. get_or_compute() runs one loader per key at a time;
+    other callers missing on that key wait for its result.
+    """
+
+    __slots__ = ("max_entries", "_store", "_lock", "_inflight",
+                 "hits", "misses", "evictions", "expirations")
+
+    SWEEP_BATCH = 4
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _get_locked(self, key: str, now: float):
+        entry = self._store.get(key)
+        if entry is None:
+            self.misses += 1
+            return _MISSING
+        if entry.expiry is not None and now > entry.expiry:
+            del self._store[key]
+            self.expirations += 1
+            self.misses += 1
+            return _MISSING
+        self._store.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def _set_locked(self, key: str, value: Any, ttl: Optional[float], now: float):
         self._store[key] = CacheEntry(value, ttl)
+        self._store.move_to_end(key)
+
+        # Amortized expiry: look at a few of the oldest entries on every write.
+        for _ in range(min(self.SWEEP_BATCH, len(self._store) - 1)):
+            oldest_key, oldest = next(iter(self._store.items()))
+            if oldest_key == key or not oldest.is_expired(now):
+                break
+            del self._store[oldest_key]
+            self.expirations += 1
+
+        if self.max_entries is not None:
+            while len(self._store) > self.max_entries:
+                self._store.popitem(last=False)
+                self.evictions += 1
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        """Store a value with an optional TTL in seconds."""
+        with self._lock:
+            self._set_locked(key, value, ttl, time.monotonic())
 
     def get(self, key: str) -> Optional[Any]:
         """Retrieve a value if it's not expired. Returns None otherwise."""
-        entry = self._store.get(key)
-        if entry:
-            if entry.is_expired():
-                del self._store[key]
-                return None
-            return entry.value
-        return None
+        with self._lock:
+            value = self._get_locked(key, time.monotonic())
+        return None if value is _MISSING else value
+
+    def get_or_compute(self, key: str, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """
+        Return the cached value, or call loader() once and cache its result.
+
+        Concurrent callers that miss on the same key wait for the first caller's
+        load instead of running loader themselves. A loader exception is raised
+        in every waiting caller and nothing is cached.
+        """
+        with self._lock:
+            value = self._get_locked(key, time.monotonic())
+            if value is not _MISSING:
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = loader()
+            with self._lock:
+                self._set_locked(key, flight.value, ttl, time.monotonic())
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.done.set()
+        return flight.value
 
     def delete(self, key: str):
         """Manually remove an item from cache."""
-        if key in self._store:
-            del self._store[key]
+        with self._lock:
+            self._store.pop(key, None)
 
     def cleanup(self):
         """Remove all expired items."""
-        keys_to_delete = [k for k, v in self._store.items() if v.is_expired()]
-        for k in keys_to_delete:
-            del self._store[k]
+        now = time.monotonic()
+        with self._lock:
+            keys_to_delete = [k for k, v in self._store.items() if v.is_expired(now)]
+            for k in keys_to_delete:
+                del self._store[k]
+            self.expirations += len(keys_to_delete)
 
     def clear(self):
         """Clear all cache entries."""
-        self._store.clear()
+        with self._lock:
+            self._store.clear()
+
+    def stats(self) -> dict:
+        """Hit/miss/eviction counters and current size."""
+        with self._lock:
+            return {
+                "size": len(self._store),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+    def __len__(self):
+        return len(self._store)
 
     def __contains__(self, key: str):
         """Check if a key exists and is not expired."""
@@ -0,0 +1,156 @@
+import json
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+
+RING_SIZE = 256         # recent events kept for Last-Event-ID resume
+QUEUE_SIZE = 64         # per-subscriber backlog before the oldest events are dropped
+MAX_SUBSCRIBERS = 4     # each open stream holds an HTTP worker thread
+
+
+class TooManySubscribers(Exception):
+    pass
+
+
+class BusEvent:
+    __slots__ = ("id", "seq", "type", "data", "timestamp")
+
+    def __init__(self, stream_id, seq, event_type, data):
+        self.id = f"{stream_id}-{seq}"
+        self.seq = seq
+        self.type = event_type
+        self.data = data
+        self.timestamp = datetime.now()
+
+    def to_sse(self):
+        payload = json.dumps({"type": self.type, "timestamp": self.timestamp.isoformat(), "data": self.data},
+                             default=str)
+        return f"id: {self.id}\nevent: {self.type}\ndata: {payload}\n\n"
+
+
+class Subscription:
+    """
+    One subscriber's bounded queue. When it is full, publishing drops the oldest
+    event and counts it in `dropped`, so a slow client never blocks the publisher.
+    """
+
+    def __init__(self, bus, types, queue_size):
+        self.bus = bus
+        self.types = types
+        self.dropped = 0
+        self.missed = False   # resume point was no longer in the ring buffer
+        self.closed = False
+        self._queue = deque(maxlen=queue_size)
+        self._ready = threading.Condition(threading.Lock())
+
+    def _offer(self, event):
+        if self.types and event.type not in self.types:
+            return
+        with self._ready:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(event)
+            self._ready.notify()
+
+    def get(self, timeout=None):
+        """Wait up to timeout for events and return all queued ones; [] on timeout or once closed."""
+        with self._ready:
+            if not self._queue and not self.closed:
+                self._ready.wait(timeout)
+            events = list(self._queue)
+            self._queue.clear()
+            return events
+
+    def close(self):
+        self.bus._unsubscribe(self)
+        with self._ready:
+            self.closed = True
+            self._ready.notify_all()
+
+
+class EventBus:
+    """
+    In-process fan-out of live events (foreground changes, block list changes,
+    policy decisions) to /events/stream subscribers.
+
+    Event ids are "<stream id>-<seq>"; the stream id changes on every start, so a
+    Last-Event-ID from an earlier run is recognised as a gap rather than a position.
+    """
+
+    def __init__(self, ring_size=RING_SIZE, queue_size=QUEUE_SIZE, max_subscribers=MAX_SUBSCRIBERS):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.stream_id = uuid.uuid4().hex[:8]
+        self._seq = 0
+        self._ring = deque(maxlen=ring_size)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def publish(self, event_type, data):
+        """Send an event to every subscriber. Cheap with none connected; never blocks on a client."""
+        with self._lock:
+            self._seq += 1
+            event = BusEvent(self.stream_id, self._seq, event_type, data)
+            self._ring.append(event)
+            # Offered under the bus lock so every subscriber sees events in id order.
+            for subscription in self._subscribers:
+                subscription._offer(event)
+        return event
+
+    def subscribe(self, last_event_id=None, types=None):
+        """
+        New Subscription, primed with the buffered events after last_event_id.
+        Raises TooManySubscribers when max_subscribers streams are already open.
+        """
+        subscription = Subscription(self, set(types) if types else None, self.queue_size)
+        with self._lock:
+            if self._closed or len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribers(f"At most {self.max_subscribers} event streams can be open")
+            if last_event_id:
+                replay = self._events_after(last_event_id)
+                if replay is None:
+                    subscription.missed = True
+                else:
+                    for event in replay:
+                        subscription._offer(event)
+            # Registered under the same lock as the replay, so no event falls in between.
+            self._subscribers.append(subscription)
+        return subscription
+
+    def _events_after(self, last_event_id):
+        """Buffered events after last_event_id, or None if that point is no longer covered."""
+        stream_id, _, seq = last_event_id.rpartition("-")
+        if stream_id != self.stream_id or not seq.isdigit():
+            return None
+        seq = int(seq)
+        if self._ring and seq < self._ring[0].seq - 1:
+            return None
+        return [event for event in self._ring if event.seq > seq]
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "stream_id": self.stream_id,
+                "published": self._seq,
+                "buffered": len(self._ring),
+                "subscribers": len(self._subscribers),
+                "dropped": sum(subscription.dropped for subscription in self._subscribers),
+            }
+
+    def close(self):
+        """End every open stream (at shutdown, so their HTTP workers can finish)."""
+        with self._lock:
+            self._closed = True
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.close()
+
+
+event_bus = EventBus()
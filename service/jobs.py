@@ -0,0 +1,136 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+MAX_WORKERS = 4
+DEFAULT_KIND_LIMIT = 1
+JOB_TTL = 600       # seconds a finished job stays retrievable
+MAX_JOBS = 256      # queued + running + finished-but-not-expired
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class Job:
+    __slots__ = ("id", "kind", "fn", "status", "result", "error",
+                 "created_at", "started_at", "finished_at", "_finished_monotonic")
+
+    def __init__(self, kind, fn):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.fn = fn
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self._finished_monotonic = None
+
+    @property
+    def done(self):
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Runs slow API commands in the background.
+
+    Jobs share one bounded thread pool, and each kind has its own concurrency
+    limit (e.g. one registry scan at a time); jobs over their kind's limit wait in a
+    per-kind queue rather than occupying a worker. Finished jobs are kept for
+    ttl seconds, then evicted on the next submit() or get().
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, kind_limits=None, default_kind_limit=DEFAULT_KIND_LIMIT,
+                 ttl=JOB_TTL, max_jobs=MAX_JOBS):
+        self.kind_limits = dict(kind_limits or {})
+        self.default_kind_limit = default_kind_limit
+        self.ttl = ttl
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()   # id -> Job, in submission order
+        self._finished = deque()     # finished jobs in completion order, for TTL eviction
+        self._running = {}           # kind -> running count
+        self._waiting = {}           # kind -> deque of queued jobs
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn):
+        """Queue fn() as a job of kind. Raises JobQueueFull when max_jobs are already tracked."""
+        job = Job(kind, fn)
+        with self._lock:
+            self._evict_expired()
+            if len(self._jobs) >= self.max_jobs:
+                raise JobQueueFull(f"Too many jobs ({self.max_jobs}), try again later")
+            self._jobs[job.id] = job
+            if self._running.get(kind, 0) < self.kind_limits.get(kind, self.default_kind_limit):
+                self._dispatch(job)
+            else:
+                self._waiting.setdefault(kind, deque()).append(job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            self._evict_expired()
+            return self._jobs.get(job_id)
+
+    def _dispatch(self, job):
+        self._running[job.kind] = self._running.get(job.kind, 0) + 1
+        self._executor.submit(self._run, job)
+
+    def _run(self, job):
+        job.status = "running"
+        job.started_at = datetime.now()
+        try:
+            job.result = job.fn()
+            job.status = "succeeded"
+        except Exception as e:
+            logging.error(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        job.fn = None
+        job.finished_at = datetime.now()
+        job._finished_monotonic = time.monotonic()
+
+        with self._lock:
+            self._finished.append(job)
+            self._running[job.kind] -= 1
+            waiting = self._waiting.get(job.kind)
+            if waiting:
+                self._dispatch(waiting.popleft())
+
+    def _evict_expired(self):
+        cutoff = time.monotonic() - self.ttl
+        while self._finished and self._finished[0]._finished_monotonic < cutoff:
+            self._jobs.pop(self._finished.popleft().id, None)
+
+    def stats(self):
+        with self._lock:
+            self._evict_expired()
+            return {
+                "tracked": len(self._jobs),
+                "running": sum(self._running.values()),
+                "queued": sum(len(waiting) for waiting in self._waiting.values()),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+jobs = JobManager(kind_limits={"screenshot": 2})
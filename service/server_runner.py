@@ -0,0 +1,182 @@
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_HOST = "0.0.0.0"
+DEFAULT_PORT = 5000
+
+
+class ServerConfig:
+    """
+    HTTP serving settings. from_env() reads them from MDM_SERVER_* variables,
+    e.g. MDM_SERVER_MODE=waitress MDM_SERVER_THREADS=16.
+    """
+
+    def __init__(self, mode="threaded", host=DEFAULT_HOST, port=DEFAULT_PORT, threads=8, backlog=64,
+                 connection_limit=100, request_timeout=30, shutdown_timeout=10):
+        self.mode = mode
+        self.host = host
+        self.port = port
+        self.threads = threads
+        self.backlog = backlog
+        self.connection_limit = connection_limit
+        self.request_timeout = request_timeout
+        self.shutdown_timeout = shutdown_timeout
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        defaults = cls()
+        return cls(
+            mode=environ.get("MDM_SERVER_MODE", defaults.mode),
+            host=environ.get("MDM_SERVER_HOST", defaults.host),
+            port=int(environ.get("MDM_SERVER_PORT", defaults.port)),
+            threads=int(environ.get("MDM_SERVER_THREADS", defaults.threads)),
+            backlog=int(environ.get("MDM_SERVER_BACKLOG", defaults.backlog)),
+            connection_limit=int(environ.get("MDM_SERVER_CONNECTION_LIMIT", defaults.connection_limit)),
+            request_timeout=float(environ.get("MDM_SERVER_REQUEST_TIMEOUT", defaults.request_timeout)),
+            shutdown_timeout=float(environ.get("MDM_SERVER_SHUTDOWN_TIMEOUT", defaults.shutdown_timeout)),
+        )
+
+
+class ServerRunner(ABC):
+    """Runs a WSGI app on a background thread until stop()."""
+
+    def __init__(self, app, config):
+        self.app = app
+        self.config = config
+        self._thread = None
+
+    @abstractmethod
+    def _serve(self):
+        """Serve requests until _shutdown() is called."""
+        pass
+
+    @abstractmethod
+    def _shutdown(self):
+        """Stop accepting connections, let in-flight requests finish within shutdown_timeout."""
+        pass
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, name=f"http-{self.config.mode}", daemon=True)
+        self._thread.start()
+        logging.info(f"HTTP server ({self.config.mode}) listening on {self.config.host}:{self.config.port}")
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._shutdown()
+        self._thread.join(self.config.shutdown_timeout)
+        self._thread = None
+        logging.info("HTTP server stopped.")
+
+
+class DevServerRunner(ServerRunner):
+    """Werkzeug's development server as main.py used to start it. No limits, no clean shutdown."""
+
+    def _serve(self):
+        self.app.run(host=self.config.host, port=self.config.port, debug=False, use_reloader=False)
+
+    def _shutdown(self):
+        pass  # app.run() cannot be stopped; its daemon thread ends with the process
+
+    def stop(self):
+        self._thread = None
+
+
+class ThreadedServerRunner(ServerRunner):
+    """
+    Werkzeug WSGI server with a fixed worker pool.
+
+    Accepted connections are handed to `threads` workers; once connection_limit
+    connections are in flight, the accept loop waits and further clients queue in
+    the listen backlog. Each connection's socket gets request_timeout.
+    """
+
+    def __init__(self, app, config):
+        super().__init__(app, config)
+        from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+        class RequestHandler(WSGIRequestHandler):
+            timeout = config.request_timeout
+
+        class PooledWSGIServer(BaseWSGIServer):
+            def __init__(self):
+                self.request_queue_size = config.backlog
+                self.slots = threading.BoundedSemaphore(config.connection_limit)
+                self.pool = ThreadPoolExecutor(max_workers=config.threads, thread_name_prefix="http-worker")
+                super().__init__(config.host, config.port, app, handler=RequestHandler)
+
+            def process_request(self, request, client_address):
+                self.slots.acquire()
+                self.pool.submit(self._process, request, client_address)
+
+            def _process(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+                    self.slots.release()
+
+        self.server = PooledWSGIServer()
+
+    def _serve(self):
+        self.server.serve_forever()
+
+    def _shutdown(self):
+        self.server.shutdown()  # stops the accept loop
+        drained = threading.Thread(target=self.server.pool.shutdown, kwargs={"wait": True}, daemon=True)
+        drained.start()
+        drained.join(self.config.shutdown_timeout)
+        if drained.is_alive():
+            logging.warning("HTTP server stopped with requests still in flight.")
+        self.server.server_close()
+
+
+class WaitressServerRunner(ServerRunner):
+    """waitress, if installed (pip install waitress)."""
+
+    def __init__(self, app, config):
+        super().__init__(app, config)
+        try:
+            from waitress.server import create_server
+        except ImportError:
+            raise RuntimeError("MDM_SERVER_MODE=waitress requires the waitress package")
+
+        self.server = create_server(
+            app, host=config.host, port=config.port, threads=config.threads, backlog=config.backlog,
+            connection_limit=config.connection_limit, channel_timeout=config.request_timeout,
+        )
+
+    def _serve(self):
+        self.server.run()
+
+    def _shutdown(self):
+        deadline = time.monotonic() + self.config.shutdown_timeout
+        self.server.accepting = False
+        self.server.task_dispatcher.shutdown(timeout=self.config.shutdown_timeout)
+        # Finished tasks still need the server loop to flush their responses.
+        while time.monotonic() < deadline and any(
+                getattr(channel, "total_outbufs_len", 0) or getattr(channel, "requests", None)
+                for channel in list(self.server._map.values())):
+            time.sleep(0.05)
+        self.server.close()
+
+
+SERVER_RUNNERS = {
+    "dev": DevServerRunner,
+    "threaded": ThreadedServerRunner,
+    "waitress": WaitressServerRunner,
+}
+
+
+def create_server_runner(app, config=None):
+    config = config or ServerConfig.from_env()
+    runner_cls = SERVER_RUNNERS.get(config.mode)
+    if runner_cls is None:
+        raise ValueError(f"Unknown server mode: {config.mode} (expected one of {', '.join(SERVER_RUNNERS)})")
+    return runner_cls(app, config)
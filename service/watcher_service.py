@@ -1,16 +1,61 @@
 from core import app_monitor, heartbeat
+from core.installed_software import inventory
+from core.icon_cache import icon_store
+from core.screen_audit import screen_audit
+from core.usage_retention import run_usage_retention
+from service.jobs import jobs, JobQueueFull
 import logging
-from core.app_block_policy import evaluate_time_policies
+import os
+from datetime import datetime
+from core.app_block_policy import evaluate_time_policies, get_next_policy_change, rules_changed
 import time
 
 class WatcherService:
-    def __init__(self, heartbeat_interval=60, monitor_interval=10, policy_check_interval=30):
+    def __init__(self, heartbeat_interval=60, monitor_interval=10, policy_check_interval=300,
+                 usage_flush_interval=60, screenshot_interval=None, retention_interval=86400,
+                 retention_delay=600):
         self.heartbeat_interval = heartbeat_interval
         self.monitor_interval = monitor_interval
+        # Upper bound between policy evaluations; normally the scheduler wakes at the
+        # next moment a rule can change state, which is usually much sooner or later.
         self.policy_check_interval = policy_check_interval
+        self.usage_flush_interval = usage_flush_interval
+        # Audit screenshots are off unless an interval is given.
+        self.screenshot_interval = screenshot_interval
+        # Usage retention runs as a background job, first retention_delay seconds after start.
+        self.retention_interval = retention_interval
+        self.retention_delay = retention_delay
         self.running = False
-        self.last_heartbeat = None
-        self.last_policy_check = None
+        self.stop_requested = False
+        self.next_monitor = None
+        self.next_heartbeat = None
+        self.next_policy_check = None
+        self.next_screenshot = float("inf")
+        self.next_retention = float("inf")
+
+    @classmethod
+    def from_env(cls, environ=os.environ):
+        """
+        Intervals from MDM_HEARTBEAT_INTERVAL, MDM_MONITOR_INTERVAL, MDM_POLICY_CHECK_INTERVAL,
+        MDM_USAGE_FLUSH_INTERVAL, MDM_SCREENSHOT_INTERVAL and MDM_RETENTION_INTERVAL, in seconds.
+        Audit screenshots stay off unless MDM_SCREENSHOT_INTERVAL is set; "off" disables either of the last two.
+        """
+        defaults = cls()
+
+        def seconds(name, default):
+            value = environ.get(name)
+            if value is None:
+                return default
+            return None if value.lower() in ("", "none", "off", "0") else float(value)
+
+        return cls(
+            heartbeat_interval=float(environ.get("MDM_HEARTBEAT_INTERVAL", defaults.heartbeat_interval)),
+            monitor_interval=float(environ.get("MDM_MONITOR_INTERVAL", defaults.monitor_interval)),
+            policy_check_interval=float(environ.get("MDM_POLICY_CHECK_INTERVAL", defaults.policy_check_interval)),
+            usage_flush_interval=float(environ.get("MDM_USAGE_FLUSH_INTERVAL", defaults.usage_flush_interval)),
+            screenshot_interval=seconds("MDM_SCREENSHOT_INTERVAL", defaults.screenshot_interval),
+            retention_interval=seconds("MDM_RETENTION_INTERVAL", defaults.retention_interval),
+        )
 
     def __enter__(self):
         self.start()
@@ -20,33 +65,94 @@ class WatcherService:
         self.stop()
 
     def __bool__(self):
-        return self.running
+        return self.running and not self.stop_requested
 
     def start(self):
         self.running = True
-        self.last_heartbeat = time.time()
-        self.last_policy_check = time.time()
+        self.stop_requested = False
+        now = time.monotonic()
+        self.next_monitor = now
+        self.next_heartbeat = now + self.heartbeat_interval
+        self.next_policy_check = now
+        if self.screenshot_interval:
+            self.next_screenshot = now
+        if self.retention_interval:
+            self.next_retention = now + self.retention_delay
+        inventory.start_background_refresh()
         logging.info("Watcher Service started.")
 
     def stop(self):
         if self.running:
             self.running = False
+            rules_changed.set()  # release wait()
+            inventory.stop_background_refresh()
+            icon_store.shutdown()
+            screen_audit.shutdown()
+            try:
+                app_monitor.flush_last_event()
+            except Exception as e:
+                logging.error(f"Error flushing usage on stop: {e}")
+            try:
+                heartbeat.flush_heartbeat()
+            except Exception as e:
+                logging.error(f"Error flushing uptime on stop: {e}")
             logging.info("Watcher Service stopped.")
 
+    def request_stop(self):
+        """Ask the poll loop to exit; safe to call from a signal handler. stop() still does the cleanup."""
+        self.stop_requested = True
+        rules_changed.set()
+
+    def wait(self):
+        """Sleep until the next monitor tick, heartbeat, policy, screenshot or retention deadline, or until rules change."""
+        deadline = min(self.next_monitor, self.next_heartbeat, self.next_policy_check, self.next_screenshot,
+                       self.next_retention)
+        timeout = deadline - time.monotonic()
+        if timeout > 0:
+            rules_changed.wait(timeout)
+
     def poll_once(self):
-        """Performs one monitoring cycle, policy check, and heartbeat check."""
+        """Performs whichever of the monitoring cycle, policy check, heartbeat, audit screenshot and retention are due."""
         try:
-            app_monitor.track_active_app(pulsetime=self.monitor_interval + 1)
+            now = time.monotonic()
 
-            now = time.time()
+            if now >= self.next_monitor:
+                app_monitor.track_active_app(pulsetime=self.monitor_interval + 1,
+                                             flush_interval=self.usage_flush_interval)
+                self.next_monitor = now + self.monitor_interval
+                # The foreground app may have changed, which moves its usage-limit deadline.
+                self._schedule_policy_check(now)
 
-            if now - self.last_policy_check >= self.policy_check_interval:
+            if rules_changed.is_set() or now >= self.next_policy_check:
+                rules_changed.clear()
                 evaluate_time_policies()
-                self.last_policy_check = now
+                self.next_policy_check = now + self.policy_check_interval
+                self._schedule_policy_check(now)
 
-            if now - self.last_heartbeat >= self.heartbeat_interval:
+            if now >= self.next_heartbeat:
                 heartbeat.send_heartbeat()
-                self.last_heartbeat = now
+                self.next_heartbeat = now + self.heartbeat_interval
+
+            if now >= self.next_screenshot:
+                screen_audit.submit()  # captured and encoded off this thread
+                self.next_screenshot = now + self.screenshot_interval
+
+            if now >= self.next_retention:
+                self.next_retention = now + self.retention_interval
+                try:
+                    jobs.submit("retention", run_usage_retention)
+                except JobQueueFull as e:
+                    logging.warning(f"Usage retention not scheduled: {e}")
 
         except Exception as e:
             logging.error(f"Error in watcher poll: {e}")
+
+    def _schedule_policy_check(self, now):
+        """Move the next policy check forward to the next moment any rule can change state."""
+        last_event = app_monitor.last_event
+        foreground_app = last_event.app_process_name if last_event else None
+        next_change = get_next_policy_change(foreground_app)
+        if next_change is None:
+            return
+        delay = max(0.0, (next_change - datetime.now()).total_seconds())
+        self.next_policy_check = min(self.next_policy_check, now + delay)